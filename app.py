@@ -1,9 +1,10 @@
 import os
-import asyncio
+import re
 import json
+import time
+import asyncio
 import traceback
 import inspect
-from pathlib import Path
 from flask import Flask, render_template, send_from_directory, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
 from openai import AsyncAzureOpenAI
@@ -13,40 +14,115 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import insurance_claims_processing
-from insurance_claims_processing import create_agents, OpenAIChatCompletionsModel, Runner, ItemHelpers
+from scenario_index import get_scenario_index
+from asset_pipeline import (
+    STATIC_FOLDER, IMMUTABLE_CACHE_CONTROL, build_assets, send_static_asset, compress_response,
+    accepted_encodings, read_text_cached,
+)
+from sse_protocol import SSE_PROTOCOLS, create_encoder, get_payload_store, gzip_stream
+from run_monitor import RUN_MONITOR_SNAPSHOT_SECONDS, get_run_monitor, new_run_id
+from profiling import PROFILE_RUNS, RunProfiler
+from job_queue import FINAL_STATUSES, JOB_POLL_SECONDS, JOB_WORKERS, JOB_WORKERS_AUTOSTART, get_job_queue, start_job_workers
+from instruction_templates import InstructionTemplateError, get_instruction_registry
+from insurance_claims_processing import (
+    AGENT_INSTRUCTIONS, create_agents, create_model_config, create_run_config, write_run_manifest, Runner, ItemHelpers,
+)
 
 load_dotenv()
 
-app = Flask(__name__)
+# Static files are served by serve_static() so they get ETags, precompressed variants and cache headers
+app = Flask(__name__, static_folder=None)
+app.after_request(compress_response)
 
 # Configuration
 SCENARIOS_FOLDER = "scenarios"
 OUTPUTS_FOLDER = "outputs"
 
+# While a model or OCR call is in flight nothing is written to the stream, so a
+# disconnected client would go unnoticed; a keep-alive comment is sent this often
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "5"))
+
+# Upper bound on how long a cancelled run may take to unwind its tasks
+CANCEL_TIMEOUT_SECONDS = float(os.getenv("CANCEL_TIMEOUT_SECONDS", "10"))
+
+PAYLOAD_HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+POLICY_NUMBER_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+# Build avatar thumbnails and compressed assets (a no-op when they are up to date);
+# the returned version is appended to asset URLs so they can be cached as immutable
+ASSET_VERSION = build_assets()
+
+def is_known_policy(policy_number: str) -> bool:
+    """Return whether a policy number is well-formed and has a scenario folder."""
+    return bool(POLICY_NUMBER_PATTERN.fullmatch(policy_number)) and os.path.isdir(os.path.join(SCENARIOS_FOLDER, policy_number))
+
+@app.context_processor
+def inject_asset_helpers():
+    def asset_url(path):
+        return f"/static/{path}?v={ASSET_VERSION}"
+    return {"asset_url": asset_url, "asset_version": ASSET_VERSION}
+
+@app.route('/static/<path:filename>')
+def serve_static(filename):
+    return send_static_asset(STATIC_FOLDER, filename)
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/dashboard')
+def dashboard():
+    return render_template('dashboard.html')
+
+@app.route('/api/dashboard')
+def get_dashboard():
+    """Summary of all active and recent runs (web and batch)."""
+    return jsonify(get_run_monitor().snapshot())
+
+@app.route('/api/dashboard/stream')
+def stream_dashboard():
+    """Stream a dashboard snapshot every RUN_MONITOR_SNAPSHOT_SECONDS."""
+    interval = request.args.get('interval', default=RUN_MONITOR_SNAPSHOT_SECONDS, type=float)
+    interval = max(0.5, interval)
+    
+    def generate():
+        monitor = get_run_monitor()
+        while True:
+            yield f"data: {json.dumps(monitor.snapshot(), separators=(',', ':'))}\n\n"
+            time.sleep(interval)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
 @app.route('/api/scenarios')
 def list_scenarios():
-    if not os.path.exists(SCENARIOS_FOLDER):
-        return jsonify([])
-    scenarios = [d for d in os.listdir(SCENARIOS_FOLDER) if os.path.isdir(os.path.join(SCENARIOS_FOLDER, d))]
-    return jsonify(scenarios)
+    """
+    List scenario policy numbers from the scenario index.
+    Optional query parameters: offset, limit and q (substring filter).
+    The total number of matches is returned in the X-Total-Count header.
+    """
+    offset = request.args.get('offset', default=0, type=int)
+    limit = request.args.get('limit', default=None, type=int)
+    query = request.args.get('q') or None
+    scenarios, total = get_scenario_index(SCENARIOS_FOLDER).list_scenarios(offset, limit, query)
+    response = jsonify(scenarios)
+    response.headers['X-Total-Count'] = str(total)
+    return response
 
 @app.route('/files/<path:filename>')
 def serve_files(filename):
     if '..' in filename:
         return "Invalid path", 400
-    return send_from_directory('.', filename)
+    response = send_from_directory('.', filename, conditional=True, etag=True)
+    # Scenario files and outputs can change between runs, so revalidate using the ETag
+    response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response
 
 @app.route('/api/readme')
 def get_readme():
     """Serve the README.md content."""
     try:
         readme_path = os.path.join(os.path.dirname(__file__), 'README.md')
-        with open(readme_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = read_text_cached(readme_path)
         return content, 200, {'Content-Type': 'text/plain; charset=utf-8'}
     except Exception as e:
         return f"Error reading README: {str(e)}", 500
@@ -65,10 +141,7 @@ async def _get_all_agents():
         azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
     )
     
-    model_config = OpenAIChatCompletionsModel(
-        model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-        openai_client=client,
-    )
+    model_config = create_model_config(client)
     
     claims_manager = await create_agents(model_config)
     
@@ -76,7 +149,7 @@ async def _get_all_agents():
     # Re-create to get individual agent references
     from insurance_claims_processing import (
         Agent, get_policy_files, extract_document,
-        read_extracted_file, list_extracted_files, get_policy_holder_details, save_id_verification_result,
+        read_extracted_file, read_extracted_files, list_extracted_files, get_policy_holder_details, save_id_verification_result,
         read_policy_document, save_coverage_assessment,
         save_medical_assessment,
         read_all_assessment_results, save_final_decision
@@ -94,21 +167,21 @@ async def _get_all_agents():
         name="IDVerification",
         instructions="You are an identity verification specialist...",
         model=model_config,
-        tools=[list_extracted_files, read_extracted_file, get_policy_holder_details, save_id_verification_result],
+        tools=[list_extracted_files, read_extracted_files, read_extracted_file, get_policy_holder_details, save_id_verification_result],
     )
     
     policy_coverage = Agent(
         name="PolicyCoverage",
         instructions="You are a policy coverage specialist...",
         model=model_config,
-        tools=[read_policy_document, list_extracted_files, read_extracted_file, save_coverage_assessment],
+        tools=[read_policy_document, list_extracted_files, read_extracted_files, read_extracted_file, save_coverage_assessment],
     )
     
     medical_assessor = Agent(
         name="MedicalAssessor",
         instructions="You are a medical claims assessor...",
         model=model_config,
-        tools=[list_extracted_files, read_extracted_file, save_medical_assessment],
+        tools=[list_extracted_files, read_extracted_files, read_extracted_file, save_medical_assessment],
     )
     
     claims_decision = Agent(
@@ -131,17 +204,11 @@ async def _get_all_agents():
 
 @app.route('/api/agent-info/<agent_name>')
 def get_agent_info(agent_name):
-    """Return agent instructions and tools."""
+    """
+    Return agent instructions (rendered for ?tenant= and ?variant=, with their
+    token count) and tools.
+    """
     try:
-        # Map agent names to instruction file names
-        agent_files = {
-            "DocumentExtractor": "document_extractor.md",
-            "IDVerification": "id_verification.md",
-            "PolicyCoverage": "policy_coverage.md",
-            "MedicalAssessor": "medical_assessor.md",
-            "ClaimsDecision": "claims_decision.md",
-        }
-        
         # Map agent names to their tool lists
         agent_tools = {
             "DocumentExtractor": [
@@ -150,6 +217,7 @@ def get_agent_info(agent_name):
             ],
             "IDVerification": [
                 {"name": "list_extracted_files", "description": "List all extracted document files for a policy"},
+                {"name": "read_extracted_files", "description": "Read several (or all) extracted document files in one call"},
                 {"name": "read_extracted_file", "description": "Read the content of an extracted document file"},
                 {"name": "get_policy_holder_details", "description": "Retrieve official policy holder information from the system"},
                 {"name": "save_id_verification_result", "description": "Save the ID verification result"}
@@ -157,11 +225,13 @@ def get_agent_info(agent_name):
             "PolicyCoverage": [
                 {"name": "read_policy_document", "description": "Read the policy document to review coverage rules"},
                 {"name": "list_extracted_files", "description": "List all extracted document files for a policy"},
+                {"name": "read_extracted_files", "description": "Read several (or all) extracted document files in one call"},
                 {"name": "read_extracted_file", "description": "Read the content of an extracted document file"},
                 {"name": "save_coverage_assessment", "description": "Save the coverage assessment result"}
             ],
             "MedicalAssessor": [
                 {"name": "list_extracted_files", "description": "List all extracted document files for a policy"},
+                {"name": "read_extracted_files", "description": "Read several (or all) extracted document files in one call"},
                 {"name": "read_extracted_file", "description": "Read the content of an extracted document file"},
                 {"name": "save_medical_assessment", "description": "Save the medical assessment result"}
             ],
@@ -171,34 +241,78 @@ def get_agent_info(agent_name):
             ]
         }
         
-        if agent_name not in agent_files:
+        if agent_name not in AGENT_INSTRUCTIONS:
             return jsonify({"error": "Agent not found"}), 404
         
-        # Read instructions from markdown file
-        instructions_path = Path(__file__).parent / "instructions" / agent_files[agent_name]
-        with open(instructions_path, "r", encoding="utf-8") as f:
-            instructions = f.read()
+        try:
+            rendered = get_instruction_registry().render(
+                AGENT_INSTRUCTIONS[agent_name], request.args.get('tenant'), request.args.get('variant')
+            )
+        except InstructionTemplateError as e:
+            return jsonify({"error": str(e)}), 400
         
         return jsonify({
             "name": agent_name,
-            "instructions": instructions,
-            "tools": agent_tools[agent_name]
+            "instructions": rendered.text,
+            "variant": rendered.variant,
+            "tenant": rendered.tenant,
+            "tokens": rendered.tokens,
+            "tools": agent_tools.get(agent_name, [])
         })
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/instructions')
+def get_instruction_tokens():
+    """Token count of every instruction template per variant, for ?tenant= (or the default variables)."""
+    registry = get_instruction_registry()
+    tenant = request.args.get('tenant')
+    try:
+        return jsonify({"tenant": tenant, "tenants": registry.tenants, "tokens": registry.token_report(tenant)})
+    except InstructionTemplateError as e:
+        return jsonify({"error": str(e)}), 400
+
 @app.route('/api/run/<policy_number>')
 def run_agent(policy_number):
+    """
+    Run the claims workflow for a policy and stream its events as SSE.
+    Pass ?protocol=compact for the coalesced, deduplicated, gzip-negotiated
+    wire format (see sse_protocol.py).
+    Pass ?profile=1 to save a flame graph, task timeline and event loop lag
+    report to outputs/<policy>/profile/ (see profiling.py), and ?tenant= to
+    render the agent instructions with a tenant's variables.
+    """
+    # The policy number names folders under outputs/, so it must be a known scenario
+    if not is_known_policy(policy_number):
+        return jsonify({"error": f"Unknown policy number '{policy_number}'"}), 404
+    protocol = request.args.get('protocol', 'legacy')
+    if protocol not in SSE_PROTOCOLS:
+        return jsonify({"error": f"Unknown protocol '{protocol}'"}), 400
+    tenant = request.args.get('tenant') or None
+    if tenant is not None and tenant not in get_instruction_registry().tenants:
+        return jsonify({"error": f"Unknown tenant '{tenant}'"}), 400
+    encoder = create_encoder(protocol)
+    monitor = get_run_monitor()
+    run_id = new_run_id()
+    profiler = None
+    if request.args.get('profile', '1' if PROFILE_RUNS else '0') in ('1', 'true'):
+        profiler = RunProfiler(os.path.join(OUTPUTS_FOLDER, policy_number, 'profile'))
     
     def generate():
         async def run_async():
+            client = None
+            streaming_result = None
             try:
                 # Create a queue for internal tool calls
-                from insurance_claims_processing import tool_call_queue
+                from insurance_claims_processing import tool_call_queue, tool_tracer, run_policy_number, print_tool_event
                 import asyncio
                 queue = asyncio.Queue()
                 tool_call_queue.set(queue)
+                run_policy_number.set(policy_number)
+                tool_tracer.set(monitor.tracer(run_id, forward=profiler.tracer(forward=print_tool_event) if profiler else print_tool_event))
+                monitor.record({"type": "run_started", "run_id": run_id, "policy_number": policy_number, "source": "web"})
+                await asyncio.to_thread(write_run_manifest, policy_number, run_id, "running", source="web")
                 
                 client = AsyncAzureOpenAI(
                     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
@@ -206,15 +320,12 @@ def run_agent(policy_number):
                     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
                 )
                 
-                model_config = OpenAIChatCompletionsModel(
-                    model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-                    openai_client=client,
-                )
+                model_config = create_model_config(client)
                 
-                claims_manager = await create_agents(model_config)
+                claims_manager = await create_agents(model_config, tenant)
                 user_request = f"Process the insurance claim for policy number {policy_number}. Execute the full workflow."
                 
-                streaming_result = Runner.run_streamed(claims_manager, user_request)
+                streaming_result = Runner.run_streamed(claims_manager, user_request, run_config=create_run_config())
                 
                 current_agent = None
                 tool_call_stack = []
@@ -224,7 +335,7 @@ def run_agent(policy_number):
                     try:
                         while not queue.empty():
                             tool_data = queue.get_nowait()
-                            yield f"data: {json.dumps(tool_data)}\n\n"
+                            yield tool_data
                     except asyncio.QueueEmpty:
                         pass
                 
@@ -279,8 +390,9 @@ def run_agent(policy_number):
                         elif item.type == "tool_call_output_item":
                             # Convert tool output to string
                             # For agent tools, custom_output_extractor in insurance_claims_processing.py
-                            # ensures we get only the final output
-                            output_text = str(item.output)
+                            # ensures we get only the final output. The compact protocol spools
+                            # large outputs to disk and passes them on as a handle (see sse_protocol)
+                            output_text = encoder.spool(str(item.output))
                             
                             # Get corresponding tool call
                             matching_tool = None
@@ -300,11 +412,11 @@ def run_agent(policy_number):
                             data = {
                                 "type": "message",
                                 "agent_name": current_agent,
-                                "content": text
+                                "content": encoder.spool(text)
                             }
                     
                     if data:
-                        yield f"data: {json.dumps(data)}\n\n"
+                        yield data
                     
                     # Check queue again after processing event
                     async for msg in check_queue():
@@ -315,27 +427,67 @@ def run_agent(policy_number):
                     yield msg
                 
                 # Final result
-                final = str(streaming_result.final_output)
-                yield f"data: {json.dumps({'type': 'final', 'content': final})}\n\n"
+                final = encoder.spool(str(streaming_result.final_output))
+                await asyncio.to_thread(write_run_manifest, policy_number, run_id, "completed")
+                monitor.record({"type": "run_finished", "run_id": run_id, "status": "completed"})
+                yield {'type': 'final', 'content': final}
                 
+            except (GeneratorExit, asyncio.CancelledError):
+                # Client disconnected: stop the agent run, which cancels nested
+                # sub-agent runs and tool calls along with their pending HTTP requests
+                if streaming_result is not None:
+                    streaming_result.cancel()
+                await asyncio.to_thread(write_run_manifest, policy_number, run_id, "cancelled", reason="client_disconnected")
+                monitor.record({"type": "run_finished", "run_id": run_id, "status": "cancelled"})
+                raise
             except Exception as e:
                 traceback.print_exc()
-                yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+                await asyncio.to_thread(write_run_manifest, policy_number, run_id, "failed", error=str(e))
+                monitor.record({"type": "run_finished", "run_id": run_id, "status": "failed", "error": str(e)})
+                yield {'type': 'error', 'message': str(e)}
+            finally:
+                # Close the client so no pooled HTTP connections outlive the run
+                if client is not None:
+                    await client.close()
 
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        if profiler is not None:
+            profiler.start(loop)
         iter_async = run_async().__aiter__()
+        next_chunk = None
         try:
             while True:
+                if next_chunk is None:
+                    next_chunk = asyncio.ensure_future(iter_async.__anext__(), loop=loop)
+                # Wake up when a coalesced batch is due, and periodically so a
+                # disconnect is detected even mid model/OCR call
+                timeout = encoder.timeout()
+                loop.run_until_complete(asyncio.wait(
+                    {next_chunk}, timeout=SSE_HEARTBEAT_SECONDS if timeout is None else timeout
+                ))
+                if not next_chunk.done():
+                    yield encoder.flush() if encoder.pending else ": keep-alive\n\n"
+                    continue
                 try:
-                    chunk = loop.run_until_complete(iter_async.__anext__())
-                    yield chunk
+                    event = next_chunk.result()
                 except StopAsyncIteration:
+                    tail = encoder.flush()
+                    if tail:
+                        yield tail
                     break
+                next_chunk = None
+                frame = encoder.add(event)
+                if frame:
+                    yield frame
         except GeneratorExit:
-            # Client disconnected, clean up properly
+            # Client disconnected: cancel the step in flight, then close the generator
+            # so it can stop the run and record the cancellation
             try:
-                loop.run_until_complete(iter_async.aclose())
+                if next_chunk is not None and not next_chunk.done():
+                    next_chunk.cancel()
+                    loop.run_until_complete(asyncio.wait({next_chunk}, timeout=CANCEL_TIMEOUT_SECONDS))
+                loop.run_until_complete(asyncio.wait_for(iter_async.aclose(), CANCEL_TIMEOUT_SECONDS))
             except:
                 pass
         finally:
@@ -343,12 +495,116 @@ def run_agent(policy_number):
             pending = asyncio.all_tasks(loop)
             for task in pending:
                 task.cancel()
-            # Run loop one more time to allow cancellations to complete
+            # Give cancellations a bounded amount of time to complete
             if pending:
-                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.run_until_complete(asyncio.wait(pending, timeout=CANCEL_TIMEOUT_SECONDS))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            if profiler is not None:
+                profiler.stop()
             loop.close()
 
+    stream, headers = generate(), {}
+    if protocol == 'compact' and 'gzip' in accepted_encodings():
+        stream = gzip_stream(stream)
+        headers = {'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
+    return Response(stream_with_context(stream), mimetype='text/event-stream', headers=headers)
+
+@app.route('/api/payload/<payload_hash>')
+def get_payload(payload_hash):
+    """Serve a large event payload referenced from a compact-protocol stream."""
+    if not PAYLOAD_HASH_PATTERN.fullmatch(payload_hash):
+        return "Invalid payload reference", 400
+    text = get_payload_store().get(payload_hash)
+    if text is None:
+        return "Payload not found", 404
+    response = Response(text, mimetype='text/plain')
+    # Payloads are content-addressed, so they never change
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.set_etag(payload_hash)
+    return response.make_conditional(request)
+
+def ensure_job_workers():
+    """Start the job workers of this process (once); they also resume jobs interrupted by a restart."""
+    if JOB_WORKERS > 0:
+        start_job_workers(JOB_WORKERS, report=get_run_monitor().record)
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a claim as a durable job (JSON body: {"policy_number": ..., "tenant": ...}, the
+    tenant being optional). Returns 202 with the new job, or 200 with the policy's job
+    that is already active.
+    """
+    payload = request.get_json(silent=True) or {}
+    policy_number = payload.get('policy_number') or request.form.get('policy_number', '')
+    if not is_known_policy(policy_number):
+        return jsonify({"error": f"Unknown policy number '{policy_number}'"}), 404
+    tenant = payload.get('tenant') or request.form.get('tenant') or None
+    if tenant is not None and tenant not in get_instruction_registry().tenants:
+        return jsonify({"error": f"Unknown tenant '{tenant}'"}), 400
+    ensure_job_workers()
+    job, created = get_job_queue().submit(policy_number, tenant)
+    response = jsonify(job)
+    response.status_code = 202 if created else 200
+    response.headers['Location'] = f"/api/jobs/{job['job_id']}"
+    return response
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Status, completed stages and result of a job."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if not get_job_queue().cancel(job_id):
+        return jsonify({"error": "Job not found or already finished"}), 409
+    return jsonify(get_job_queue().get(job_id))
+
+@app.route('/api/jobs/<job_id>/events')
+def stream_job_events(job_id):
+    """
+    Stream the events of a job as SSE, from the start or after the sequence number
+    in the Last-Event-ID header (sent by EventSource on reconnect) or ?after=.
+    The stream ends once the job has finished and all its events were sent.
+    """
+    queue = get_job_queue()
+    if queue.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('after') or '0'
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+    
+    def generate():
+        last_seq, last_sent = after, time.monotonic()
+        while True:
+            # Read the status first: events recorded before a job finished are then always sent
+            finished = queue.get(job_id)['status'] in FINAL_STATUSES
+            events = queue.events(job_id, last_seq)
+            for seq, event in events:
+                yield f"id: {seq}\ndata: {json.dumps(event)}\n\n"
+                last_seq, last_sent = seq, time.monotonic()
+            if events:
+                continue
+            if finished:
+                break
+            if time.monotonic() - last_sent >= SSE_HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(JOB_POLL_SECONDS)
+    
     return Response(stream_with_context(generate()), mimetype='text/event-stream')
 
+# Under a WSGI server, start the job workers with the app only when JOB_WORKERS_AUTOSTART
+# is set, so tests and tools that import `app` do not start polling threads
+if JOB_WORKERS_AUTOSTART and __name__ != '__main__':
+    ensure_job_workers()
+
 if __name__ == '__main__':
+    # Start the job workers with the server, so jobs interrupted by a restart resume without
+    # waiting for a new submission. The debug reloader's parent process only watches files;
+    # the child process that serves requests runs the jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        ensure_job_workers()
     app.run(debug=True, port=5000)
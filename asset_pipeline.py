@@ -0,0 +1,206 @@
+"""
+Static asset pipeline for the web UI.
+
+- Generates resized WebP thumbnails of the agent avatars (requires Pillow).
+- Precompresses JS, CSS and JSON files to .gz (and .br when the brotli package is installed).
+- Serves static files with ETags, the precompressed variant the client accepts, and
+  long-lived immutable cache headers for versioned (?v=...) URLs.
+- Caches markdown content (README, agent instructions) in memory, invalidated by mtime.
+
+Assets are built when the web app starts; run `python asset_pipeline.py` to build them manually.
+"""
+
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+
+from flask import request, send_file, send_from_directory
+from werkzeug.security import safe_join
+from werkzeug.exceptions import NotFound
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+AVATAR_THUMBNAIL_SIZE = 200  # Avatars are shown at up to 100px, so 2x for high-DPI screens
+COMPRESSIBLE_EXTENSIONS = (".js", ".css", ".json", ".svg", ".md", ".txt")
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/plain", "text/markdown", "text/html", "text/css", "application/javascript")
+MIN_COMPRESS_BYTES = 1024  # Smaller responses are not worth compressing
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+
+def _is_stale(source: str, target: str) -> bool:
+    return not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source)
+
+
+def build_avatar_thumbnails(static_folder: str = STATIC_FOLDER) -> int:
+    """Generate WebP thumbnails in static/avatars/thumbs/. Returns the number of thumbnails written."""
+    try:
+        from PIL import Image
+    except ImportError:
+        print("  ⚠️ Pillow is not installed; skipping avatar thumbnails (the UI falls back to the PNGs)")
+        return 0
+
+    avatars_dir = os.path.join(static_folder, "avatars")
+    thumbs_dir = os.path.join(avatars_dir, "thumbs")
+    os.makedirs(thumbs_dir, exist_ok=True)
+
+    written = 0
+    for filename in os.listdir(avatars_dir):
+        if not filename.lower().endswith(".png"):
+            continue
+        source = os.path.join(avatars_dir, filename)
+        target = os.path.join(thumbs_dir, os.path.splitext(filename)[0] + ".webp")
+        if not _is_stale(source, target):
+            continue
+        with Image.open(source) as image:
+            image.thumbnail((AVATAR_THUMBNAIL_SIZE, AVATAR_THUMBNAIL_SIZE), Image.LANCZOS)
+            image.save(target, "WEBP", quality=80, method=6)
+        written += 1
+    return written
+
+
+def precompress_assets(static_folder: str = STATIC_FOLDER) -> int:
+    """Write .gz (and .br) variants of compressible static files. Returns the number of files written."""
+    written = 0
+    for root, _, files in os.walk(static_folder):
+        for filename in files:
+            if not filename.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            source = os.path.join(root, filename)
+            with open(source, "rb") as f:
+                data = f.read()
+            if _is_stale(source, source + ".gz"):
+                with open(source + ".gz", "wb") as f:
+                    f.write(gzip.compress(data, compresslevel=9, mtime=0))
+                written += 1
+            if brotli is not None and _is_stale(source, source + ".br"):
+                with open(source + ".br", "wb") as f:
+                    f.write(brotli.compress(data, quality=11))
+                written += 1
+    return written
+
+
+def compute_asset_version(static_folder: str = STATIC_FOLDER) -> str:
+    """Return a short hash of all static file names, sizes and mtimes, used to version asset URLs."""
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(static_folder)):
+        for filename in sorted(files):
+            if filename.endswith((".gz", ".br")):
+                continue
+            stat = os.stat(os.path.join(root, filename))
+            digest.update(f"{root}/{filename}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def build_assets(static_folder: str = STATIC_FOLDER) -> str:
+    """Build thumbnails and compressed variants, and return the asset version."""
+    thumbnails = build_avatar_thumbnails(static_folder)
+    compressed = precompress_assets(static_folder)
+    if thumbnails or compressed:
+        print(f"  🗜️ Built {thumbnails} avatar thumbnails and {compressed} compressed assets")
+    return compute_asset_version(static_folder)
+
+
+# ============================================================================
+# SERVING
+# ============================================================================
+
+
+def accepted_encodings() -> list[str]:
+    """
+    Return the content encodings the client accepts that we can produce, best first.
+    Encodings with q=0 are refused, and `*` covers the ones not listed; on equal quality
+    brotli is preferred, since it compresses better.
+    """
+    accept = request.accept_encodings
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    quality = {encoding: accept.quality(encoding) for encoding in candidates}
+    return sorted((encoding for encoding in candidates if quality[encoding] > 0), key=lambda encoding: -quality[encoding])
+
+
+def send_static_asset(directory: str, filename: str):
+    """
+    Send a static file with an ETag, using a precompressed variant when the client
+    accepts it. Versioned URLs (?v=...) are cached as immutable; others revalidate.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+
+    response = None
+    for encoding in accepted_encodings():
+        compressed_path = path + (".br" if encoding == "br" else ".gz")
+        if os.path.isfile(compressed_path) and not _is_stale(path, compressed_path):
+            response = send_file(compressed_path, mimetype=mimetypes.guess_type(path)[0], conditional=True, etag=True)
+            response.headers["Content-Encoding"] = encoding
+            break
+    if response is None:
+        response = send_from_directory(directory, filename, conditional=True, etag=True)
+
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if request.args.get("v") else REVALIDATE_CACHE_CONTROL
+    return response
+
+
+def compress_response(response):
+    """after_request hook: gzip/brotli-compress JSON and text responses that are not already encoded."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code >= 300
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    encodings = accepted_encodings()
+    data = response.get_data()
+    if not encodings or len(data) < MIN_COMPRESS_BYTES:
+        return response
+
+    if encodings[0] == "br":
+        response.set_data(brotli.compress(data))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers["Content-Encoding"] = encodings[0]
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+# ============================================================================
+# IN-MEMORY CONTENT CACHE
+# ============================================================================
+
+_text_cache: dict[str, tuple[int, str]] = {}
+_text_cache_lock = threading.Lock()
+
+
+def read_text_cached(path: str) -> str:
+    """Read a UTF-8 text file, serving it from memory until its mtime changes."""
+    mtime = os.stat(path).st_mtime_ns
+    with _text_cache_lock:
+        cached = _text_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    with _text_cache_lock:
+        _text_cache[path] = (mtime, content)
+    return content
+
+
+if __name__ == "__main__":
+    print(f"Asset version: {build_assets()}")
@@ -0,0 +1,328 @@
+"""
+Multi-process sharded batch execution of insurance claims.
+
+Policy numbers are split into shards, one per worker process. Each worker is
+shared-nothing: it creates its own Azure OpenAI / Document Intelligence clients
+and processes its shard with a few claims in flight at a time. A central
+coordinator process enforces the global request rate limits for all workers
+and merges their progress reports into one console view and the run event log
+shown on the web dashboard (/dashboard).
+
+Usage:
+    python batch_runner.py POL123456 POL111222 --workers 2
+    python batch_runner.py --all --workers 8 --concurrency 4 --model-rpm 300
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.managers import SyncManager
+
+from openai import AsyncAzureOpenAI
+from agents import Model, Runner
+
+import insurance_claims_processing
+from scenario_index import get_scenario_index
+from instruction_templates import get_instruction_registry
+from run_monitor import RunEventLog, new_run_id
+from insurance_claims_processing import (
+    SCENARIOS_FOLDER,
+    OUTPUTS_FOLDER,
+    create_agents,
+    create_model_config,
+    create_run_config,
+    write_output_file,
+    write_run_manifest,
+    tool_tracer,
+    run_policy_number,
+)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Global request limits (requests per minute, across all workers); 0 disables a limit
+BATCH_MODEL_RPM = int(os.getenv("BATCH_MODEL_RPM", "0"))
+BATCH_DOCUMENT_RPM = int(os.getenv("BATCH_DOCUMENT_RPM", "0"))
+
+# Claims processed concurrently inside each worker process
+BATCH_CLAIMS_PER_WORKER = int(os.getenv("BATCH_CLAIMS_PER_WORKER", "2"))
+
+
+# ============================================================================
+# COORDINATOR
+# ============================================================================
+
+
+class GlobalRateLimiter:
+    """
+    Sliding-window request limits shared by all worker processes.
+    Lives in the coordinator process; workers call it through a manager proxy.
+    """
+
+    def __init__(self, limits: dict[str, int]):
+        self.limits = {resource: limit for resource, limit in limits.items() if limit}
+        self.slots = {resource: deque() for resource in self.limits}
+        self.lock = threading.Lock()
+
+    def reserve(self, resource: str) -> float:
+        """Reserve the next request slot for a resource and return how long to wait for it."""
+        limit = self.limits.get(resource)
+        if not limit:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            slots = self.slots[resource]
+            while slots and slots[0] <= now - 60:
+                slots.popleft()
+            # At most `limit` requests may start in any 60 second window
+            slot = now if len(slots) < limit else max(now, slots[-limit] + 60)
+            slots.append(slot)
+            return slot - now
+
+
+class CoordinatorManager(SyncManager):
+    """Manager process serving the shared rate limiter and progress queue."""
+
+
+CoordinatorManager.register("GlobalRateLimiter", GlobalRateLimiter)
+
+
+class RateLimitedModel(Model):
+    """Model wrapper that waits for the global rate limiter before each request."""
+
+    def __init__(self, model: Model):
+        self.model = model
+
+    async def get_response(self, *args, **kwargs):
+        await insurance_claims_processing.acquire_rate_limit("model")
+        return await self.model.get_response(*args, **kwargs)
+
+    async def stream_response(self, *args, **kwargs):
+        await insurance_claims_processing.acquire_rate_limit("model")
+        async for event in self.model.stream_response(*args, **kwargs):
+            yield event
+
+
+# ============================================================================
+# WORKER PROCESS
+# ============================================================================
+
+_progress_queue = None
+
+
+def _init_worker(rate_limiter, progress_queue):
+    """Pool initializer: connect this worker to the coordinator."""
+    global _progress_queue
+    _progress_queue = progress_queue
+    insurance_claims_processing.set_rate_limiter(rate_limiter)
+
+
+def _report(event: dict):
+    """Send a run event (see run_monitor.py) to the coordinator."""
+    _progress_queue.put({**event, "pid": os.getpid(), "time": time.time()})
+
+
+async def _process_claim(policy_number: str, model_config, semaphore: asyncio.Semaphore, tenant: str | None) -> dict:
+    """Run the full workflow for one claim and return its outcome."""
+    async with semaphore:
+        run_id = new_run_id()
+        _report({"type": "run_started", "run_id": run_id, "policy_number": policy_number, "source": "batch"})
+        await asyncio.to_thread(write_run_manifest, policy_number, run_id, "running", source="batch", worker_pid=os.getpid())
+
+        # Forward tool, stage and model call events to the coordinator
+        def report_event(event: dict):
+            _report({**event, "run_id": run_id, "policy_number": policy_number})
+
+        tool_tracer.set(report_event)
+        run_policy_number.set(policy_number)
+
+        started = time.perf_counter()
+        try:
+            claims_manager = await create_agents(model_config, tenant)
+            user_request = f"Process the insurance claim for policy number {policy_number}. Execute the full workflow."
+            result = await Runner.run(claims_manager, user_request, run_config=create_run_config())
+            write_output_file(policy_number, "agent_summaries", "final_summary.md", str(result.final_output))
+            await asyncio.to_thread(write_run_manifest, policy_number, run_id, "completed")
+            outcome = {"policy_number": policy_number, "status": "completed"}
+        except Exception as e:
+            await asyncio.to_thread(write_run_manifest, policy_number, run_id, "failed", error=str(e))
+            outcome = {"policy_number": policy_number, "status": "failed", "error": str(e)}
+
+        outcome["duration_seconds"] = round(time.perf_counter() - started, 2)
+        _report({"type": "run_finished", "run_id": run_id, **outcome})
+        return outcome
+
+
+async def _process_shard(policy_numbers: list[str], concurrency: int, tenant: str | None) -> list[dict]:
+    # Per-process clients: nothing is shared with other workers
+    client = AsyncAzureOpenAI(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    )
+    try:
+        model_config = RateLimitedModel(create_model_config(client))
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(
+            _process_claim(policy_number, model_config, semaphore, tenant) for policy_number in policy_numbers
+        ))
+    finally:
+        await client.close()
+
+
+def run_shard(policy_numbers: list[str], concurrency: int, tenant: str | None = None) -> list[dict]:
+    """Process one shard of claims in this worker process."""
+    return asyncio.run(_process_shard(policy_numbers, concurrency, tenant))
+
+
+# ============================================================================
+# BATCH EXECUTION
+# ============================================================================
+
+
+def shard_policies(policy_numbers: list[str], shard_count: int) -> list[list[str]]:
+    """Split policy numbers round-robin into at most `shard_count` non-empty shards."""
+    shards = [policy_numbers[i::shard_count] for i in range(shard_count)]
+    return [shard for shard in shards if shard]
+
+
+def _print_progress(progress_queue, total: int):
+    """
+    Merge progress reports from all workers into one console view, and append them
+    to the run event log followed by the web dashboard.
+    """
+    done = failed = 0
+    event_log = RunEventLog()
+    try:
+        while True:
+            event = progress_queue.get()
+            if event is None:
+                return
+            event_log.append(event)
+            kind = event["type"]
+            if kind == "run_started":
+                print(f"  ▶️  {event['policy_number']} started (worker {event['pid']})")
+            elif kind == "internal_tool_result" and event["status"] != "ok":
+                print(f"  ⚠️  {event['policy_number']}: {event['tool_name']} {event['status']} after {event['duration_ms']} ms")
+            elif kind == "run_finished":
+                done += 1
+                failed += event["status"] == "failed"
+                icon = "✅" if event["status"] == "completed" else "❌"
+                print(f"  {icon} [{done}/{total}, {failed} failed] {event['policy_number']} {event['status']} "
+                      f"in {event['duration_seconds']}s (worker {event['pid']})")
+    finally:
+        event_log.close()
+
+
+def run_batch(policy_numbers: list[str], workers: int, concurrency: int = BATCH_CLAIMS_PER_WORKER,
+              model_rpm: int = BATCH_MODEL_RPM, document_rpm: int = BATCH_DOCUMENT_RPM,
+              tenant: str | None = None) -> list[dict]:
+    """
+    Process claims across a pool of worker processes and return one outcome per claim.
+    `tenant` selects the variables the agent instructions are rendered with (see instruction_templates.py).
+    A worker process that dies fails only the claims of its own shard; the batch summary is written either way.
+    """
+    # Each claim runs once, however often it was listed
+    policy_numbers = list(dict.fromkeys(policy_numbers))
+    insurance_claims_processing.print_heading(
+        f"📦 Batch: {len(policy_numbers)} claims on {workers} workers x {concurrency} concurrent claims"
+    )
+    started = time.perf_counter()
+
+    results = []
+    try:
+        with CoordinatorManager() as manager:
+            rate_limiter = manager.GlobalRateLimiter({"model": model_rpm, "document_intelligence": document_rpm})
+            progress_queue = manager.Queue()
+            printer = threading.Thread(target=_print_progress, args=(progress_queue, len(policy_numbers)), daemon=True)
+            printer.start()
+
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(rate_limiter, progress_queue),
+                ) as pool:
+                    shards = {
+                        pool.submit(run_shard, shard, concurrency, tenant): shard
+                        for shard in shard_policies(policy_numbers, workers)
+                    }
+                    for future in as_completed(shards):
+                        try:
+                            results.extend(future.result())
+                        except Exception as e:
+                            # e.g. BrokenProcessPool when a worker process dies
+                            shard = shards[future]
+                            print(f"  ❌ Worker failed with {len(shard)} claims in its shard: {e!r}")
+                            results.extend(
+                                {"policy_number": policy_number, "status": "failed", "error": f"Worker failed: {e!r}"}
+                                for policy_number in shard
+                            )
+            finally:
+                progress_queue.put(None)
+                printer.join()
+    finally:
+        elapsed = time.perf_counter() - started
+        summary = _write_batch_summary(results, workers, concurrency, elapsed)
+
+    insurance_claims_processing.print_heading("📊 Batch Summary")
+    print(f"{summary['completed']}/{len(results)} claims completed in {elapsed:.1f}s "
+          f"({summary['claims_per_minute']} claims/minute)")
+    return results
+
+
+def _write_batch_summary(results: list[dict], workers: int, concurrency: int, elapsed: float) -> dict:
+    """Write outputs/batch_summary.json for the claims processed so far and return it."""
+    completed = sum(1 for r in results if r["status"] == "completed")
+    summary = {
+        "claims": len(results),
+        "completed": completed,
+        "failed": len(results) - completed,
+        "workers": workers,
+        "concurrency_per_worker": concurrency,
+        "elapsed_seconds": round(elapsed, 2),
+        "claims_per_minute": round(len(results) / elapsed * 60, 2) if elapsed else None,
+        "results": sorted(results, key=lambda r: r["policy_number"]),
+    }
+    os.makedirs(OUTPUTS_FOLDER, exist_ok=True)
+    with open(os.path.join(OUTPUTS_FOLDER, "batch_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Process insurance claims in parallel worker processes.")
+    parser.add_argument("policy_numbers", nargs="*", help="Policy numbers to process")
+    parser.add_argument("--all", action="store_true", help="Process every scenario in the scenarios folder")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CLAIMS_PER_WORKER, help="Concurrent claims per worker")
+    parser.add_argument("--model-rpm", type=int, default=BATCH_MODEL_RPM, help="Global model requests per minute (0 = unlimited)")
+    parser.add_argument("--document-rpm", type=int, default=BATCH_DOCUMENT_RPM, help="Global Document Intelligence requests per minute (0 = unlimited)")
+    parser.add_argument("--tenant", help="Tenant whose variables the agent instructions are rendered with (see instructions/variables.json)")
+    args = parser.parse_args(argv)
+
+    policy_numbers = list(args.policy_numbers)
+    if args.all:
+        policy_numbers += get_scenario_index(SCENARIOS_FOLDER).list_scenarios()[0]
+    if not policy_numbers:
+        parser.error("no policy numbers given (pass them as arguments or use --all)")
+    # Checked up front; otherwise every claim would fail in the workers
+    if args.tenant is not None and args.tenant not in get_instruction_registry().tenants:
+        known = ", ".join(get_instruction_registry().tenants) or "none"
+        parser.error(f"unknown tenant '{args.tenant}' (known tenants: {known})")
+
+    results = run_batch(policy_numbers, max(1, args.workers), args.concurrency, args.model_rpm, args.document_rpm, args.tenant)
+    return 0 if all(r["status"] == "completed" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+Rule-based claims decision fast path.
+
+Evaluates the saved results of the earlier stages (ID verification, coverage and
+medical assessment) against configurable rules. Unambiguous claims are approved
+or declined directly; anything else is escalated to the ClaimsDecision agent.
+
+Rules are read from 'decision_rules.json' (or the file named by DECISION_RULES_PATH):
+
+    {
+        "enabled": true,
+        "auto_approve": {                      # every condition must hold
+            "id_verification": ["PASSED"],
+            "coverage_assessment": ["COVERED"],
+            "medical_assessment": ["VALID"],
+            "max_claim_amount": {"£": 50000}   # per currency symbol; claims in any
+        },                                     # other currency are escalated
+        "auto_decline": {                      # any listed status is enough
+            "id_verification": ["FAILED"],
+            "coverage_assessment": ["NOT COVERED"],
+            "medical_assessment": ["INVALID"]
+        },
+        "early_termination": {                 # hard-fail statuses that skip the remaining
+            "enabled": true,                   # assessment stages (see early_termination_reason)
+            "id_verification": ["FAILED"],
+            "coverage_assessment": ["NOT COVERED"]
+        }
+    }
+"""
+
+import os
+import re
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+DECISION_RULES_PATH = os.getenv("DECISION_RULES_PATH", str(Path(__file__).parent / "decision_rules.json"))
+
+DEFAULT_DECISION_RULES = {
+    "enabled": True,
+    "auto_approve": {
+        "id_verification": ["PASSED"],
+        "coverage_assessment": ["COVERED"],
+        "medical_assessment": ["VALID"],
+        "max_claim_amount": {"£": 50000},
+    },
+    "auto_decline": {
+        "id_verification": ["FAILED"],
+        "coverage_assessment": ["NOT COVERED"],
+        "medical_assessment": ["INVALID"],
+    },
+    "early_termination": {
+        "enabled": True,
+        "id_verification": ["FAILED"],
+        "coverage_assessment": ["NOT COVERED"],
+    },
+}
+
+# Overall status markers written at the top of each assessment (see instructions/*.md)
+STATUS_PATTERNS = {
+    "id_verification": re.compile(r"\*\*(PASSED|FAILED|PARTIAL)\*\*"),
+    "coverage_assessment": re.compile(r"\*\*(NOT COVERED|PARTIALLY COVERED|COVERED)\*\*"),
+    "medical_assessment": re.compile(r"\*\*(VALID|QUESTIONABLE|INVALID)\*\*"),
+}
+
+STAGE_TITLES = {
+    "id_verification": "ID Verification",
+    "coverage_assessment": "Coverage Assessment",
+    "medical_assessment": "Medical Assessment",
+}
+
+CLAIMED_AMOUNT_PATTERN = re.compile(r"Total Claimed Amount[^\n]*?([£$€])\s*([\d,]+(?:\.\d+)?)", re.IGNORECASE)
+
+# Currency of a max_claim_amount given as a plain number
+DEFAULT_CURRENCY = "£"
+
+
+@dataclass
+class RuleDecision:
+    """Outcome of evaluating the decision rules for a claim."""
+
+    outcome: str | None  # "APPROVE", "DECLINE", or None to escalate to the LLM
+    statuses: dict[str, str | None]
+    claimed_amount: float | None
+    currency: str | None  # Symbol of the claimed amount, as written in the coverage assessment
+    reasons: list[str] = field(default_factory=list)
+    terminated_early: bool = False  # Later assessments were skipped by the early-termination policy
+
+
+def load_decision_rules(path: str = DECISION_RULES_PATH) -> dict:
+    """Load the decision rules, falling back to the defaults if no rules file exists."""
+    if not os.path.exists(path):
+        return DEFAULT_DECISION_RULES
+    with open(path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    _check_claim_amount_limits(path, rules)
+    return rules
+
+
+def _check_claim_amount_limits(path: str, rules: dict):
+    """Reject auto-approval limits that are not numbers, rather than failing mid-decision."""
+    limits = rules.get("auto_approve", {}).get("max_claim_amount")
+    if limits is None:
+        return
+    if not isinstance(limits, dict):
+        limits = {DEFAULT_CURRENCY: limits}
+    for currency, limit in limits.items():
+        if isinstance(limit, bool) or not isinstance(limit, (int, float)):
+            raise ValueError(f"{path}: max_claim_amount for {currency} must be a number, got {limit!r}")
+
+
+def parse_status(stage: str, text: str | None) -> str | None:
+    """Return the overall status marker of an assessment, or None if it cannot be found."""
+    if not text:
+        return None
+    match = STATUS_PATTERNS[stage].search(text)
+    return match.group(1) if match else None
+
+
+def parse_claimed_amount(text: str | None) -> tuple[float | None, str | None]:
+    """Return the total claimed amount reported by the coverage assessment and its currency symbol, if present."""
+    if not text:
+        return None, None
+    match = CLAIMED_AMOUNT_PATTERN.search(text)
+    if not match:
+        return None, None
+    try:
+        return float(match.group(2).replace(",", "")), match.group(1)
+    except ValueError:
+        return None, None
+
+
+def claim_amount_limit(rules: dict, currency: str | None) -> float | None:
+    """Return the auto-approval limit for claims in a currency, or None if the rules set none."""
+    limits = rules.get("auto_approve", {}).get("max_claim_amount")
+    if not isinstance(limits, dict):
+        limits = {DEFAULT_CURRENCY: limits}
+    return limits.get(currency)
+
+
+def early_termination_reason(results: dict[str, str], rules: dict | None = None) -> tuple[str, str] | None:
+    """
+    Check completed assessments against the early-termination policy. Returns the stage
+    with a hard-fail status and the reason, or None if the workflow should continue.
+    Only pass the results of stages that ran in the current workflow.
+    """
+    rules = rules if rules is not None else load_decision_rules()
+    policy = rules.get("early_termination", {})
+    if not policy.get("enabled", False):
+        return None
+    for stage in STATUS_PATTERNS:
+        hard_fail = policy.get(stage)
+        status = parse_status(stage, results.get(stage))
+        if hard_fail and status in hard_fail:
+            return stage, f"{STAGE_TITLES[stage]} status is {status}."
+    return None
+
+
+def evaluate_decision_rules(results: dict[str, str], rules: dict | None = None) -> RuleDecision:
+    """
+    Evaluate the assessment results of a claim (as returned by read_all_assessment_results).
+    A decline rule takes precedence over an approval; if neither applies the claim is escalated.
+    """
+    rules = rules if rules is not None else load_decision_rules()
+    statuses = {stage: parse_status(stage, results.get(stage)) for stage in STATUS_PATTERNS}
+    claimed_amount, currency = parse_claimed_amount(results.get("coverage_assessment"))
+    decision = RuleDecision(outcome=None, statuses=statuses, claimed_amount=claimed_amount, currency=currency,
+                            terminated_early="early_termination" in results)
+
+    if not rules.get("enabled", True):
+        decision.reasons.append("Decision rules are disabled.")
+        return decision
+
+    # Auto-decline: any hard-fail status is enough
+    for stage, declined in rules.get("auto_decline", {}).items():
+        if statuses.get(stage) in declined:
+            decision.reasons.append(f"{STAGE_TITLES[stage]} status is {statuses[stage]}.")
+    if decision.reasons:
+        decision.outcome = "DECLINE"
+        if decision.terminated_early:
+            decision.reasons.append("The remaining assessments were skipped by the early-termination policy.")
+        return decision
+
+    # Auto-approve: every stage must have an approvable status and the amount must be within limits
+    approve = rules.get("auto_approve", {})
+    for stage in STATUS_PATTERNS:
+        allowed = approve.get(stage)
+        if allowed is not None and statuses[stage] not in allowed:
+            if statuses[stage] is None and decision.terminated_early:
+                decision.reasons.append(f"{STAGE_TITLES[stage]} was skipped by the early-termination policy.")
+            else:
+                decision.reasons.append(f"{STAGE_TITLES[stage]} status {statuses[stage] or 'unknown'} needs review.")
+    if approve.get("max_claim_amount") is not None:
+        max_amount = claim_amount_limit(rules, currency)
+        if claimed_amount is None:
+            decision.reasons.append("Total claimed amount could not be determined.")
+        elif max_amount is None:
+            decision.reasons.append(f"No auto-approval limit is set for claims in {currency}.")
+        elif claimed_amount > max_amount:
+            decision.reasons.append(
+                f"Claimed amount {currency}{claimed_amount:,.2f} exceeds the {currency}{max_amount:,.2f} auto-approval limit."
+            )
+    if decision.reasons:
+        return decision
+
+    decision.outcome = "APPROVE"
+    decision.reasons.append("All assessments passed and the claimed amount is within policy limits.")
+    return decision
+
+
+def render_decision(policy_number: str, decision: RuleDecision) -> str:
+    """Render a rule-based decision in the ClaimsDecision output format."""
+    headline = "✅ **APPROVED**" if decision.outcome == "APPROVE" else "❌ **DECLINED**"
+    amount = f"{decision.currency}{decision.claimed_amount:,.2f}" if decision.claimed_amount is not None else "not stated"
+
+    rows = "\n".join(
+        f"| {STAGE_TITLES[stage]:<20} | {status or ('Skipped' if decision.terminated_early else 'Unknown'):<21} | "
+        f"{'From saved assessment' if status else 'Not assessed':<35} |"
+        for stage, status in decision.statuses.items()
+    )
+    recommendation = (
+        f"Approve payment of {amount}." if decision.outcome == "APPROVE"
+        else "Decline the claim."
+    )
+    rationale = "\n".join(f"- {reason}" for reason in decision.reasons)
+
+    return f"""### Final Claim Decision
+
+{headline}
+
+#### Summary Table
+
+| Assessment Area      | Status                | Key Findings                        |
+|----------------------|-----------------------|-------------------------------------|
+{rows}
+
+#### Executive Summary
+
+- Claim for policy {policy_number} was decided automatically by the claims decision rules.
+- Total claimed amount: {amount}. Recommendation: {recommendation}
+
+#### Decision Rationale
+
+{rationale}
+- See the individual assessments for full details.
+"""
@@ -0,0 +1,586 @@
+"""
+Synthetic claim scenario generator for scale and performance testing.
+
+Writes one folder per synthetic policy into the scenarios folder, with:
+- hospital_invoice.pdf and discharge_summary.pdf (text PDFs of 1 to --max-pages pages)
+- drivers_license.png / .jpg at varying resolutions (omitted for "missing ID" claims)
+- sometimes a photographed payment_receipt.jpg
+
+Policy holder records (matching, or deliberately mismatching the licence) are
+written to POLICY_HOLDERS_FILE, which get_policy_holder_details reads, and the
+expected outcome of every claim to a ground-truth file outside the scenarios folder.
+
+Output is reproducible: scenario N depends only on (--seed, N), so growing the
+count keeps the earlier scenarios byte-identical.
+
+Usage:
+    python generate_scenarios.py generate --count 2000 --seed 7
+    python batch_runner.py --all --workers 8
+    python generate_scenarios.py score
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+from insurance_claims_processing import SCENARIOS_FOLDER, OUTPUTS_FOLDER, POLICY_HOLDERS_FILE, MOCK_POLICY_HOLDERS
+
+GROUND_TRUTH_FILE = os.path.join(OUTPUTS_FOLDER, "ground_truth.json")
+
+# Share of each claim variant; see build_claim()
+SCENARIO_MIX = {
+    "approve": 0.50,
+    "id_mismatch": 0.12,
+    "not_covered": 0.12,
+    "medical_invalid": 0.12,
+    "missing_id": 0.14,
+}
+
+# Expected final decision and stage statuses per variant
+EXPECTED_OUTCOMES = {
+    "approve": ("APPROVE", {"id_verification": "PASSED", "coverage_assessment": "COVERED", "medical_assessment": "VALID"}),
+    "id_mismatch": ("DECLINE", {"id_verification": "FAILED"}),
+    "not_covered": ("DECLINE", {"coverage_assessment": "NOT COVERED"}),
+    "medical_invalid": ("DECLINE", {"medical_assessment": "INVALID"}),
+    "missing_id": ("MORE INFO", {}),
+}
+
+# ============================================================================
+# REFERENCE DATA
+# ============================================================================
+
+FIRST_NAMES = {
+    "Female": ["Alice", "Emma", "Olivia", "Sophie", "Grace", "Hannah", "Priya", "Chloe", "Amara", "Zoe", "Isla", "Mei"],
+    "Male": ["James", "Oliver", "Harry", "Daniel", "Samuel", "Arjun", "Thomas", "Kwame", "Lucas", "Ethan", "Ravi", "Leo"],
+}
+SURNAMES = ["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Patel", "Evans", "Thomas", "Roberts",
+            "Khan", "Walker", "Wright", "Okafor", "Hughes", "Clarke", "Nguyen", "Hall", "Green", "Edwards"]
+STREETS = ["High Street", "Station Road", "Church Lane", "Victoria Road", "Park Avenue", "Mill Lane", "King Street",
+           "Queens Road", "Manor Way", "Elm Grove"]
+TOWNS = ["London", "Manchester", "Bristol", "Leeds", "Birmingham", "Cambridge", "Brighton", "York", "Norwich", "Bath"]
+HOSPITALS = ["St Mary's Hospital", "Royal Free Hospital", "Riverside General Hospital", "Northfield NHS Trust",
+             "Kingsbridge Private Clinic", "Westgate Medical Centre"]
+
+# Covered conditions: diagnosis, procedures, discharge medications and invoice items (description, min £, max £)
+CONDITIONS = [
+    {
+        "diagnosis": "Acute appendicitis",
+        "procedures": ["Laparoscopic appendectomy"],
+        "medications": ["Co-amoxiclav 625 mg three times daily for 5 days", "Paracetamol 1 g as required"],
+        "items": [("Surgeon fee - laparoscopic appendectomy", 2200, 3800), ("Anaesthesia", 600, 1100),
+                  ("Theatre charges", 1200, 2400), ("Ward accommodation (per night)", 450, 900),
+                  ("Blood tests and CRP", 80, 220), ("Abdominal ultrasound", 180, 350)],
+    },
+    {
+        "diagnosis": "Displaced fracture of the left distal radius",
+        "procedures": ["Open reduction and internal fixation (ORIF)"],
+        "medications": ["Codeine 30 mg four times daily as required", "Ibuprofen 400 mg three times daily"],
+        "items": [("Orthopaedic surgeon fee - ORIF", 2500, 4200), ("Anaesthesia", 550, 1000),
+                  ("Implant: volar locking plate", 900, 1600), ("X-ray (wrist, 3 views)", 90, 200),
+                  ("Ward accommodation (per night)", 450, 900), ("Physiotherapy session", 60, 120)],
+    },
+    {
+        "diagnosis": "Community-acquired pneumonia",
+        "procedures": ["Intravenous antibiotic therapy", "Chest X-ray"],
+        "medications": ["Amoxicillin 500 mg three times daily for 7 days", "Salbutamol inhaler as required"],
+        "items": [("Consultant physician review", 250, 450), ("IV antibiotics (per day)", 120, 300),
+                  ("Chest X-ray", 90, 180), ("Ward accommodation (per night)", 450, 900),
+                  ("Blood cultures and FBC", 90, 240), ("Oxygen therapy (per day)", 60, 150)],
+    },
+    {
+        "diagnosis": "Gallstone pancreatitis",
+        "procedures": ["Laparoscopic cholecystectomy"],
+        "medications": ["Omeprazole 20 mg once daily", "Paracetamol 1 g as required"],
+        "items": [("Surgeon fee - laparoscopic cholecystectomy", 2600, 4500), ("Anaesthesia", 600, 1100),
+                  ("Theatre charges", 1300, 2600), ("Ward accommodation (per night)", 450, 900),
+                  ("CT abdomen", 350, 700), ("Liver function tests", 60, 150)],
+    },
+    {
+        "diagnosis": "Torn anterior cruciate ligament (right knee)",
+        "procedures": ["Arthroscopic ACL reconstruction"],
+        "medications": ["Naproxen 500 mg twice daily", "Dalteparin 5000 units once daily for 14 days"],
+        "items": [("Orthopaedic surgeon fee - ACL reconstruction", 3200, 5200), ("Anaesthesia", 600, 1100),
+                  ("Graft and fixation devices", 800, 1500), ("MRI knee", 300, 650),
+                  ("Day-case theatre charges", 1100, 2200), ("Physiotherapy session", 60, 120)],
+    },
+]
+
+# Conditions excluded by the policy (cosmetic, not medically necessary)
+EXCLUDED_CONDITIONS = [
+    {
+        "diagnosis": "Elective cosmetic rhinoplasty (no functional impairment)",
+        "procedures": ["Cosmetic rhinoplasty"],
+        "medications": ["Paracetamol 1 g as required"],
+        "items": [("Cosmetic surgeon fee - rhinoplasty", 4000, 6500), ("Anaesthesia", 600, 1100),
+                  ("Theatre charges", 1200, 2200), ("Ward accommodation (per night)", 450, 900)],
+    },
+    {
+        "diagnosis": "Elective abdominoplasty for cosmetic reasons",
+        "procedures": ["Abdominoplasty"],
+        "medications": ["Co-codamol 30/500 as required"],
+        "items": [("Cosmetic surgeon fee - abdominoplasty", 5000, 8000), ("Anaesthesia", 700, 1200),
+                  ("Theatre charges", 1400, 2600), ("Compression garments", 80, 200)],
+    },
+]
+
+# Smaller per-use charges that make long, multi-page invoices
+WARD_CHARGES = [
+    ("Dressings and wound care consumables", 5, 60),
+    ("Ward medication dose", 2, 35),
+    ("Nursing observations", 10, 40),
+    ("Cannula and IV giving set", 8, 30),
+    ("Pathology sample processing", 12, 55),
+    ("Meals and accommodation extras", 6, 25),
+]
+
+CLINICAL_NOTES = [
+    "The patient was reviewed by the on-call team and observations were stable throughout.",
+    "Pain was well controlled with simple analgesia and the patient mobilised independently.",
+    "Wound inspected on the ward round; clean and dry with no signs of infection.",
+    "Inflammatory markers trended down and the patient tolerated a normal diet.",
+    "Venous thromboembolism prophylaxis was given in line with local guidelines.",
+    "The patient and family were counselled regarding the diagnosis and post-operative care.",
+    "Physiotherapy assessment completed; safe for discharge home with advice leaflet.",
+    "No complications were noted during the admission.",
+    "Observations: heart rate and blood pressure within normal limits, afebrile.",
+    "Fluid balance was monitored and intravenous fluids were stopped on day two.",
+]
+
+# ============================================================================
+# PDF WRITER
+# ============================================================================
+
+PDF_LINES_PER_PAGE = 52
+
+
+def _pdf_text(text: str) -> bytes:
+    """Encode a line for a PDF string literal (Helvetica with WinAnsiEncoding, so £ works)."""
+    data = text.encode("cp1252", errors="replace")
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def write_pdf(path: str, lines: list[str], title: str):
+    """Write a minimal text-only PDF, paginating `lines` (no timestamps, so output is deterministic)."""
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for number, page_lines in enumerate(pages, start=1):
+        stream = [b"BT /F2 14 Tf 50 800 Td (" + _pdf_text(title) + b") Tj ET",
+                  b"BT /F1 10 Tf 14 TL 50 776 Td"]
+        for line in page_lines:
+            stream.append(b"(" + _pdf_text(line) + b") Tj T*")
+        stream.append(b"ET")
+        stream.append(b"BT /F1 8 Tf 50 30 Td (" + _pdf_text(f"Page {number} of {len(pages)}") + b") Tj ET")
+        content = b"\n".join(stream)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(page_ids)
+    )
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+# ============================================================================
+# IMAGES
+# ============================================================================
+
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def write_licence_image(path: str, holder: dict, rng: random.Random):
+    """Render a driving licence card; resolution and format vary to exercise extraction."""
+    width = rng.choice([800, 1200, 1600, 2400])
+    height = int(width * 0.63)
+    scale = width / 800
+    image = Image.new("RGB", (width, height), (236, 214, 222))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, width, int(70 * scale)], fill=(40, 70, 140))
+    draw.text((int(20 * scale), int(18 * scale)), "DRIVING LICENCE  UK", fill="white", font=_font(int(30 * scale)))
+    draw.rectangle([int(30 * scale), int(100 * scale), int(230 * scale), int(360 * scale)], fill=(190, 190, 200))
+    draw.text((int(95 * scale), int(215 * scale)), "PHOTO", fill=(120, 120, 130), font=_font(int(22 * scale)))
+
+    surname, forenames = holder["name"].split(" ", 1)[1], holder["name"].split(" ", 1)[0]
+    dob = date.fromisoformat(holder["dob"])
+    fields = [
+        f"1. {surname.upper()}",
+        f"2. {forenames.upper()}",
+        f"3. {dob.strftime('%d.%m.%Y')}  UNITED KINGDOM",
+        f"4a. {(dob + timedelta(days=365 * 18 + 200)).strftime('%d.%m.%Y')}",
+        f"5. {holder['licence_number']}",
+        f"8. {holder['address']}",
+        "9. AM/A/B/BE/F/K/Q",
+    ]
+    font = _font(int(22 * scale))
+    for i, text in enumerate(fields):
+        draw.text((int(260 * scale), int((110 + i * 40) * scale)), text, fill=(20, 20, 20), font=font)
+
+    if path.endswith(".jpg"):
+        image.save(path, "JPEG", quality=rng.choice([70, 85, 95]))
+    else:
+        image.save(path, "PNG")
+
+
+def write_receipt_image(path: str, claim: dict, rng: random.Random):
+    """Render a photographed card payment receipt for the invoice total."""
+    width = rng.choice([600, 900, 1200])
+    scale = width / 600
+    lines = [
+        claim["hospital"],
+        "CARD PAYMENT RECEIPT",
+        "",
+        f"Invoice: {claim['invoice_number']}",
+        f"Patient: {claim['patient']['name']}",
+        f"Date: {claim['discharge_date'].strftime('%d/%m/%Y')}",
+        "",
+        f"AMOUNT PAID: GBP {claim['total']:,.2f}",  # The default font has no £ glyph
+        "VISA **** " + "".join(rng.choice("0123456789") for _ in range(4)),
+        "APPROVED  - THANK YOU",
+    ]
+    height = int((80 + 40 * len(lines)) * scale)
+    image = Image.new("RGB", (width, height), (250, 248, 240))
+    draw = ImageDraw.Draw(image)
+    font = _font(int(24 * scale))
+    for i, text in enumerate(lines):
+        draw.text((int(40 * scale), int((40 + i * 40) * scale)), text, fill=(30, 30, 30), font=font)
+    image = image.rotate(rng.uniform(-3, 3), expand=True, fillcolor=(90, 90, 90))
+    image.save(path, "JPEG", quality=rng.choice([60, 75, 90]))
+
+
+# ============================================================================
+# CLAIMS
+# ============================================================================
+
+
+def make_licence_number(surname: str, forenames: str, dob: date, gender: str, rng: random.Random) -> str:
+    """Build a UK-style licence number from the holder's name and date of birth."""
+    month = dob.month + (50 if gender == "Female" else 0)
+    initials = (forenames[0] + "9").upper()
+    suffix = rng.choice("0123456789") + "".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ") for _ in range(2))
+    return f"{surname.upper()[:5]:9<5}{dob.year // 10 % 10}{month:02d}{dob.day:02d}{dob.year % 10}{initials}{suffix}"
+
+
+def make_holder(rng: random.Random) -> dict:
+    gender = rng.choice(["Female", "Male"])
+    forenames = rng.choice(FIRST_NAMES[gender])
+    surname = rng.choice(SURNAMES)
+    dob = date(1940, 1, 1) + timedelta(days=rng.randrange(365 * 65))
+    return {
+        "name": f"{forenames} {surname}",
+        "dob": dob.isoformat(),
+        "gender": gender,
+        "address": f"{rng.randint(1, 240)} {rng.choice(STREETS)}, {rng.choice(TOWNS)}",
+        "licence_number": make_licence_number(surname, forenames, dob, gender, rng),
+    }
+
+
+def mismatch_holder(holder: dict, rng: random.Random) -> tuple[dict, str]:
+    """Return a copy of the holder with one identity field changed, and the field name."""
+    changed = dict(holder)
+    field = rng.choice(["name", "dob", "licence_number"])
+    if field == "name":
+        forenames = holder["name"].split(" ", 1)[0]
+        changed["name"] = f"{forenames} {rng.choice([s for s in SURNAMES if s not in holder['name']])}"
+    elif field == "dob":
+        changed["dob"] = (date.fromisoformat(holder["dob"]) + timedelta(days=rng.randint(400, 4000))).isoformat()
+    else:
+        digits = list(holder["licence_number"])
+        position = rng.randrange(5, 11)
+        digits[position] = str((int(digits[position]) + rng.randint(1, 8)) % 10)
+        changed["licence_number"] = "".join(digits)
+    return changed, field
+
+
+def build_claim(policy_number: str, variant: str, holder: dict, rng: random.Random, max_pages: int) -> dict:
+    """Choose the clinical and billing details of a claim for the given variant."""
+    condition = rng.choice(EXCLUDED_CONDITIONS if variant == "not_covered" else CONDITIONS)
+    admission = date(2025, 1, 1) + timedelta(days=rng.randrange(300))
+    nights = rng.randint(1, 9)
+    discharge = admission + timedelta(days=nights)
+
+    # More invoice lines and clinical notes give more pages
+    target_pages = rng.randint(1, max_pages)
+    items = []
+    for description, low, high in condition["items"]:
+        quantity = nights if "per night" in description or "per day" in description else 1
+        items.append((description, quantity, round(rng.uniform(low, high), 2)))
+    for _ in range(rng.randint(0, target_pages * 30)):
+        description, low, high = rng.choice(WARD_CHARGES)
+        items.append((description, rng.randint(1, 4), round(rng.uniform(low, high), 2)))
+    total = round(sum(quantity * unit for _, quantity, unit in items), 2)
+    # Keep approvable claims within the £50,000 hospitalisation limit
+    while total > 45000 and len(items) > 3:
+        description, quantity, unit = items.pop()
+        total = round(total - quantity * unit, 2)
+
+    claim = {
+        "policy_number": policy_number,
+        "patient": holder,
+        "hospital": rng.choice(HOSPITALS),
+        "clinician": f"Dr {rng.choice(SURNAMES)}",
+        "invoice_number": f"INV-{rng.randint(100000, 999999)}",
+        "admission_date": admission,
+        "discharge_date": discharge,
+        "diagnosis": condition["diagnosis"],
+        "procedures": condition["procedures"],
+        "medications": condition["medications"],
+        "items": items,
+        "total": total,
+        "notes": [rng.choice(CLINICAL_NOTES) for _ in range(rng.randint(4, max(5, target_pages * 45)))],
+        "inconsistency": None,
+    }
+
+    if variant == "medical_invalid":
+        # Bill for treatment that does not match the discharge summary, outside the admission
+        other = rng.choice([c for c in CONDITIONS if c is not condition])
+        claim["invoice_items_override"] = [(desc, 1, round(rng.uniform(low, high), 2)) for desc, low, high in other["items"][:3]]
+        claim["total"] = round(sum(unit for _, _, unit in claim["invoice_items_override"]), 2)
+        claim["service_date_override"] = discharge + timedelta(days=rng.randint(20, 90))
+        claim["inconsistency"] = f"Invoice bills '{other['procedures'][0]}' after discharge; summary records '{condition['procedures'][0]}'"
+    return claim
+
+
+def invoice_lines(claim: dict) -> list[str]:
+    items = claim.get("invoice_items_override") or claim["items"]
+    service_date = claim.get("service_date_override") or claim["admission_date"]
+    patient = claim["patient"]
+    lines = [
+        claim["hospital"],
+        f"Invoice number: {claim['invoice_number']}",
+        f"Invoice date: {(claim['discharge_date'] + timedelta(days=2)).strftime('%d %B %Y')}",
+        "",
+        f"Patient: {patient['name']}",
+        f"Date of birth: {date.fromisoformat(patient['dob']).strftime('%d/%m/%Y')}",
+        f"Insurance policy number: {claim['policy_number']}",
+        f"Date(s) of service: {service_date.strftime('%d/%m/%Y')} - "
+        f"{max(service_date, claim['discharge_date']).strftime('%d/%m/%Y')}",
+        "",
+        f"{'Description':<52}{'Qty':>5}{'Unit (£)':>14}{'Amount (£)':>16}",
+        "-" * 90,
+    ]
+    for description, quantity, unit in items:
+        lines.append(f"{description[:50]:<52}{quantity:>5}{unit:>14,.2f}{quantity * unit:>16,.2f}")
+    lines += ["-" * 90, f"{'TOTAL DUE':<70}{'£' + format(claim['total'], ',.2f'):>20}", "",
+              "Payment due within 30 days. Please quote the invoice number with all correspondence."]
+    return lines
+
+
+def discharge_lines(claim: dict) -> list[str]:
+    patient = claim["patient"]
+    lines = [
+        claim["hospital"],
+        "",
+        f"Patient name: {patient['name']}",
+        f"Date of birth: {date.fromisoformat(patient['dob']).strftime('%d/%m/%Y')}",
+        f"Address: {patient['address']}",
+        f"Date of admission: {claim['admission_date'].strftime('%d/%m/%Y')}",
+        f"Date of discharge: {claim['discharge_date'].strftime('%d/%m/%Y')}",
+        "",
+        f"Primary diagnosis: {claim['diagnosis']}",
+        "Procedures performed: " + "; ".join(claim["procedures"]),
+        "",
+        "Clinical course:",
+    ]
+    lines += [f"  {note}" for note in claim["notes"]]
+    lines += ["", "Medications on discharge:"] + [f"  - {medication}" for medication in claim["medications"]]
+    lines += ["", "Follow-up: outpatient clinic review in 6 weeks. GP to review wound at 10 days.",
+              "", f"Discharging clinician: {claim['clinician']}, Consultant"]
+    return lines
+
+
+def generate_scenario(index: int, seed: int, prefix: str, output: str, max_pages: int) -> tuple[str, dict, dict]:
+    """Write one scenario folder; return (policy number, holder record, ground truth)."""
+    rng = random.Random(f"{seed}:{index}")
+    policy_number = f"{prefix}{index:06d}"
+    variant = rng.choices(list(SCENARIO_MIX), weights=list(SCENARIO_MIX.values()))[0]
+    holder = make_holder(rng)
+
+    folder = os.path.join(output, policy_number)
+    os.makedirs(folder, exist_ok=True)
+    for filename in os.listdir(folder):
+        os.remove(os.path.join(folder, filename))  # Regenerating must not leave stale documents behind
+
+    claim = build_claim(policy_number, variant, holder, rng, max_pages)
+    write_pdf(os.path.join(folder, "hospital_invoice.pdf"), invoice_lines(claim), "INVOICE")
+    write_pdf(os.path.join(folder, "discharge_summary.pdf"), discharge_lines(claim), "DISCHARGE SUMMARY")
+
+    # The backend record matches the documents except for deliberate ID mismatches
+    record, mismatch = holder, None
+    if variant == "id_mismatch":
+        record, mismatch = mismatch_holder(holder, rng)
+    if variant != "missing_id":
+        extension = rng.choice([".png", ".jpg"])
+        write_licence_image(os.path.join(folder, "drivers_license" + extension), holder, rng)
+    if rng.random() < 0.3:
+        write_receipt_image(os.path.join(folder, "payment_receipt.jpg"), claim, rng)
+
+    decision, statuses = EXPECTED_OUTCOMES[variant]
+    documents = [
+        {"file": filename, "bytes": os.path.getsize(os.path.join(folder, filename))}
+        for filename in sorted(os.listdir(folder))
+    ]
+    truth = {
+        "variant": variant,
+        "expected_decision": decision,
+        "expected_statuses": statuses,
+        "claimed_amount": claim["total"],
+        "id_mismatch_field": mismatch,
+        "medical_inconsistency": claim["inconsistency"],
+        "documents": documents,
+    }
+    return policy_number, record, truth
+
+
+def _write_json(path: str, data: dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def generate(count: int, seed: int, prefix: str, output: str, holders_file: str, ground_truth_file: str,
+             max_pages: int, workers: int):
+    """Generate `count` scenarios and merge their holder records and ground truth into the JSON files."""
+    holders = {}
+    if os.path.exists(holders_file):
+        with open(holders_file, "r", encoding="utf-8") as f:
+            holders = json.load(f)
+    ground_truth = {}
+    if os.path.exists(ground_truth_file):
+        with open(ground_truth_file, "r", encoding="utf-8") as f:
+            ground_truth = json.load(f)
+
+    indexes = range(1, count + 1)
+    variants = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            generate_scenario, indexes, [seed] * count, [prefix] * count, [output] * count, [max_pages] * count,
+            chunksize=16,
+        )
+        for done, (policy_number, record, truth) in enumerate(results, start=1):
+            holders[policy_number] = record
+            ground_truth[policy_number] = truth
+            variants[truth["variant"]] = variants.get(truth["variant"], 0) + 1
+            if done % 250 == 0 or done == count:
+                print(f"  🧪 {done}/{count} scenarios written")
+
+    _write_json(holders_file, holders)
+    _write_json(ground_truth_file, ground_truth)
+    print(f"Generated {count} scenarios in '{output}' ({', '.join(f'{v}: {n}' for v, n in sorted(variants.items()))})")
+    print(f"Policy holders: {holders_file}  Ground truth: {ground_truth_file}")
+
+
+# ============================================================================
+# SCORING
+# ============================================================================
+
+DECISION_MARKERS = {"APPROVED": "APPROVE", "DECLINED": "DECLINE", "MORE INFO NEEDED": "MORE INFO"}
+
+
+def read_decision(policy_number: str) -> str | None:
+    """Return the saved final decision (APPROVE, DECLINE or MORE INFO) of a processed claim."""
+    path = os.path.join(OUTPUTS_FOLDER, policy_number, "final_decision", "claims_decision.md")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    for marker, decision in DECISION_MARKERS.items():
+        if f"**{marker}**" in text:
+            return decision
+    return "UNKNOWN"
+
+
+def score(ground_truth_file: str) -> dict:
+    """Compare saved decisions with the ground truth and print accuracy per variant."""
+    with open(ground_truth_file, "r", encoding="utf-8") as f:
+        ground_truth = json.load(f)
+
+    per_variant = {}
+    mismatches = []
+    for policy_number, truth in sorted(ground_truth.items()):
+        decision = read_decision(policy_number)
+        if decision is None:
+            continue
+        stats = per_variant.setdefault(truth["variant"], {"processed": 0, "correct": 0})
+        stats["processed"] += 1
+        if decision == truth["expected_decision"]:
+            stats["correct"] += 1
+        else:
+            mismatches.append((policy_number, truth["variant"], truth["expected_decision"], decision))
+
+    processed = sum(s["processed"] for s in per_variant.values())
+    correct = sum(s["correct"] for s in per_variant.values())
+    print(f"Scored {processed}/{len(ground_truth)} processed claims: "
+          f"{correct} correct ({correct / processed:.1%})" if processed else "No processed claims found")
+    for variant, stats in sorted(per_variant.items()):
+        print(f"  {variant:<16} {stats['correct']}/{stats['processed']}")
+    for policy_number, variant, expected, actual in mismatches[:20]:
+        print(f"  ❌ {policy_number} ({variant}): expected {expected}, got {actual}")
+    return {"processed": processed, "correct": correct, "per_variant": per_variant}
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Generate synthetic claim scenarios and score results against them.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    gen = subparsers.add_parser("generate", help="Generate synthetic scenario folders")
+    gen.add_argument("--count", type=int, default=1000, help="Number of scenarios")
+    gen.add_argument("--seed", type=int, default=42, help="Random seed")
+    gen.add_argument("--prefix", default="SYN", help="Policy number prefix (default: SYN)")
+    gen.add_argument("--output", default=SCENARIOS_FOLDER, help="Scenarios folder")
+    gen.add_argument("--holders-file", default=POLICY_HOLDERS_FILE, help="Policy holder records (JSON)")
+    gen.add_argument("--ground-truth", default=GROUND_TRUTH_FILE, help="Expected outcomes (JSON)")
+    gen.add_argument("--max-pages", type=int, default=6, help="Maximum pages per PDF")
+    gen.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+
+    sc = subparsers.add_parser("score", help="Compare processed claims with the ground truth")
+    sc.add_argument("--ground-truth", default=GROUND_TRUTH_FILE, help="Expected outcomes (JSON)")
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        # Never overwrite the hand-made scenarios
+        clashes = {f"{args.prefix}{index:06d}" for index in range(1, args.count + 1)} & set(MOCK_POLICY_HOLDERS)
+        if clashes:
+            parser.error(f"generated policy numbers collide with existing policies: {', '.join(sorted(clashes))}")
+        generate(args.count, args.seed, args.prefix, args.output, args.holders_file, args.ground_truth,
+                 max(1, args.max_pages), max(1, args.workers))
+    else:
+        score(args.ground_truth)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Agent instruction templates.
+
+All prompts in the instructions folder are loaded, validated and compiled once,
+and each rendered variant is cached, so creating agents costs a dictionary
+lookup. The folder is checked for changes at most every
+INSTRUCTION_RELOAD_SECONDS; edited prompts take effect for the next agents
+created without restarting the server. A change that fails validation is
+reported and the previous prompts stay in use.
+
+Template syntax:
+
+- `{{ variable }}` is replaced by a variable from instructions/variables.json:
+
+      {
+          "defaults": {"currency_symbol": "£"},
+          "tenants": {"us-health": {"currency_symbol": "$"}}
+      }
+
+  A tenant (or product) only overrides defaults; every variable a template uses
+  must have a default.
+- `<!-- trim:start -->` ... `<!-- trim:end -->` marks text (e.g. worked examples)
+  that the "trimmed" variant leaves out, for smaller system prompts.
+
+The variant and tenant default to INSTRUCTION_VARIANT and INSTRUCTION_TENANT.
+Token counts of rendered prompts use tiktoken when it is installed, otherwise
+an estimate of four characters per token.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+try:
+    import tiktoken
+except ImportError:  # Optional: token counts are estimated without it
+    tiktoken = None
+
+INSTRUCTIONS_DIR = os.getenv("INSTRUCTIONS_DIR", str(Path(__file__).parent / "instructions"))
+INSTRUCTION_VARIABLES_FILE = "variables.json"
+INSTRUCTION_VARIANT = os.getenv("INSTRUCTION_VARIANT", "full")
+INSTRUCTION_TENANT = os.getenv("INSTRUCTION_TENANT") or None
+INSTRUCTION_RELOAD_SECONDS = float(os.getenv("INSTRUCTION_RELOAD_SECONDS", "2"))
+
+INSTRUCTION_VARIANTS = ("full", "trimmed")
+
+VARIABLE_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+TRIM_PATTERN = re.compile(r"<!--\s*trim:(start|end)\s*-->[ \t]*\n?")
+
+
+class InstructionTemplateError(ValueError):
+    """An instruction template or its variables are invalid."""
+
+
+def _load_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # The encoding may not be downloadable (offline)
+        return None
+
+
+_encoding = _load_encoding()
+
+
+def count_tokens(text: str) -> int:
+    """Return the token count of a prompt (estimated if tiktoken is unavailable)."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def _normalise(text: str) -> str:
+    """Normalise line endings, blank-line runs and trailing whitespace, so prompts are byte-identical across checkouts."""
+    text = text.replace("\r\n", "\n")
+    text = re.sub(r"\n[ \t]*\n(?:[ \t]*\n)+", "\n\n", text)
+    return text.rstrip() + "\n"
+
+
+@dataclass(frozen=True)
+class RenderedInstructions:
+    name: str
+    variant: str
+    tenant: str | None
+    text: str
+    tokens: int
+
+
+class InstructionTemplate:
+    """One compiled instruction template: its text per variant, split into literals and variables."""
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.variants = {
+            "full": self._compile(self._strip_trim_sections(source, keep=True)),
+            "trimmed": self._compile(self._strip_trim_sections(source, keep=False)),
+        }
+        self.variables = {part for parts in self.variants.values() for part in parts[1::2]}
+
+    def _strip_trim_sections(self, source: str, keep: bool) -> str:
+        out, position, start = [], 0, None
+        for marker in TRIM_PATTERN.finditer(source):
+            if marker.group(1) == "start":
+                if start is not None:
+                    raise InstructionTemplateError(f"{self.name}: nested trim:start")
+                out.append(source[position:marker.start()])
+                start = marker.end()
+            else:
+                if start is None:
+                    raise InstructionTemplateError(f"{self.name}: trim:end without trim:start")
+                if keep:
+                    out.append(source[start:marker.start()])
+                start = None
+            position = marker.end()
+        if start is not None:
+            raise InstructionTemplateError(f"{self.name}: trim:start without trim:end")
+        out.append(source[position:])
+        return "".join(out)
+
+    def _compile(self, text: str) -> list[str]:
+        """Split text into [literal, variable, literal, variable, ..., literal]."""
+        parts = VARIABLE_PATTERN.split(text)
+        for literal in parts[0::2]:
+            if "{{" in literal or "}}" in literal:
+                raise InstructionTemplateError(f"{self.name}: malformed variable placeholder")
+        return parts
+
+    def render(self, variant: str, variables: dict[str, str]) -> str:
+        parts = self.variants[variant]
+        return _normalise("".join(
+            part if i % 2 == 0 else str(variables[part]) for i, part in enumerate(parts)
+        ))
+
+
+class InstructionRegistry:
+    """Loads, validates and renders all instruction templates of a folder, reloading them when they change."""
+
+    def __init__(self, directory: str = INSTRUCTIONS_DIR, reload_seconds: float = INSTRUCTION_RELOAD_SECONDS):
+        self.directory = directory
+        self.reload_seconds = reload_seconds
+        self.lock = threading.Lock()
+        self.checked_at = time.monotonic()
+        self.signature = self._signature()
+        self.templates, self.variables = self._load()
+        self.rendered: dict[tuple, RenderedInstructions] = {}
+
+    def _signature(self) -> tuple:
+        """Names, sizes and mtimes of the template files; any change triggers a reload."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".md") or entry.name == INSTRUCTION_VARIABLES_FILE:
+                    stat = entry.stat()
+                    entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(sorted(entries))
+
+    def _load(self) -> tuple[dict[str, InstructionTemplate], dict]:
+        templates = {}
+        for path in sorted(Path(self.directory).glob("*.md")):
+            source = path.read_text(encoding="utf-8")
+            if not source.strip():
+                raise InstructionTemplateError(f"{path.stem}: template is empty")
+            templates[path.stem] = InstructionTemplate(path.stem, source)
+
+        variables_path = Path(self.directory) / INSTRUCTION_VARIABLES_FILE
+        config = json.loads(variables_path.read_text(encoding="utf-8")) if variables_path.exists() else {}
+        defaults = config.get("defaults", {})
+        tenants = config.get("tenants", {})
+
+        for template in templates.values():
+            missing = template.variables - set(defaults)
+            if missing:
+                raise InstructionTemplateError(f"{template.name}: no default for {', '.join(sorted(missing))}")
+        for tenant, overrides in tenants.items():
+            unknown = set(overrides) - set(defaults)
+            if unknown:
+                raise InstructionTemplateError(f"tenant {tenant}: unknown variables {', '.join(sorted(unknown))}")
+        return templates, {"defaults": defaults, "tenants": tenants}
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now - self.checked_at < self.reload_seconds:
+            return
+        with self.lock:
+            if now - self.checked_at < self.reload_seconds:
+                return
+            self.checked_at = now
+            signature = self._signature()
+            if signature == self.signature:
+                return
+            self.signature = signature
+            try:
+                self.templates, self.variables = self._load()
+            except (OSError, ValueError) as e:
+                print(f"  ⚠️ Instruction templates not reloaded, keeping the previous version: {e}")
+                return
+            self.rendered = {}
+            print(f"  🔄 Reloaded instruction templates from {self.directory}")
+
+    @property
+    def tenants(self) -> list[str]:
+        return sorted(self.variables["tenants"])
+
+    def render(self, name: str, tenant: str | None = None, variant: str | None = None) -> RenderedInstructions:
+        """Return the rendered prompt of a template for a tenant and variant (cached until the templates change)."""
+        self._reload_if_changed()
+        tenant = tenant if tenant is not None else INSTRUCTION_TENANT
+        variant = variant or INSTRUCTION_VARIANT
+        if variant not in INSTRUCTION_VARIANTS:
+            raise InstructionTemplateError(f"Unknown instruction variant '{variant}'")
+        if tenant is not None and tenant not in self.variables["tenants"]:
+            raise InstructionTemplateError(f"Unknown tenant '{tenant}'")
+
+        key = (name, tenant, variant)
+        rendered = self.rendered.get(key)
+        if rendered is None:
+            template = self.templates.get(name)
+            if template is None:
+                raise InstructionTemplateError(f"No instruction template named '{name}'")
+            variables = {**self.variables["defaults"], **(self.variables["tenants"].get(tenant, {}) if tenant else {})}
+            text = template.render(variant, variables)
+            rendered = self.rendered[key] = RenderedInstructions(name, variant, tenant, text, count_tokens(text))
+        return rendered
+
+    def token_report(self, tenant: str | None = None) -> dict[str, dict[str, int]]:
+        """Token count of every template, per variant."""
+        return {
+            name: {variant: self.render(name, tenant, variant).tokens for variant in INSTRUCTION_VARIANTS}
+            for name in sorted(self.templates)
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_instruction_registry() -> InstructionRegistry:
+    """Return the shared registry of the instructions folder."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = InstructionRegistry()
+        return _registry
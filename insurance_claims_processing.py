@@ -1,7 +1,13 @@
 import os
 import asyncio
+import re
 import json
+import time
 import inspect
+import threading
+import functools
+import itertools
+from datetime import datetime, timezone
 from pathlib import Path
 from textwrap import indent
 from typing import Any
@@ -16,12 +22,24 @@ from azure.core.credentials import AzureKeyCredential
 from agents import (
     Agent,
     Runner,
+    RunConfig,
+    ModelSettings,
     OpenAIChatCompletionsModel,
     set_tracing_disabled,
     ItemHelpers,
+    FunctionTool,
+    Model,
     function_tool,
     # enable_verbose_stdout_logging,  # Uncomment if you want very verbose SDK logs
 )
+from agents.run import CallModelData, ModelInputData
+
+from response_cache import MODEL_CACHE_MODE, CachingModel, DocumentExtractionCache
+from decision_rules import early_termination_reason, evaluate_decision_rules, render_decision
+from scenario_index import get_scenario_index
+from profiling import PROFILE_RUNS, RunProfiler
+from run_monitor import new_run_id
+from instruction_templates import get_instruction_registry
 
 # Load environment variables from .env file
 load_dotenv()
@@ -43,15 +61,57 @@ DEMO_POLICY_NUMBER = "POL123456"  # Change this to test different scenarios
 SCENARIOS_FOLDER = "scenarios"  # Where sample data (images/PDFs) is stored
 OUTPUTS_FOLDER = "outputs"  # Where all processing outputs are stored
 
+# How often a pending Document Intelligence analysis is checked, so a cancelled run
+# stops waiting on it promptly instead of blocking the event loop in poller.result()
+DOCUMENT_POLL_INTERVAL_SECONDS = float(os.getenv("DOCUMENT_POLL_INTERVAL_SECONDS", "0.5"))
+
+# Approximate token budget for the conversation history each agent sends to the model.
+# Override per agent with CONTEXT_TOKEN_BUDGET_<AGENT_NAME>, e.g. CONTEXT_TOKEN_BUDGET_CLAIMSMANAGER.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "12000"))
+CONTEXT_KEEP_RECENT_TOOL_OUTPUTS = 2  # Most recent tool outputs are never compacted
+CONTEXT_COMPACTED_PREVIEW_CHARS = 400  # How much of a compacted tool output is kept
+
 # Azure Document Intelligence credentials
 AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT")
 AZURE_DOCUMENT_INTELLIGENCE_API_KEY = os.getenv("AZURE_DOCUMENT_INTELLIGENCE_API_KEY")
 
-# Initialize the Azure Document Intelligence client
-_document_client = DocumentIntelligenceClient(
-    endpoint=AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT,
-    credential=AzureKeyCredential(AZURE_DOCUMENT_INTELLIGENCE_API_KEY),
-)
+# Azure Document Intelligence client, created on first use so cached/replayed
+# runs can work offline without Document Intelligence credentials
+_document_client = None
+
+# Cache of extracted markdown keyed by document content (see response_cache.py)
+_extraction_cache = DocumentExtractionCache()
+
+
+# Optional rate limiter shared by all runs in this process. The batch runner installs one
+# that enforces global limits across worker processes (see batch_runner.py).
+_rate_limiter = None
+
+
+def set_rate_limiter(limiter):
+    """Install a rate limiter; `limiter.reserve(resource)` returns the seconds to wait."""
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+async def acquire_rate_limit(resource: str):
+    """Wait until the installed rate limiter allows another request to `resource`."""
+    if _rate_limiter is None:
+        return
+    delay = await asyncio.to_thread(_rate_limiter.reserve, resource)
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def get_document_client() -> DocumentIntelligenceClient:
+    """Return the shared Azure Document Intelligence client, creating it if needed."""
+    global _document_client
+    if _document_client is None:
+        _document_client = DocumentIntelligenceClient(
+            endpoint=AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT,
+            credential=AzureKeyCredential(AZURE_DOCUMENT_INTELLIGENCE_API_KEY),
+        )
+    return _document_client
 
 # ============================================================================
 # UTILITY FUNCTIONS
@@ -65,57 +125,269 @@ def print_heading(text: str):
     print("=" * 80)
 
 
+# The line boundaries str.splitlines() recognises
+LINE_BREAK_PATTERN = re.compile(r"\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
 def maybe_truncate(text: str, max_lines: int = 25) -> str:
-    """Optionally truncate long outputs for readability."""
-    lines = text.splitlines()
-    if len(lines) <= max_lines:
-        return text
-    head = "\n".join(lines[:max_lines])
-    return head + f"\n\n... (truncated, {len(lines) - max_lines} more lines) ..."
+    """
+    Optionally truncate long outputs for readability.
+    Same result as keeping the first `max_lines` of text.splitlines(), but only those
+    lines are copied; the rest of the text is only scanned to count its lines.
+    """
+    breaks = LINE_BREAK_PATTERN.finditer(text)
+    head, start = [], 0
+    for match in itertools.islice(breaks, max_lines):
+        head.append(text[start:match.start()])
+        start = match.end()
+    if len(head) < max_lines or start == len(text):
+        return text  # At most max_lines lines
+
+    more_lines, end = 0, start
+    for match in breaks:
+        more_lines += 1
+        end = match.end()
+    if end < len(text):
+        more_lines += 1  # The last line has no line break
+    return "\n".join(head) + f"\n\n... (truncated, {more_lines} more lines) ..."
 
 
 # Context variable to store tool call queue for SSE streaming
 tool_call_queue: ContextVar[asyncio.Queue] = ContextVar('tool_call_queue', default=None)
 
 
-async def print_tool_call(*args):
-    """Record tool call for streaming to UI."""
-    # Get the calling function's name and code object
-    frame = inspect.currentframe()
-    caller_frame = frame.f_back
-    tool_name = caller_frame.f_code.co_name if caller_frame else "unknown"
+# Context variable holding an optional tracer: a callable receiving each structured tool event
+tool_tracer: ContextVar = ContextVar('tool_tracer', default=None)
+
+# Context variable holding the policy number of the claim the current run processes
+run_policy_number: ContextVar[str | None] = ContextVar('run_policy_number', default=None)
+
+_tool_call_ids = itertools.count(1)
+
+
+def print_tool_event(event: dict):
+    """Tracer that prints tool calls to the console."""
+    if event['type'] == 'internal_tool_call':
+        print(f"  🔧 Tool called: {event['tool_name']} with args: {event['args']}")
+    elif event['type'] == 'internal_tool_result' and event['status'] != 'ok':
+        print(f"  ⚠️ Tool {event['tool_name']} {event['status']} after {event['duration_ms']} ms")
+
+
+def record_tool_event(event: dict):
+    """Send a tool event to the SSE queue and/or tracer attached to the current context."""
+    queue = tool_call_queue.get()
+    if queue is not None:
+        queue.put_nowait(event)
+    tracer = tool_tracer.get()
+    if tracer is not None:
+        tracer(event)
+
+
+def trace_event(event: dict):
+    """Send a monitoring-only event (stages, model calls) to the tracer of the current context."""
+    tracer = tool_tracer.get()
+    if tracer is not None:
+        tracer(event)
+
+
+def traced_tool(func=None, *, preview: dict[str, int] | None = None):
+    """
+    Decorator that registers an async function as an agent tool (like `function_tool`)
+    and traces its calls.
     
-    print(f"  🔧 Tool called: {tool_name} with args: {args}")
+    Parameter names are captured once, when the tool is defined. Each call records an
+    'internal_tool_call' start event and an 'internal_tool_result' end event with its
+    duration. When no queue or tracer is attached the tool is called directly.
+    `preview` maps parameter names to the length long text arguments are cut to in events.
+    """
+    if func is None:
+        return lambda f: traced_tool(f, preview=preview)
     
-    # Also send to queue if available
-    queue = tool_call_queue.get(None)
-    if queue:
-        # Try to get parameter names from the function's code object directly
-        args_dict = {}
-        try:
-            # Get parameter names directly from the code object
-            code = caller_frame.f_code
-            param_count = code.co_argcount
-            param_names = code.co_varnames[:param_count]
-            
-            # Map args to parameter names
-            for i, arg in enumerate(args):
-                if i < len(param_names):
-                    args_dict[param_names[i]] = arg
-                else:
-                    args_dict[f'arg{i}'] = arg
-                    
-        except Exception as e:
-            # Fallback to positional args
-            print(f"  ⚠️ Could not introspect {tool_name}: {e}")
-            args_dict = {f'arg{i}': arg for i, arg in enumerate(args)}
+    tool_name = func.__name__
+    param_names = tuple(inspect.signature(func).parameters)
+    previews = preview or {}
+    
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if tool_call_queue.get() is None and tool_tracer.get() is None:
+            return await func(*args, **kwargs)
         
-        await queue.put({
+        args_dict = dict(zip(param_names, args))
+        args_dict.update(kwargs)
+        for name, limit in previews.items():
+            value = args_dict.get(name)
+            if isinstance(value, str) and len(value) > limit:
+                args_dict[name] = value[:limit] + "..."
+        
+        call_id = next(_tool_call_ids)
+        record_tool_event({
             'type': 'internal_tool_call',
+            'call_id': call_id,
             'tool_name': tool_name,
-            'args': str(args),  # Keep for backward compatibility
+            'args': str(tuple(args_dict.values())),  # Keep for backward compatibility
             'args_dict': args_dict  # Structured args with parameter names
         })
+        
+        started = time.perf_counter()
+        status, error = 'ok', None
+        try:
+            return await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            raise
+        except Exception as e:
+            status, error = 'error', str(e)
+            raise
+        finally:
+            event = {
+                'type': 'internal_tool_result',
+                'call_id': call_id,
+                'tool_name': tool_name,
+                'status': status,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+            }
+            if error:
+                event['error'] = error
+            record_tool_event(event)
+    
+    return function_tool(wrapper)
+
+
+def traced_stage(tool: FunctionTool) -> FunctionTool:
+    """
+    Report each invocation of a workflow stage (a sub-agent tool of the Claims Manager)
+    to the tracer as 'stage_started' and 'stage_finished' events.
+    """
+    invoke = tool.on_invoke_tool
+    
+    async def on_invoke_tool(ctx, input: str):
+        return await trace_stage(tool.name, lambda: invoke(ctx, input))
+    
+    tool.on_invoke_tool = on_invoke_tool
+    return tool
+
+
+async def trace_stage(stage: str, invoke):
+    """Await `invoke()`, reporting it to the tracer as 'stage_started' and 'stage_finished' events."""
+    if tool_tracer.get() is None:
+        return await invoke()
+    trace_event({'type': 'stage_started', 'stage': stage})
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        return await invoke()
+    except asyncio.CancelledError:
+        status = 'cancelled'
+        raise
+    except Exception:
+        status = 'error'
+        raise
+    finally:
+        trace_event({
+            'type': 'stage_finished',
+            'stage': stage,
+            'status': status,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+        })
+
+
+class TracedModel(Model):
+    """Model wrapper that reports the latency and outcome of each model call to the tracer."""
+    
+    def __init__(self, model: Model):
+        self.model = model
+    
+    def _finish(self, started: float, status: str):
+        trace_event({
+            'type': 'model_call',
+            'status': status,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+        })
+    
+    async def get_response(self, *args, **kwargs):
+        if tool_tracer.get() is None:
+            return await self.model.get_response(*args, **kwargs)
+        started, status = time.perf_counter(), 'ok'
+        try:
+            return await self.model.get_response(*args, **kwargs)
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            raise
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            self._finish(started, status)
+    
+    async def stream_response(self, *args, **kwargs):
+        if tool_tracer.get() is None:
+            async for event in self.model.stream_response(*args, **kwargs):
+                yield event
+            return
+        started, status = time.perf_counter(), 'ok'
+        try:
+            async for event in self.model.stream_response(*args, **kwargs):
+                yield event
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            raise
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            self._finish(started, status)
+
+
+def _write_json(path: str, data: dict):
+    """Write a JSON file atomically, so readers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def write_run_manifest(policy_number: str, run_id: str, status: str, **details):
+    """
+    Record the status of a run (running, completed, failed or cancelled) in
+    'outputs/<policy_number>/runs/<run_id>.json'.
+    
+    'outputs/<policy_number>/run_manifest.json' holds a copy of the manifest of the
+    latest run started for the policy. Concurrent runs of the same policy (a web run
+    and a job, or a retried job) each keep their own manifest, and a run that finishes
+    after a newer one started does not overwrite the latest manifest.
+    """
+    folder_path = os.path.join(OUTPUTS_FOLDER, policy_number)
+    os.makedirs(os.path.join(folder_path, "runs"), exist_ok=True)
+    manifest_path = os.path.join(folder_path, "runs", f"{run_id}.json")
+    latest_path = os.path.join(folder_path, "run_manifest.json")
+    
+    # A new run starts a fresh manifest; later updates are merged into it
+    manifest = {}
+    if status != "running" and os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+    
+    timestamp = datetime.now(timezone.utc).isoformat()
+    manifest.update({"policy_number": policy_number, "run_id": run_id, "status": status, "updated_at": timestamp})
+    if status == "running":
+        manifest["started_at"] = timestamp
+    else:
+        manifest["finished_at"] = timestamp
+    manifest.update(details)
+    _write_json(manifest_path, manifest)
+    
+    latest_run_id = None
+    if status != "running":
+        try:
+            with open(latest_path, "r", encoding="utf-8") as f:
+                latest_run_id = json.load(f).get("run_id")
+        except (OSError, ValueError):
+            pass
+    if status == "running" or latest_run_id in (run_id, None):
+        _write_json(latest_path, manifest)
 
 
 def ensure_output_folder(policy_number: str, subfolder: str) -> str:
@@ -139,49 +411,47 @@ def write_output_file(policy_number: str, subfolder: str, filename: str, content
 # ============================================================================
 
 
-@function_tool
+@traced_tool
 async def get_policy_files(policy_number: str) -> list[str]:
     """
     Returns a list of file paths for all original documents in the scenario folder
     for the given policy number.
     """
-    await print_tool_call(policy_number)
-    policy_path = os.path.join(SCENARIOS_FOLDER, policy_number)
-    
-    if not os.path.exists(policy_path):
-        return []
-    
-    file_paths = []
-    for root, _, files in os.walk(policy_path):
-        for file in files:
-            # Only include PDF and image files
-            if file.lower().endswith(('.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.bmp')):
-                file_paths.append(os.path.join(root, file))
-    
-    return file_paths
+    # Served from the scenario manifest index (only PDF and image files are indexed)
+    files = await asyncio.to_thread(get_scenario_index(SCENARIOS_FOLDER).get_files, policy_number)
+    return [file["path"] for file in files]
 
 
-@function_tool
+@traced_tool
 async def extract_document(file_path: str, policy_number: str) -> str:
     """
     Extracts Markdown from a PDF or image using Azure Document Intelligence.
     Saves to 'outputs/<policy_number>/documents_extracted/<filename>.md'.
     Returns the extracted markdown content.
     """
-    await print_tool_call(file_path, policy_number)
-    
-    # Read the file as bytes
-    with open(file_path, "rb") as f:
-        data = f.read()
+    # Read the file as bytes (off the event loop, so parallel extractions overlap)
+    data = await asyncio.to_thread(Path(file_path).read_bytes)
     
-    # Call Azure Document Intelligence
-    poller = _document_client.begin_analyze_document(
-        model_id="prebuilt-layout",
-        body=data,
-        output_content_format=DocumentContentFormat.MARKDOWN,
-    )
-    result = poller.result()
-    markdown = result.content
+    # Reuse a previous extraction of the same document if the cache allows it
+    markdown = _extraction_cache.lookup(data, "prebuilt-layout")
+    if markdown is None:
+        await acquire_rate_limit("document_intelligence")
+        
+        # Call Azure Document Intelligence off the event loop so this task stays cancellable
+        poller = await asyncio.to_thread(
+            get_document_client().begin_analyze_document,
+            model_id="prebuilt-layout",
+            body=data,
+            output_content_format=DocumentContentFormat.MARKDOWN,
+        )
+        
+        # The poller runs in its own thread; wait on it without blocking the event loop.
+        # If the run is cancelled, the CancelledError is raised here and we stop waiting.
+        while not poller.done():
+            await asyncio.sleep(DOCUMENT_POLL_INTERVAL_SECONDS)
+        result = poller.result()
+        markdown = result.content
+        _extraction_cache.record(data, "prebuilt-layout", markdown)
     
     # Build output path
     filename = os.path.basename(file_path)
@@ -203,15 +473,8 @@ async def extract_document(file_path: str, policy_number: str) -> str:
 # ============================================================================
 
 
-@function_tool
-async def read_extracted_file(policy_number: str, filename: str) -> str:
-    """
-    Reads a markdown file from the documents_extracted folder for the given policy number.
-    """
-    await print_tool_call(policy_number, filename)
-    
-    file_path = os.path.join(OUTPUTS_FOLDER, policy_number, "documents_extracted", filename)
-    
+def read_text_file(file_path: str) -> str:
+    """Read a text file, falling back through common encodings."""
     encodings = ['utf-8', 'cp1252', 'latin-1']
     last_exception = None
     
@@ -226,13 +489,45 @@ async def read_extracted_file(policy_number: str, filename: str) -> str:
     raise last_exception
 
 
-@function_tool
+@traced_tool
+async def read_extracted_file(policy_number: str, filename: str) -> str:
+    """
+    Reads a markdown file from the documents_extracted folder for the given policy number.
+    """
+    file_path = os.path.join(OUTPUTS_FOLDER, policy_number, "documents_extracted", filename)
+    return await asyncio.to_thread(read_text_file, file_path)
+
+
+@traced_tool
+async def read_extracted_files(policy_number: str, filenames: list[str] | None = None) -> dict[str, str]:
+    """
+    Reads several markdown files from the documents_extracted folder for the given policy number
+    in a single call. If no filenames are given, all extracted files are read.
+    Returns a dictionary mapping each filename to its content.
+    """
+    extracted_path = os.path.join(OUTPUTS_FOLDER, policy_number, "documents_extracted")
+    
+    if not filenames:
+        if not os.path.exists(extracted_path):
+            return {}
+        filenames = sorted(f for f in os.listdir(extracted_path) if f.endswith('.md'))
+    
+    # Read all files concurrently
+    async def read_one(filename: str) -> str:
+        try:
+            return await asyncio.to_thread(read_text_file, os.path.join(extracted_path, filename))
+        except Exception as e:
+            return f"Error reading {filename}: {str(e)}"
+    
+    contents = await asyncio.gather(*(read_one(filename) for filename in filenames))
+    return dict(zip(filenames, contents))
+
+
+@traced_tool
 async def list_extracted_files(policy_number: str) -> list[str]:
     """
     Returns a list of all extracted markdown files for the given policy number.
     """
-    await print_tool_call(policy_number)
-    
     extracted_path = os.path.join(OUTPUTS_FOLDER, policy_number, "documents_extracted")
     
     if not os.path.exists(extracted_path):
@@ -246,51 +541,67 @@ async def list_extracted_files(policy_number: str) -> list[str]:
     return files
 
 
-@function_tool
+# Policy holder records of the mock backend system
+MOCK_POLICY_HOLDERS = {
+    "POL123456": {
+        "name": "Alice Smith",
+        "dob": "1990-01-02",
+        "gender": "Female",
+        "address": "123 High Street, London",
+        "licence_number": "SMITH123456A98BC"
+    },
+    "POL654321": {
+        "name": "Bob Johnson",
+        "dob": "1977-11-23",
+        "gender": "Male",
+        "address": "17 Old Kent Road, London",
+        "licence_number": "JOHNS854776BJ4GH"
+    },
+    "POL111222": {
+        "name": "Robert Crook",
+        "dob": "1966-04-01",
+        "gender": "Male",
+        "address": "1 Angel Ct, London",
+        "licence_number": "CROOK70601916RJVN"
+    }
+}
+
+# Additional records, e.g. written by generate_scenarios.py for synthetic scenarios
+POLICY_HOLDERS_FILE = os.getenv("POLICY_HOLDERS_FILE", os.path.join(SCENARIOS_FOLDER, "policy_holders.json"))
+
+_policy_holders = (None, MOCK_POLICY_HOLDERS)  # (POLICY_HOLDERS_FILE mtime, merged records)
+
+
+def load_policy_holders() -> dict:
+    """Return all policy holder records, re-reading POLICY_HOLDERS_FILE when it changes."""
+    global _policy_holders
+    try:
+        mtime = os.stat(POLICY_HOLDERS_FILE).st_mtime_ns
+    except OSError:
+        return MOCK_POLICY_HOLDERS
+    if _policy_holders[0] != mtime:
+        with open(POLICY_HOLDERS_FILE, "r", encoding="utf-8") as f:
+            _policy_holders = (mtime, {**json.load(f), **MOCK_POLICY_HOLDERS})
+    return _policy_holders[1]
+
+
+@traced_tool
 async def get_policy_holder_details(policy_number: str) -> dict:
     """
     Returns policy holder details for a given policy number from the mock backend system.
     """
-    await print_tool_call(policy_number)
-    
-    mock_db = {
-        "POL123456": {
-            "name": "Alice Smith",
-            "dob": "1990-01-02",
-            "gender": "Female",
-            "address": "123 High Street, London",
-            "licence_number": "SMITH123456A98BC"
-        },
-        "POL654321": {
-            "name": "Bob Johnson",
-            "dob": "1977-11-23",
-            "gender": "Male",
-            "address": "17 Old Kent Road, London",
-            "licence_number": "JOHNS854776BJ4GH"
-        },
-        "POL111222": {
-            "name": "Robert Crook",
-            "dob": "1966-04-01",
-            "gender": "Male",
-            "address": "1 Angel Ct, London",
-            "licence_number": "CROOK70601916RJVN"
-        }
-    }
-    
-    details = mock_db.get(policy_number)
+    details = load_policy_holders().get(policy_number)
     if details:
         return {"policy_number": policy_number, **details}
     else:
         return {"error": f"Policy number '{policy_number}' not found. Please check and try again."}
 
 
-@function_tool
+@traced_tool(preview={"result": 100})
 async def save_id_verification_result(policy_number: str, result: str) -> str:
     """
     Saves the ID verification result to the outputs folder.
     """
-    await print_tool_call(policy_number, result[:100] + "...")
-    
     write_output_file(
         policy_number,
         "id_verification",
@@ -306,14 +617,12 @@ async def save_id_verification_result(policy_number: str, result: str) -> str:
 # ============================================================================
 
 
-@function_tool
+@traced_tool
 async def read_policy_document(policy_type: str = "standard") -> str:
     """
     Reads the policy coverage document (PDF converted to text/markdown).
     This represents the knowledge base for policy coverage rules.
     """
-    await print_tool_call(policy_type)
-    
     # In a real scenario, this would read from a vectorized knowledge base
     # For now, we'll return mock policy coverage information
     policy_content = """
@@ -354,13 +663,11 @@ async def read_policy_document(policy_type: str = "standard") -> str:
     return policy_content
 
 
-@function_tool
+@traced_tool(preview={"assessment": 100})
 async def save_coverage_assessment(policy_number: str, assessment: str) -> str:
     """
     Saves the policy coverage assessment result to the outputs folder.
     """
-    await print_tool_call(policy_number, assessment[:100] + "...")
-    
     write_output_file(
         policy_number,
         "coverage_assessment",
@@ -376,13 +683,11 @@ async def save_coverage_assessment(policy_number: str, assessment: str) -> str:
 # ============================================================================
 
 
-@function_tool
+@traced_tool(preview={"assessment": 100})
 async def save_medical_assessment(policy_number: str, assessment: str) -> str:
     """
     Saves the medical assessment result to the outputs folder.
     """
-    await print_tool_call(policy_number, assessment[:100] + "...")
-    
     write_output_file(
         policy_number,
         "medical_assessment",
@@ -398,44 +703,44 @@ async def save_medical_assessment(policy_number: str, assessment: str) -> str:
 # ============================================================================
 
 
-@function_tool
-async def read_all_assessment_results(policy_number: str) -> dict[str, str]:
+# Saved assessment results, in workflow order: result key -> (subfolder, filename)
+ASSESSMENT_FILES = {
+    "id_verification": ("id_verification", "verification_result.md"),
+    "coverage_assessment": ("coverage_assessment", "coverage_result.md"),
+    "medical_assessment": ("medical_assessment", "medical_review.md"),
+    "early_termination": ("early_termination", "early_termination.md"),
+}
+
+
+def load_assessment_results(policy_number: str) -> dict[str, str]:
     """
-    Reads all assessment results from previous agents for the given policy number.
-    Returns a dictionary with keys: id_verification, coverage_assessment, medical_assessment.
+    Load the saved ID verification, coverage and medical assessment results for a policy,
+    and the early-termination note if the workflow skipped assessments.
     """
-    await print_tool_call(policy_number)
-    
     results = {}
-    
-    # Read ID verification
-    id_path = os.path.join(OUTPUTS_FOLDER, policy_number, "id_verification", "verification_result.md")
-    if os.path.exists(id_path):
-        with open(id_path, 'r', encoding='utf-8') as f:
-            results['id_verification'] = f.read()
-    
-    # Read coverage assessment
-    coverage_path = os.path.join(OUTPUTS_FOLDER, policy_number, "coverage_assessment", "coverage_result.md")
-    if os.path.exists(coverage_path):
-        with open(coverage_path, 'r', encoding='utf-8') as f:
-            results['coverage_assessment'] = f.read()
-    
-    # Read medical assessment
-    medical_path = os.path.join(OUTPUTS_FOLDER, policy_number, "medical_assessment", "medical_review.md")
-    if os.path.exists(medical_path):
-        with open(medical_path, 'r', encoding='utf-8') as f:
-            results['medical_assessment'] = f.read()
-    
+    for key, (subfolder, filename) in ASSESSMENT_FILES.items():
+        path = os.path.join(OUTPUTS_FOLDER, policy_number, subfolder, filename)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                results[key] = f.read()
     return results
 
 
-@function_tool
+@traced_tool
+async def read_all_assessment_results(policy_number: str) -> dict[str, str]:
+    """
+    Reads all assessment results from previous agents for the given policy number.
+    Returns a dictionary with keys: id_verification, coverage_assessment, medical_assessment,
+    and early_termination when later assessments were skipped because an earlier one hard-failed.
+    """
+    return load_assessment_results(policy_number)
+
+
+@traced_tool(preview={"decision": 100})
 async def save_final_decision(policy_number: str, decision: str) -> str:
     """
     Saves the final claims decision to the outputs folder.
     """
-    await print_tool_call(policy_number, decision[:100] + "...")
-    
     write_output_file(
         policy_number,
         "final_decision",
@@ -446,60 +751,346 @@ async def save_final_decision(policy_number: str, decision: str) -> str:
     return "Final claims decision saved successfully."
 
 
+# ============================================================================
+# EARLY TERMINATION
+# ============================================================================
+
+# Stages the early-termination policy can skip, and the assessment result each one saves
+SKIPPABLE_STAGES = {
+    "assess_coverage": "coverage_assessment",
+    "assess_medical": "medical_assessment",
+}
+
+
+def apply_early_termination(stage: str, policy_number: str) -> str | None:
+    """
+    Decide whether a stage is skipped because an earlier assessment of this claim hard-failed
+    (see the 'early_termination' section of decision_rules.json). If so, write the
+    early-termination note read by the decision stage and return the stage's SKIPPED
+    output; otherwise return None.
+    """
+    if stage not in SKIPPABLE_STAGES:
+        return None
+    
+    # Only results of stages before this one are current; later ones may be left from a previous run
+    order = list(ASSESSMENT_FILES)
+    upstream = order[:order.index(SKIPPABLE_STAGES[stage])]
+    results = load_assessment_results(policy_number)
+    termination = early_termination_reason({key: results[key] for key in upstream if key in results})
+    
+    subfolder, filename = ASSESSMENT_FILES["early_termination"]
+    note_path = os.path.join(OUTPUTS_FOLDER, policy_number, subfolder, filename)
+    if termination is None:
+        if os.path.exists(note_path):
+            os.remove(note_path)
+        return None
+    
+    failed_stage, reason = termination
+    skipped = [name for name, key in SKIPPABLE_STAGES.items() if order.index(key) > order.index(failed_stage)]
+    for name in skipped:
+        # Stale results of skipped stages must not reach the decision
+        stale = os.path.join(OUTPUTS_FOLDER, policy_number, *ASSESSMENT_FILES[SKIPPABLE_STAGES[name]])
+        if os.path.exists(stale):
+            os.remove(stale)
+    write_output_file(
+        policy_number,
+        subfolder,
+        filename,
+        f"# Early Termination\n\n**Reason:** {reason}\n\n"
+        f"**Skipped stages:** {', '.join(skipped)}\n\n"
+        "These assessments were not performed; decide the claim on the completed assessments.\n"
+    )
+    trace_event({'type': 'stage_skipped', 'stage': stage, 'reason': reason})
+    print(f"  ⏭️ Skipping {stage}: {reason}")
+    return f"SKIPPED: {reason} The {stage} stage was not run under the early-termination policy."
+
+
+def gated_stage(tool: FunctionTool) -> FunctionTool:
+    """
+    Return a stage tool's SKIPPED output instead of running it when the early-termination
+    policy applies to the claim of the current run (see run_policy_number).
+    """
+    invoke = tool.on_invoke_tool
+    
+    async def on_invoke_tool(ctx, input: str):
+        policy_number = run_policy_number.get()
+        if policy_number is None:
+            print(f"  ⚠️ No policy number set for this run; {tool.name} runs without the early-termination check")
+        else:
+            skipped = apply_early_termination(tool.name, policy_number)
+            if skipped is not None:
+                return skipped
+        return await invoke(ctx, input)
+    
+    tool.on_invoke_tool = on_invoke_tool
+    return tool
+
+
+# ============================================================================
+# CONTEXT BUDGET MANAGEMENT
+# ============================================================================
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of a text (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def get_context_budget(agent_name: str) -> int:
+    """Return the context token budget for an agent, honouring per-agent overrides."""
+    override = os.getenv(f"CONTEXT_TOKEN_BUDGET_{agent_name.upper()}")
+    return int(override) if override else CONTEXT_TOKEN_BUDGET
+
+
+# Tools whose output is already saved under outputs/<policy_number>/: tool name -> (subfolder, filename)
+SAVED_TOOL_OUTPUTS = {
+    "verify_identity": ASSESSMENT_FILES["id_verification"],
+    "assess_coverage": ASSESSMENT_FILES["coverage_assessment"],
+    "assess_medical": ASSESSMENT_FILES["medical_assessment"],
+    "make_decision": ("final_decision", "claims_decision.md"),
+}
+
+
+def saved_output_paths(tool_name: str, arguments: str) -> list[str]:
+    """Return where the full output of a tool call is saved, if it is saved at all."""
+    try:
+        args = json.loads(arguments or "{}")
+    except ValueError:
+        args = {}
+    if not isinstance(args, dict):
+        args = {}
+    policy_number = args.get("policy_number") or run_policy_number.get()
+    if not policy_number:
+        return []
+    extracted = os.path.join(OUTPUTS_FOLDER, policy_number, "documents_extracted")
+    if tool_name == "read_extracted_file" and args.get("filename"):
+        return [os.path.join(extracted, args["filename"])]
+    if tool_name == "read_extracted_files":
+        return [os.path.join(extracted, filename) for filename in args.get("filenames") or []] or [extracted]
+    if tool_name in SAVED_TOOL_OUTPUTS:
+        return [os.path.join(OUTPUTS_FOLDER, policy_number, *SAVED_TOOL_OUTPUTS[tool_name])]
+    return []
+
+
+def compact_tool_output(output: str, saved_paths: list[str] | None = None) -> str:
+    """Replace a tool output with a short preview and a note on where the full content is."""
+    preview = output[:CONTEXT_COMPACTED_PREVIEW_CHARS]
+    if saved_paths:
+        where = f"the full content is saved in {', '.join(saved_paths)}"
+    else:
+        where = "the full content was shown to you when the tool returned"
+    return (
+        f"{preview}\n\n... [compacted: {len(output)} characters in total, omitted to stay within "
+        f"the context budget; {where}. Rely on what you concluded from it rather than "
+        f"calling the tool again] ..."
+    )
+
+
+def apply_context_budget(call_data: CallModelData) -> ModelInputData:
+    """
+    Keep the history sent to the model within the agent's context budget.
+    
+    Used as the run's `call_model_input_filter`. Once the history is over budget,
+    older tool outputs (extracted documents, sub-agent reports) are compacted,
+    oldest first, while the most recent ones are kept verbatim. A compacted
+    output names the file it is saved in, so the model is not sent back to
+    the tool for it. The instructions
+    are passed through untouched so the system prompt prefix stays byte-stable
+    and provider-side prompt caching can apply.
+    """
+    model_data = call_data.model_data
+    budget = get_context_budget(call_data.agent.name)
+    
+    # Copy so the run's own history is never modified
+    items = list(model_data.input)
+    item_tokens = [estimate_tokens(json.dumps(item, default=str)) for item in items]
+    total_tokens = sum(item_tokens)
+    if total_tokens <= budget:
+        return model_data
+    
+    output_indexes = [
+        i for i, item in enumerate(items)
+        if isinstance(item, dict)
+        and item.get("type") == "function_call_output"
+        and isinstance(item.get("output"), str)
+    ]
+    if CONTEXT_KEEP_RECENT_TOOL_OUTPUTS:
+        output_indexes = output_indexes[:-CONTEXT_KEEP_RECENT_TOOL_OUTPUTS]
+    calls = {
+        item.get("call_id"): item for item in items
+        if isinstance(item, dict) and item.get("type") == "function_call"
+    }
+    
+    for i in output_indexes:
+        if total_tokens <= budget:
+            break
+        original = items[i]["output"]
+        call = calls.get(items[i].get("call_id"), {})
+        compacted = compact_tool_output(original, saved_output_paths(call.get("name", ""), call.get("arguments")))
+        if len(compacted) >= len(original):
+            continue
+        items[i] = {**items[i], "output": compacted}
+        total_tokens -= estimate_tokens(original) - estimate_tokens(compacted)
+    
+    return ModelInputData(input=items, instructions=model_data.instructions)
+
+
+def create_run_config() -> RunConfig:
+    """Create the run configuration shared by the Claims Manager and all sub-agent runs."""
+    return RunConfig(call_model_input_filter=apply_context_budget)
+
+
 # ============================================================================
 # AGENT DEFINITIONS
 # ============================================================================
 
 
-async def create_agents(model_config: OpenAIChatCompletionsModel):
-    """Create all the agents for the insurance claims processing system."""
+def create_model_config(client: AsyncAzureOpenAI):
+    """
+    Create the shared model configuration, wrapped in the response cache when enabled
+    and in a tracer reporting each model call.
+    """
+    model_config = OpenAIChatCompletionsModel(
+        model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+        openai_client=client,
+    )
+    if MODEL_CACHE_MODE != "off":
+        model_config = CachingModel(model_config)
+    return TracedModel(model_config)
+
+
+# Instruction template (see instruction_templates.py) of each agent
+AGENT_INSTRUCTIONS = {
+    "ClaimsManager": "claims_manager",
+    "DocumentExtractor": "document_extractor",
+    "IDVerification": "id_verification",
+    "PolicyCoverage": "policy_coverage",
+    "MedicalAssessor": "medical_assessor",
+    "ClaimsDecision": "claims_decision",
+}
+
+
+def agent_instructions(agent_name: str, tenant: str | None = None) -> str:
+    """Return an agent's rendered instructions for a tenant (precompiled; reloaded when the files change)."""
+    return get_instruction_registry().render(AGENT_INSTRUCTIONS[agent_name], tenant).text
+
+
+# Workflow stages in execution order: (stage tool name, sub-agent name)
+WORKFLOW_STAGES = [
+    ("extract_documents", "DocumentExtractor"),
+    ("verify_identity", "IDVerification"),
+    ("assess_coverage", "PolicyCoverage"),
+    ("assess_medical", "MedicalAssessor"),
+    ("make_decision", "ClaimsDecision"),
+]
+
+
+def create_sub_agents(model_config: OpenAIChatCompletionsModel, tenant: str | None = None) -> dict[str, Agent]:
+    """Create the specialist sub-agents, keyed by agent name, with the instructions of a tenant."""
     
-    # Helper function to load instructions from file
-    def load_instructions(filename: str) -> str:
-        instructions_dir = Path(__file__).parent / "instructions"
-        with open(instructions_dir / filename, "r", encoding="utf-8") as f:
-            return f.read()
+    # Sub-agents may issue several tool calls in one turn; the runner executes them
+    # concurrently, so N documents cost one model round trip instead of N
+    parallel_tools = ModelSettings(parallel_tool_calls=True)
     
     # Sub-agent: Document Extractor
     document_extractor_agent = Agent(
         name="DocumentExtractor",
-        instructions=load_instructions("document_extractor.md"),
+        instructions=agent_instructions("DocumentExtractor", tenant),
         model=model_config,
+        model_settings=parallel_tools,
         tools=[get_policy_files, extract_document],
     )
     
     # Sub-agent: ID Verification
     id_verification_agent = Agent(
         name="IDVerification",
-        instructions=load_instructions("id_verification.md"),
+        instructions=agent_instructions("IDVerification", tenant),
         model=model_config,
-        tools=[list_extracted_files, read_extracted_file, get_policy_holder_details, save_id_verification_result],
+        model_settings=parallel_tools,
+        tools=[list_extracted_files, read_extracted_files, read_extracted_file, get_policy_holder_details, save_id_verification_result],
     )
     
     # Sub-agent: Policy Coverage
     policy_coverage_agent = Agent(
         name="PolicyCoverage",
-        instructions=load_instructions("policy_coverage.md"),
+        instructions=agent_instructions("PolicyCoverage", tenant),
         model=model_config,
-        tools=[read_policy_document, list_extracted_files, read_extracted_file, save_coverage_assessment],
+        model_settings=parallel_tools,
+        tools=[read_policy_document, list_extracted_files, read_extracted_files, read_extracted_file, save_coverage_assessment],
     )
     
     # Sub-agent: Medical Assessor
     medical_assessor_agent = Agent(
         name="MedicalAssessor",
-        instructions=load_instructions("medical_assessor.md"),
+        instructions=agent_instructions("MedicalAssessor", tenant),
         model=model_config,
-        tools=[list_extracted_files, read_extracted_file, save_medical_assessment],
+        model_settings=parallel_tools,
+        tools=[list_extracted_files, read_extracted_files, read_extracted_file, save_medical_assessment],
     )
     
     # Sub-agent: Claims Decision
     claims_decision_agent = Agent(
         name="ClaimsDecision",
-        instructions=load_instructions("claims_decision.md"),
+        instructions=agent_instructions("ClaimsDecision", tenant),
         model=model_config,
         tools=[read_all_assessment_results, save_final_decision],
     )
     
+    return {
+        agent.name: agent
+        for agent in (
+            document_extractor_agent,
+            id_verification_agent,
+            policy_coverage_agent,
+            medical_assessor_agent,
+            claims_decision_agent,
+        )
+    }
+
+
+async def decide_claim(policy_number: str, claims_decision_agent: Agent) -> str:
+    """
+    Make the final claims decision: clear-cut claims are decided by the rules engine
+    (decision_rules.py) and only borderline claims are escalated to the ClaimsDecision agent.
+    """
+    rule_decision = evaluate_decision_rules(load_assessment_results(policy_number))
+    if rule_decision.outcome:
+        decision = render_decision(policy_number, rule_decision)
+        write_output_file(policy_number, "final_decision", "claims_decision.md", decision)
+        return decision
+    
+    print(f"  ⚖️ Escalating decision to ClaimsDecision agent: {' '.join(rule_decision.reasons)}")
+    result = await Runner.run(claims_decision_agent, policy_number, run_config=create_run_config())
+    return str(result.final_output)
+
+
+async def run_workflow_stage(stage: str, policy_number: str, sub_agents: dict[str, Agent]) -> str:
+    """
+    Run one workflow stage directly, without the Claims Manager, and return its output.
+    Stages read their inputs from and write their results to the outputs folder, so a
+    stage can run in a later process than the one that ran the stage before it.
+    """
+    agent_name = dict(WORKFLOW_STAGES)[stage]
+    
+    skipped = apply_early_termination(stage, policy_number)
+    if skipped is not None:
+        return skipped
+    
+    async def invoke() -> str:
+        if stage == "make_decision":
+            return await decide_claim(policy_number, sub_agents[agent_name])
+        result = await Runner.run(sub_agents[agent_name], policy_number, run_config=create_run_config())
+        return str(result.final_output)
+    
+    return await trace_stage(stage, invoke)
+
+
+async def create_agents(model_config: OpenAIChatCompletionsModel, tenant: str | None = None):
+    """Create all the agents for the insurance claims processing system."""
+    
+    run_config = create_run_config()
+    sub_agents = create_sub_agents(model_config, tenant)
+    
     # Custom output extractor for agent tools
     # This ensures we only return the final output, not interim messages
     async def extract_final_output(run_result) -> str:
@@ -508,52 +1099,47 @@ async def create_agents(model_config: OpenAIChatCompletionsModel):
         # This is cleaner than str(run_result) which includes all intermediate messages
         return str(run_result.final_output)
     
+    @function_tool(
+        name_override="make_decision",
+        description_override="⚖️ Make the final claims decision based on all assessments",
+    )
+    async def make_decision(policy_number: str) -> str:
+        """
+        Make the final claims decision for the given policy number.
+        """
+        return await decide_claim(policy_number, sub_agents["ClaimsDecision"])
+    
     # Parent Agent: Claims Manager
     claims_manager_agent = Agent(
         name="ClaimsManager",
-        instructions=(
-            "You are the Claims Manager overseeing the entire insurance claims processing workflow.\n\n"
-            "Your job is to coordinate specialized agents to process an insurance claim for a given policy number. "
-            "You MUST ALWAYS execute the COMPLETE workflow in this specific order, regardless of intermediate results:\n\n"
-            "1. Call extract_documents to have the DocumentExtractor agent extract all claim documents to markdown\n"
-            "2. Call verify_identity to have the IDVerification agent verify the policy holder's identity\n"
-            "3. Call assess_coverage to have the PolicyCoverage agent determine if the claim is covered\n"
-            "4. Call assess_medical to have the MedicalAssessor agent review medical validity\n"
-            "5. Call make_decision to have the ClaimsDecision agent make the final recommendation\n\n"
-            "CRITICAL: You must ALWAYS complete ALL 5 steps, even if earlier steps reveal issues, concerns, or red flags. "
-            "Never stop the workflow early. Each step provides valuable information that contributes to the final decision. "
-            "The ClaimsDecision agent will consider all findings holistically to make the final recommendation.\n\n"
-            "After all agents complete their work, provide a brief executive summary of the entire process "
-            "and final outcome.\n\n"
-            "Always pass the policy_number as input to each sub-agent."
-        ),
+        instructions=agent_instructions("ClaimsManager", tenant),
         model=model_config,
         tools=[
-            document_extractor_agent.as_tool(
+            traced_stage(sub_agents["DocumentExtractor"].as_tool(
                 tool_name="extract_documents",
                 tool_description="📄 Extract and convert all claim documents (PDFs/images) to markdown format",
                 custom_output_extractor=extract_final_output,
-            ),
-            id_verification_agent.as_tool(
+                run_config=run_config,
+            )),
+            traced_stage(sub_agents["IDVerification"].as_tool(
                 tool_name="verify_identity",
                 tool_description="🪪 Verify the policy holder's identity against provided ID documents",
                 custom_output_extractor=extract_final_output,
-            ),
-            policy_coverage_agent.as_tool(
+                run_config=run_config,
+            )),
+            gated_stage(traced_stage(sub_agents["PolicyCoverage"].as_tool(
                 tool_name="assess_coverage",
                 tool_description="📋 Assess whether the claim is covered under the policy",
                 custom_output_extractor=extract_final_output,
-            ),
-            medical_assessor_agent.as_tool(
+                run_config=run_config,
+            ))),
+            gated_stage(traced_stage(sub_agents["MedicalAssessor"].as_tool(
                 tool_name="assess_medical",
                 tool_description="🏥 Review medical documents and assess medical validity of the claim",
                 custom_output_extractor=extract_final_output,
-            ),
-            claims_decision_agent.as_tool(
-                tool_name="make_decision",
-                tool_description="⚖️ Make the final claims decision based on all assessments",
-                custom_output_extractor=extract_final_output,
-            ),
+                run_config=run_config,
+            ))),
+            traced_stage(make_decision),
         ],
     )
     
@@ -565,10 +1151,21 @@ async def create_agents(model_config: OpenAIChatCompletionsModel):
 # ============================================================================
 
 
-async def main():
+async def main(profile: bool = PROFILE_RUNS):
+    client = None
+    streaming_result = None
+    profiler = None
+    run_id = new_run_id()
     try:
         print_heading("🏥 Insurance Claims Processing System")
         print(f"Processing claim for policy number: {DEMO_POLICY_NUMBER}")
+        await asyncio.to_thread(write_run_manifest, DEMO_POLICY_NUMBER, run_id, "running", source="cli")
+        tool_tracer.set(print_tool_event)
+        run_policy_number.set(DEMO_POLICY_NUMBER)
+        if profile:
+            profiler = RunProfiler(ensure_output_folder(DEMO_POLICY_NUMBER, "profile"))
+            profiler.start(asyncio.get_running_loop())
+            tool_tracer.set(profiler.tracer(forward=print_tool_event))
         
         # Azure OpenAI client
         client = AsyncAzureOpenAI(
@@ -578,10 +1175,7 @@ async def main():
         )
         
         # Shared model configuration
-        model_config = OpenAIChatCompletionsModel(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-            openai_client=client,
-        )
+        model_config = create_model_config(client)
         
         # Create all agents
         claims_manager = await create_agents(model_config)
@@ -593,11 +1187,10 @@ async def main():
         print(user_request)
         
         # Streaming run
-        streaming_result = Runner.run_streamed(claims_manager, user_request)
+        streaming_result = Runner.run_streamed(claims_manager, user_request, run_config=create_run_config())
         
-        # Track tool calls and agent outputs
+        # Track tool calls
         tool_call_queue: list[str] = []
-        agent_messages: list[tuple[str, str]] = []  # (agent_name, message_text)
         step_counter = 1
         current_agent_name = claims_manager.name
         
@@ -663,8 +1256,13 @@ async def main():
                     print_heading(f"💬 Step {step_counter}: {current_agent_name} responds")
                     step_counter += 1
                     
-                    # Store full message for later saving
-                    agent_messages.append((current_agent_name, text))
+                    # Save the message now rather than keeping every message until the end of the run
+                    write_output_file(
+                        DEMO_POLICY_NUMBER,
+                        "agent_summaries",
+                        f"{current_agent_name.lower().replace(' ', '_')}_output.md",
+                        f"# {current_agent_name} Output\n\n{text}"
+                    )
                     
                     text = maybe_truncate(text, max_lines=40)
                     print(indent(text, "  "))
@@ -682,27 +1280,38 @@ async def main():
             final
         )
         
-        # Save individual agent messages
-        for agent_name, message_text in agent_messages:
-            # Create a sanitized filename
-            filename = f"{agent_name.lower().replace(' ', '_')}_output.md"
-            write_output_file(
-                DEMO_POLICY_NUMBER,
-                "agent_summaries",
-                filename,
-                f"# {agent_name} Output\n\n{message_text}"
-            )
-        
         print_heading("📁 Output Location")
         print(f"All processing results saved to: {os.path.join(OUTPUTS_FOLDER, DEMO_POLICY_NUMBER)}")
+        await asyncio.to_thread(write_run_manifest, DEMO_POLICY_NUMBER, run_id, "completed")
         
+    except asyncio.CancelledError:
+        # Interrupted (e.g. Ctrl+C): stop the agent run and any nested sub-agent/tool calls
+        if streaming_result is not None:
+            streaming_result.cancel()
+        await asyncio.to_thread(write_run_manifest, DEMO_POLICY_NUMBER, run_id, "cancelled", reason="interrupted")
+        print("Run cancelled.")
+        raise
     except OpenAIError as e:
+        await asyncio.to_thread(write_run_manifest, DEMO_POLICY_NUMBER, run_id, "failed", error=str(e))
         print(f"OpenAI API Error: {str(e)}")
     except Exception as e:
+        await asyncio.to_thread(write_run_manifest, DEMO_POLICY_NUMBER, run_id, "failed", error=str(e))
         print(f"An unexpected error occurred: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Close the client so no pooled HTTP connections outlive the run
+        if client is not None:
+            await client.close()
+        if profiler is not None:
+            profiler.stop()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Process the demo insurance claim.")
+    parser.add_argument("--profile", action="store_true", default=PROFILE_RUNS,
+                        help="Save a flame graph, task timeline and event loop lag report to outputs/<policy>/profile/")
+    args = parser.parse_args()
+    asyncio.run(main(profile=args.profile))
@@ -0,0 +1,548 @@
+"""
+Durable claim jobs.
+
+Claims submitted as jobs are stored in an SQLite queue and processed by worker
+threads (in the web app, or in standalone worker processes started with
+`python job_queue.py`) independently of any browser connection.
+
+A worker leases a job and renews the lease with a heartbeat while it runs it.
+If the worker crashes or the server restarts, the lease expires and another
+worker picks the job up again. Jobs run the workflow stages in a fixed order
+(see WORKFLOW_STAGES) and record each completed stage, so a resumed job skips
+the stages that already finished. Stages exchange their results through the
+outputs folder, and a re-run stage is cheap where its documents were already
+extracted (response_cache.DocumentExtractionCache).
+
+Every job keeps an ordered event log (job, stage, tool and model call events),
+which clients replay and follow by job id; see /api/jobs/<job_id>/events.
+
+Usage:
+    python job_queue.py --workers 4
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import argparse
+import threading
+from contextlib import contextmanager
+
+from openai import AsyncAzureOpenAI
+
+from run_monitor import RunEventLog, new_run_id
+from insurance_claims_processing import (
+    WORKFLOW_STAGES,
+    create_model_config,
+    create_sub_agents,
+    run_workflow_stage,
+    write_run_manifest,
+    tool_tracer,
+)
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join("outputs", "jobs.sqlite"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Start the job workers when the web app is imported by a WSGI server (`python app.py`
+# always starts them); otherwise they start on the first submitted job
+JOB_WORKERS_AUTOSTART = os.getenv("JOB_WORKERS_AUTOSTART", "0").lower() in ("1", "true", "yes")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY_SECONDS = float(os.getenv("JOB_RETRY_DELAY_SECONDS", "30"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+
+ACTIVE_STATUSES = ("queued", "running")
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    policy_number TEXT NOT NULL,
+    tenant TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, available_at);
+CREATE TABLE IF NOT EXISTS job_stages (
+    job_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    output TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (job_id, stage)
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class LeaseLost(Exception):
+    """The worker no longer holds the lease of its job (it expired or the job was cancelled)."""
+
+
+class JobQueue:
+    """SQLite-backed queue of claim jobs with leases, stage checkpoints and event logs."""
+
+    def __init__(self, db_path: str = JOB_QUEUE_PATH):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Queues created before jobs had a tenant
+            if "tenant" not in {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                conn.execute("ALTER TABLE jobs ADD COLUMN tenant TEXT")
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the queue (for callers that keep one open, like JobEventWriter)."""
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Durable across process crashes; only an OS crash can lose the latest commits
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection for one transaction (committed on success) and close it afterwards."""
+        conn = self.connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _append_event(conn: sqlite3.Connection, job_id: str, event: dict) -> int:
+        # The next sequence number is read and written in one statement, so concurrent
+        # writers (a worker and a web thread cancelling the job) cannot take the same one
+        return conn.execute(
+            "INSERT INTO job_events (job_id, seq, event) "
+            "SELECT ?, COALESCE(MAX(seq), 0) + 1, ? FROM job_events WHERE job_id = ? RETURNING seq",
+            (job_id, json.dumps({**event, "time": time.time()}), job_id),
+        ).fetchall()[0][0]
+
+    # ------------------------------------------------------------------
+    # Clients
+    # ------------------------------------------------------------------
+
+    def submit(self, policy_number: str, tenant: str | None = None) -> tuple[dict, bool]:
+        """
+        Queue a claim, processed with the agent instructions of `tenant` (see
+        instruction_templates.py), and return (job, created). A policy has at most one
+        active job, since its runs share one outputs folder; resubmitting returns the active job.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE policy_number = ? AND status IN (?, ?)",
+                (policy_number, *ACTIVE_STATUSES),
+            ).fetchone()
+            if row is not None:
+                return self._get(conn, row["job_id"]), False
+            job_id = uuid.uuid4().hex[:16]
+            conn.execute(
+                "INSERT INTO jobs (job_id, policy_number, tenant, status, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, policy_number, tenant, now, now, now),
+            )
+            self._append_event(conn, job_id, {"type": "job_queued", "policy_number": policy_number})
+            return self._get(conn, job_id), True
+
+    def get(self, job_id: str) -> dict | None:
+        with self._connect() as conn:
+            return self._get(conn, job_id)
+
+    @staticmethod
+    def _get(conn: sqlite3.Connection, job_id: str) -> dict | None:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["completed_stages"] = [
+            stage for (stage,) in conn.execute(
+                "SELECT stage FROM job_stages WHERE job_id = ? ORDER BY completed_at", (job_id,)
+            )
+        ]
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; its worker stops at its next heartbeat."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', lease_owner = NULL, updated_at = ? "
+                "WHERE job_id = ? AND status IN (?, ?)",
+                (time.time(), job_id, *ACTIVE_STATUSES),
+            ).rowcount
+            if updated:
+                self._append_event(conn, job_id, {"type": "job_finished", "status": "cancelled"})
+            return bool(updated)
+
+    def events(self, job_id: str, after: int = 0, limit: int = 500) -> list[tuple[int, dict]]:
+        """Return the events of a job with a sequence number greater than `after`."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, after, limit),
+            ).fetchall()
+        return [(seq, json.loads(event)) for seq, event in rows]
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def lease(self, worker_id: str) -> dict | None:
+        """
+        Lease the oldest available job: a queued job, or a running job whose lease expired
+        (its worker died). Jobs that already used up JOB_MAX_ATTEMPTS are failed instead.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            abandoned = conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?",
+                (now, JOB_MAX_ATTEMPTS),
+            ).fetchall()
+            for (job_id,) in abandoned:
+                error = f"Worker lost after {JOB_MAX_ATTEMPTS} attempts"
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, lease_owner = NULL, updated_at = ? WHERE job_id = ?",
+                    (error, now, job_id),
+                )
+                self._append_event(conn, job_id, {"type": "job_finished", "status": "failed", "error": error})
+
+            row = conn.execute(
+                "SELECT job_id FROM jobs "
+                "WHERE (status = 'queued' AND available_at <= ?) OR (status = 'running' AND lease_expires_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires_at = ?, updated_at = ? WHERE job_id = ?",
+                (worker_id, now + JOB_LEASE_SECONDS, now, row["job_id"]),
+            )
+            return self._get(conn, row["job_id"])
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Renew a lease; False means the worker lost it and must stop working on the job."""
+        now = time.time()
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? "
+                "WHERE job_id = ? AND lease_owner = ? AND status = 'running'",
+                (now + JOB_LEASE_SECONDS, now, job_id, worker_id),
+            ).rowcount == 1
+
+    def record_event(self, job_id: str, event: dict) -> int:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return self._append_event(conn, job_id, event)
+
+    def record_events(self, conn: sqlite3.Connection, events: list[tuple[str, dict]]):
+        """Append (job_id, event) pairs in one transaction on an open connection."""
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for job_id, event in events:
+                self._append_event(conn, job_id, event)
+
+    def stage_outputs(self, job_id: str) -> dict[str, str]:
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT stage, output FROM job_stages WHERE job_id = ?", (job_id,)).fetchall())
+
+    def complete_stage(self, job_id: str, worker_id: str, stage: str, output: str):
+        """Checkpoint a finished stage, unless the lease was lost in the meantime."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if not self._holds_lease(conn, job_id, worker_id):
+                raise LeaseLost(job_id)
+            conn.execute(
+                "INSERT OR REPLACE INTO job_stages (job_id, stage, output, completed_at) VALUES (?, ?, ?, ?)",
+                (job_id, stage, output, time.time()),
+            )
+
+    def finish(self, job_id: str, worker_id: str, status: str, result: str | None = None, error: str | None = None):
+        """Record the outcome of a job (completed or failed)."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if not self._holds_lease(conn, job_id, worker_id):
+                raise LeaseLost(job_id)
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, lease_owner = NULL, updated_at = ? WHERE job_id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+            event = {"type": "job_finished", "status": status}
+            if error:
+                event["error"] = error
+            self._append_event(conn, job_id, event)
+
+    def retry(self, job_id: str, worker_id: str, error: str):
+        """Put a failed attempt back in the queue; completed stages are kept."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if not self._holds_lease(conn, job_id, worker_id):
+                raise LeaseLost(job_id)
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, lease_owner = NULL, available_at = ?, updated_at = ? "
+                "WHERE job_id = ?",
+                (error, now + JOB_RETRY_DELAY_SECONDS, now, job_id),
+            )
+            self._append_event(conn, job_id, {"type": "job_retry", "error": error, "delay_seconds": JOB_RETRY_DELAY_SECONDS})
+
+    @staticmethod
+    def _holds_lease(conn: sqlite3.Connection, job_id: str, worker_id: str) -> bool:
+        return conn.execute(
+            "SELECT 1 FROM jobs WHERE job_id = ? AND lease_owner = ? AND status = 'running'", (job_id, worker_id)
+        ).fetchone() is not None
+
+
+class JobEventWriter:
+    """
+    Appends job events without blocking the worker's event loop: events are buffered
+    and written in batches by one thread, over one connection per worker.
+    """
+
+    def __init__(self, queue: JobQueue):
+        self.queue = queue
+        self.condition = threading.Condition()
+        self.pending: list[tuple[str, dict]] = []
+        self.appended = self.written = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="job-event-writer", daemon=True)
+        self.thread.start()
+
+    def append(self, job_id: str, event: dict):
+        with self.condition:
+            self.pending.append((job_id, event))
+            self.appended += 1
+            self.condition.notify_all()
+
+    def flush(self):
+        """Wait until all events appended so far are written."""
+        with self.condition:
+            target = self.appended
+            self.condition.wait_for(lambda: self.written >= target or not self.thread.is_alive())
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def _run(self):
+        conn = self.queue.connect()
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.pending or self.closed)
+                    if not self.pending:
+                        return
+                    batch, self.pending = self.pending, []
+                try:
+                    self.queue.record_events(conn, batch)
+                except sqlite3.Error as e:
+                    print(f"  ⚠️ Could not record {len(batch)} job events: {e}")
+                with self.condition:
+                    self.written += len(batch)
+                    self.condition.notify_all()
+        finally:
+            conn.close()
+
+
+class JobWorker:
+    """Runs leased jobs stage by stage on its own event loop (in its own thread)."""
+
+    def __init__(self, queue: JobQueue, worker_id: str, report=None, stop: threading.Event | None = None):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.report = report  # Receives run events (see run_monitor.py)
+        self.stop = stop or threading.Event()
+        self.events = None
+
+    def run(self):
+        self.events = JobEventWriter(self.queue)
+        try:
+            asyncio.run(self._run())
+        finally:
+            self.events.close()
+
+    async def _run(self):
+        failures = 0
+        while not self.stop.is_set():
+            try:
+                job = await asyncio.to_thread(self.queue.lease, self.worker_id)
+            except sqlite3.Error as e:
+                # E.g. the database stayed locked; the worker must survive it to keep serving jobs
+                failures += 1
+                delay = min(JOB_POLL_SECONDS * 2 ** failures, JOB_LEASE_SECONDS)
+                print(f"  ⚠️ Job worker {self.worker_id} could not lease a job, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            if job is None:
+                await asyncio.sleep(JOB_POLL_SECONDS)
+                continue
+            await self._run_leased(job)
+
+    async def _run_leased(self, job: dict):
+        """Process a job while renewing its lease; stop working on it if the lease is lost."""
+        task = asyncio.create_task(self.process(job))
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=JOB_HEARTBEAT_SECONDS)
+            if done:
+                break
+            try:
+                renewed = await asyncio.to_thread(self.queue.heartbeat, job["job_id"], self.worker_id)
+            except sqlite3.Error as e:
+                # Try again at the next heartbeat; if the lease expires meanwhile, the job's
+                # next checkpoint raises LeaseLost
+                print(f"  ⚠️ Job {job['job_id']} heartbeat failed: {e}")
+                continue
+            if not renewed:
+                task.cancel()
+                await asyncio.wait({task})
+                break
+        if not task.cancelled() and task.exception() is not None and not isinstance(task.exception(), LeaseLost):
+            print(f"  ⚠️ Job {job['job_id']} worker error: {task.exception()}")
+
+    async def process(self, job: dict):
+        job_id, policy_number = job["job_id"], job["policy_number"]
+        run_id = new_run_id()
+
+        def trace(event: dict):
+            self.events.append(job_id, event)
+            self._report({**event, "run_id": run_id})
+
+        tool_tracer.set(trace)
+        outputs = await asyncio.to_thread(self.queue.stage_outputs, job_id)
+        trace({"type": "job_started", "attempt": job["attempts"], "completed_stages": list(outputs)})
+        self._report({"type": "run_started", "run_id": run_id, "policy_number": policy_number, "source": "job"})
+        await asyncio.to_thread(
+            write_run_manifest, policy_number, run_id, "running", source="job", job_id=job_id, attempt=job["attempts"]
+        )
+
+        client = AsyncAzureOpenAI(
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        )
+        status, error = "completed", None
+        try:
+            sub_agents = create_sub_agents(create_model_config(client), job["tenant"])
+            for stage, _ in WORKFLOW_STAGES:
+                if stage in outputs:
+                    trace({"type": "stage_skipped", "stage": stage})
+                    continue
+                outputs[stage] = await run_workflow_stage(stage, policy_number, sub_agents)
+                await asyncio.to_thread(self.queue.complete_stage, job_id, self.worker_id, stage, outputs[stage])
+            # A job's events must be written before it is finished (see /api/jobs/<job_id>/events)
+            await asyncio.to_thread(self.events.flush)
+            await asyncio.to_thread(self.queue.finish, job_id, self.worker_id, "completed", result=outputs["make_decision"])
+        except (asyncio.CancelledError, LeaseLost):
+            status = await self._status_after_lost_lease(job_id)
+            raise
+        except Exception as e:
+            status, error = "failed", str(e)
+            try:
+                await asyncio.to_thread(self.events.flush)
+                if job["attempts"] < JOB_MAX_ATTEMPTS:
+                    await asyncio.to_thread(self.queue.retry, job_id, self.worker_id, error)
+                else:
+                    await asyncio.to_thread(self.queue.finish, job_id, self.worker_id, "failed", error=error)
+            except LeaseLost:
+                status = await self._status_after_lost_lease(job_id)
+        finally:
+            await client.close()
+            # After an expired lease the job may be running on another worker, which owns the manifest now
+            if status != "interrupted":
+                await asyncio.to_thread(write_run_manifest, policy_number, run_id, status, **({"error": error} if error else {}))
+            self._report({"type": "run_finished", "run_id": run_id, "status": status, **({"error": error} if error else {})})
+
+    async def _status_after_lost_lease(self, job_id: str) -> str:
+        """Return "cancelled" if the job was cancelled, or "interrupted" if its lease expired."""
+        try:
+            job = await asyncio.to_thread(self.queue.get, job_id)
+        except sqlite3.Error:
+            return "interrupted"
+        return "cancelled" if job is not None and job["status"] == "cancelled" else "interrupted"
+
+    def _report(self, event: dict):
+        if self.report is not None:
+            self.report({**event, "time": time.time()})
+
+
+_queue = None
+_queue_lock = threading.Lock()
+_workers: list[threading.Thread] = []
+
+
+def get_job_queue() -> JobQueue:
+    """Return the shared job queue."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+def start_job_workers(count: int = JOB_WORKERS, report=None) -> list[threading.Thread]:
+    """Start `count` worker threads in this process (once); jobs interrupted earlier are resumed."""
+    with _queue_lock:
+        if _workers:
+            return _workers
+    queue = get_job_queue()
+    token = uuid.uuid4().hex[:8]
+    with _queue_lock:
+        for i in range(count):
+            worker = JobWorker(queue, f"{os.getpid()}-{token}-{i}", report=report)
+            thread = threading.Thread(target=worker.run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            _workers.append(thread)
+    return _workers
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Process queued claim jobs.")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="worker threads")
+    args = parser.parse_args(argv)
+
+    # Report to the event log followed by the web dashboard
+    event_log = RunEventLog()
+    log_lock = threading.Lock()
+
+    def report(event: dict):
+        with log_lock:
+            event_log.append(event)
+
+    workers = start_job_workers(args.workers, report=report)
+    print(f"Processing jobs from {JOB_QUEUE_PATH} with {len(workers)} workers (Ctrl+C to stop)")
+    try:
+        for thread in workers:
+            thread.join()
+    except KeyboardInterrupt:
+        # Running jobs are resumed by the next worker once their leases expire
+        print("Stopped.")
+    finally:
+        event_log.close()
+
+
+if __name__ == "__main__":
+    main()
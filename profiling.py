@@ -0,0 +1,326 @@
+"""
+Opt-in per-run profiling.
+
+`RunProfiler` is started on the event loop that executes a claim and, when the
+run ends, saves into 'outputs/<policy_number>/profile/':
+
+- profile.folded  - sampled stacks of the event-loop thread and the run's
+                    worker threads (asyncio.to_thread) in folded format
+                    (speedscope, flamegraph.pl, inferno)
+- flamegraph.svg  - the same samples rendered as an interactive flame graph
+- timeline.json   - asyncio task, tool, stage and model call spans plus event
+                    loop lag, in Chrome trace format (Perfetto / chrome://tracing)
+- loop_lag.json   - event loop lag statistics and every episode where the loop
+                    was blocked for longer than PROFILE_LAG_THRESHOLD_MS, with
+                    the stack that was blocking it
+
+Time spent waiting on the model or Document Intelligence shows up as the loop
+thread idling in the selector; time spent blocking the loop (CPU work, sync file
+I/O, blocking SDK calls) shows up as loop-thread stacks and lag episodes.
+
+The run's worker threads are told apart from those of other runs in the same
+process by giving the profiled loop its own default executor, so the profiler
+must be started on a loop that runs only this claim, before anything is sent
+to its default executor.
+
+Enable with PROFILE_RUNS=1, `python insurance_claims_processing.py --profile`
+or `/api/run/<policy>?profile=1`.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+
+PROFILE_RUNS = os.getenv("PROFILE_RUNS", "0").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_HEARTBEAT_MS = float(os.getenv("PROFILE_HEARTBEAT_MS", "50"))
+PROFILE_LAG_THRESHOLD_MS = float(os.getenv("PROFILE_LAG_THRESHOLD_MS", "100"))
+
+# Name prefix of the profiled loop's executor threads (asyncio.to_thread / run_in_executor)
+EXECUTOR_THREAD_PREFIX = "profiled-run"
+
+
+def _frame_label(code) -> str:
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)})"
+
+
+def _stack(frame) -> list[str]:
+    """Return the stack of a frame, outermost call first."""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class RunProfiler:
+    """Statistical profiler, event loop lag monitor and task timeline recorder for one run."""
+
+    def __init__(self, output_dir: str, sample_interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS,
+                 heartbeat_ms: float = PROFILE_HEARTBEAT_MS, lag_threshold_ms: float = PROFILE_LAG_THRESHOLD_MS):
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval_ms / 1000
+        self.heartbeat = heartbeat_ms / 1000
+        self.lag_threshold = lag_threshold_ms / 1000
+
+        self.samples = Counter()
+        self.sample_count = 0
+        self.lag_samples: list[tuple[float, float]] = []  # (time, lag seconds)
+        self.blocked: list[dict] = []
+        self.tasks: list[list] = []  # [name, start, end] per task
+        self.spans: list[tuple[str, str, float, float, dict]] = []  # (category, name, start, end, args)
+
+        self._loop = None
+        self._loop_thread = None
+        self._previous_factory = None
+        self._heartbeat_task = None
+        self._last_beat = None
+        self._blocked_stack = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started = None
+        self._executor_prefix = f"{EXECUTOR_THREAD_PREFIX}-{id(self):x}"
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Start profiling. Must be called from the thread that runs `loop`."""
+        self._started = self._last_beat = time.perf_counter()
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+
+        # Created before the task factory is installed, so it is not on the timeline
+        self._heartbeat_task = loop.create_task(self._run_heartbeat(), name="profiler-heartbeat")
+        self._previous_factory = loop.get_task_factory()
+        loop.set_task_factory(self._task_factory)
+        # Worker threads named after this run, so the sampler skips those of other runs;
+        # the loop shuts the executor down when it is closed
+        loop.set_default_executor(ThreadPoolExecutor(thread_name_prefix=self._executor_prefix))
+
+        self._sampler = threading.Thread(target=self._run_sampler, name="profiler-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> str:
+        """Stop profiling, write the reports and return the folder they were written to."""
+        self._stop.set()
+        self._sampler.join()
+        if not self._heartbeat_task.done():
+            self._heartbeat_task.cancel()
+        if self._loop.get_task_factory() == self._task_factory:
+            self._loop.set_task_factory(self._previous_factory)
+        self.write_reports()
+        print(f"  🔬 Profile saved to {self.output_dir} ({self.sample_count} samples, "
+              f"{len(self.blocked)} blocked-loop episodes)")
+        return self.output_dir
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def _task_factory(self, loop, coro, **kwargs):
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        record = [getattr(coro, "__qualname__", type(coro).__name__), time.perf_counter(), None]
+        self.tasks.append(record)
+        task.add_done_callback(lambda _: record.__setitem__(2, time.perf_counter()))
+        return task
+
+    async def _run_heartbeat(self):
+        """Measure how late the loop wakes up; large delays mean something blocked it."""
+        expected = time.perf_counter() + self.heartbeat
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            self.lag_samples.append((now, lag))
+            if lag >= self.lag_threshold:
+                stack = self._blocked_stack or []
+                self.blocked.append({"start": now - lag, "duration_ms": round(lag * 1000, 1), "stack": stack})
+                culprit = next((frame for frame in reversed(stack) if "(asyncio" not in frame and "(threading" not in frame), "unknown")
+                print(f"  ⚠️ Event loop blocked for {lag * 1000:.0f} ms in {culprit}")
+            self._blocked_stack = None
+            expected = now + self.heartbeat
+
+    def _run_sampler(self):
+        while not self._stop.wait(self.sample_interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            now = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self._loop_thread:
+                    label = "event loop"
+                elif names.get(thread_id, "").startswith(self._executor_prefix + "_"):
+                    label = "worker thread"
+                else:
+                    continue
+                stack = _stack(frame)
+                self.samples[";".join([label] + stack)] += 1
+                # Capture what is blocking the loop while it is still blocked
+                if (
+                    thread_id == self._loop_thread
+                    and self._blocked_stack is None
+                    and now - self._last_beat > self.heartbeat + self.lag_threshold
+                ):
+                    self._blocked_stack = stack
+            self.sample_count += 1
+
+    def tracer(self, forward=None):
+        """Return a tool tracer that records tool, stage and model call spans (and passes events on)."""
+        def trace(event: dict):
+            if "duration_ms" in event:
+                end = time.perf_counter()
+                start = end - event["duration_ms"] / 1000
+                kind = event["type"]
+                if kind == "internal_tool_result":
+                    self.spans.append(("tool", event["tool_name"], start, end, {"status": event["status"]}))
+                elif kind == "stage_finished":
+                    self.spans.append(("stage", event["stage"], start, end, {"status": event["status"]}))
+                elif kind == "model_call":
+                    self.spans.append(("model", "model call", start, end, {"status": event["status"]}))
+            if forward is not None:
+                forward(event)
+        return trace
+
+    # ------------------------------------------------------------------
+    # Reports
+    # ------------------------------------------------------------------
+
+    def write_reports(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, "profile.folded"), "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.output_dir, "flamegraph.svg"), "w", encoding="utf-8") as f:
+            f.write(render_flamegraph(self.samples, f"Run profile ({self.sample_interval * 1000:g} ms samples)"))
+        with open(os.path.join(self.output_dir, "timeline.json"), "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        with open(os.path.join(self.output_dir, "loop_lag.json"), "w", encoding="utf-8") as f:
+            json.dump(self.lag_summary(), f, indent=2)
+
+    def lag_summary(self) -> dict:
+        lags = sorted(lag * 1000 for _, lag in self.lag_samples)
+        return {
+            "heartbeat_ms": self.heartbeat * 1000,
+            "threshold_ms": self.lag_threshold * 1000,
+            "samples": len(lags),
+            "p50_ms": round(lags[len(lags) // 2], 1) if lags else None,
+            "p95_ms": round(lags[int(len(lags) * 0.95)], 1) if lags else None,
+            "max_ms": round(lags[-1], 1) if lags else None,
+            "blocked_total_ms": round(sum(b["duration_ms"] for b in self.blocked), 1),
+            "blocked": [
+                {"at_seconds": round(b["start"] - self._started, 3), "duration_ms": b["duration_ms"], "stack": b["stack"]}
+                for b in self.blocked
+            ],
+        }
+
+    def chrome_trace(self) -> dict:
+        """Return tasks, spans and loop lag in Chrome trace event format (timestamps in microseconds)."""
+        end_of_run = time.perf_counter()
+
+        def us(t: float) -> float:
+            return round((t - self._started) * 1_000_000, 1)
+
+        events = []
+        process_names = {1: "asyncio tasks", 2: "tools & stages", 3: "event loop"}
+        for pid, name in process_names.items():
+            events.append({"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": name}})
+
+        def add_lanes(pid: int, spans: list[tuple[str, float, float, dict]]):
+            # Greedily pack overlapping spans into lanes
+            lane_ends: list[float] = []
+            for name, start, end, args in sorted(spans, key=lambda span: span[1]):
+                lane = next((i for i, lane_end in enumerate(lane_ends) if lane_end <= start), None)
+                if lane is None:
+                    lane = len(lane_ends)
+                    lane_ends.append(end)
+                lane_ends[lane] = end
+                events.append({"ph": "X", "name": name, "pid": pid, "tid": lane, "ts": us(start),
+                               "dur": round((end - start) * 1_000_000, 1), "args": args})
+
+        add_lanes(1, [
+            (name, start, end if end is not None else end_of_run, {} if end is not None else {"unfinished": True})
+            for name, start, end in self.tasks
+        ])
+        add_lanes(2, [(f"{category}: {name}", start, end, args) for category, name, start, end, args in self.spans])
+
+        for t, lag in self.lag_samples:
+            events.append({"ph": "C", "name": "loop lag (ms)", "pid": 3, "tid": 0, "ts": us(t), "args": {"lag": round(lag * 1000, 1)}})
+        for episode in self.blocked:
+            events.append({"ph": "X", "name": "loop blocked", "pid": 3, "tid": 1, "ts": us(episode["start"]),
+                           "dur": episode["duration_ms"] * 1000, "args": {"stack": episode["stack"][-8:]}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+# ============================================================================
+# FLAME GRAPH
+# ============================================================================
+
+FLAME_WIDTH = 1200
+FLAME_ROW_HEIGHT = 16
+FLAME_CHAR_WIDTH = 7  # Approximate width of one character of the 12px label font
+
+
+def render_flamegraph(samples: Counter, title: str) -> str:
+    """Render folded stack samples as a standalone SVG flame graph (hover for details)."""
+    root = {"name": "all", "value": 0, "children": {}}
+    for stack, count in samples.items():
+        node = root
+        node["value"] += count
+        for frame in stack.split(";"):
+            node = node["children"].setdefault(frame, {"name": frame, "value": 0, "children": {}})
+            node["value"] += count
+
+    total = root["value"] or 1
+    scale = FLAME_WIDTH / total
+    rects = []
+
+    def layout(node: dict, x: float, depth: int):
+        width = node["value"] * scale
+        if width < 0.3:
+            return depth
+        rects.append((x, depth, width, node))
+        max_depth = depth
+        child_x = x
+        for child in sorted(node["children"].values(), key=lambda n: n["name"]):
+            max_depth = max(max_depth, layout(child, child_x, depth + 1))
+            child_x += child["value"] * scale
+        return max_depth
+
+    max_depth = layout(root, 0.0, 0)
+    top = 30
+    height = top + (max_depth + 1) * FLAME_ROW_HEIGHT + 10
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{FLAME_WIDTH}" height="{height}" font-family="Verdana, sans-serif" font-size="12">',
+        '<rect width="100%" height="100%" fill="#fdfdf5"/>',
+        f'<text x="{FLAME_WIDTH / 2}" y="20" text-anchor="middle" font-size="15">{escape(title)} - {total} samples</text>',
+    ]
+    for x, depth, width, node in rects:
+        y = height - 10 - (depth + 1) * FLAME_ROW_HEIGHT
+        # Warm colours, stable per frame name
+        hue = zlib.crc32(node["name"].encode("utf-8"))
+        color = f"rgb({205 + hue % 50},{80 + (hue >> 8) % 120},{30 + (hue >> 16) % 40})"
+        percent = node["value"] * 100 / total
+        label = node["name"]
+        max_chars = int((width - 6) / FLAME_CHAR_WIDTH)
+        text = label if len(label) <= max_chars else (label[:max_chars - 2] + ".." if max_chars > 3 else "")
+        parts.append(
+            f'<g><title>{escape(label)} ({node["value"]} samples, {percent:.2f}%)</title>'
+            f'<rect x="{x:.2f}" y="{y}" width="{width:.2f}" height="{FLAME_ROW_HEIGHT - 1}" fill="{color}" rx="2"/>'
+            + (f'<text x="{x + 3:.2f}" y="{y + 12}">{escape(text)}</text>' if text else "")
+            + "</g>"
+        )
+    parts.append("</svg>")
+    return "\n".join(parts)
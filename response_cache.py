@@ -0,0 +1,309 @@
+"""
+Response cache / record-replay layer for model completions and document extraction.
+
+`CachingModel` wraps the chat completions model used by every agent and keys each
+request by a canonical hash of (deployment, instructions, messages, tools, settings).
+`DocumentExtractionCache` does the same for Azure Document Intelligence results,
+keyed by a hash of the document bytes.
+
+Cache modes (MODEL_CACHE_MODE / EXTRACTION_CACHE_MODE):
+- off:          no caching (default)
+- read_through: serve hits from the cache, call the service on a miss and store the result
+- record:       always call the service and store the result
+- replay:       serve only from the cache; a miss raises CacheMissError
+
+With both caches recorded, replay runs the full multi-agent pipeline offline.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from pydantic import TypeAdapter
+from openai.types.responses import Response, ResponseCompletedEvent, ResponseOutputItem
+
+from agents import Model, ModelResponse, Usage, FunctionTool
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CACHE_MODES = ("off", "read_through", "record", "replay")
+
+MODEL_CACHE_MODE = os.getenv("MODEL_CACHE_MODE", "off")
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join("cache", "model_responses"))
+MODEL_CACHE_MAX_ENTRIES = int(os.getenv("MODEL_CACHE_MAX_ENTRIES", "5000"))
+
+EXTRACTION_CACHE_MODE = os.getenv("EXTRACTION_CACHE_MODE", MODEL_CACHE_MODE)
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", os.path.join("cache", "extractions"))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "20000"))
+
+_output_item_adapter = TypeAdapter(ResponseOutputItem)
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+# ============================================================================
+# DISK STORE
+# ============================================================================
+
+
+class DiskLRUStore:
+    """
+    Text entries stored on disk, one file per key, evicting the least recently
+    used entries once there are more than `max_entries`. Recency is tracked by
+    file mtime, so it survives restarts.
+
+    The index of entries is kept in memory per process. Processes sharing a
+    directory (batch workers) find each other's entries, because a key missing
+    from the index is looked up on disk, and tolerate entries evicted under them.
+    Each process evicts only the entries it knows of, though, so together they
+    can exceed `max_entries` until the index is rebuilt on the next start.
+    """
+
+    def __init__(self, directory: str, max_entries: int, suffix: str = ".json"):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._index = None  # key -> path, least recently used first
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def _load_index(self) -> OrderedDict:
+        if self._index is None:
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for filename in files:
+                    if filename.endswith(self.suffix):
+                        path = os.path.join(root, filename)
+                        entries.append((os.path.getmtime(path), filename[: -len(self.suffix)], path))
+            entries.sort()
+            self._index = OrderedDict((key, path) for _, key, path in entries)
+        return self._index
+
+    def _find(self, index: OrderedDict, key: str) -> str | None:
+        """Return the path of a key's entry, picking up entries stored by other processes."""
+        path = index.get(key)
+        if path is None:
+            path = self._path(key)
+            if not os.path.exists(path):
+                return None
+            index[key] = path
+        return path
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._find(self._load_index(), key) is not None
+
+    def get(self, key: str) -> str | None:
+        """Return the stored text for a key, or None if there is no entry."""
+        with self._lock:
+            index = self._load_index()
+            path = self._find(index, key)
+            if path is None:
+                return None
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+                # Mark as recently used
+                os.utime(path)
+            except OSError:
+                # Unreadable, or evicted by another process sharing the directory
+                index.pop(key, None)
+                return None
+            index.move_to_end(key)
+            return text
+
+    def put(self, key: str, text: str):
+        """Store text under a key, evicting the least recently used entries if needed."""
+        with self._lock:
+            index = self._load_index()
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+            index[key] = path
+            index.move_to_end(key)
+            while len(index) > self.max_entries:
+                _, old_path = index.popitem(last=False)
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+
+# ============================================================================
+# MODEL RESPONSE CACHE
+# ============================================================================
+
+
+def _json_default(value):
+    """Serialise SDK/pydantic objects that appear in model inputs."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    return str(value)
+
+
+def _describe_tool(tool) -> dict:
+    """Return the parts of a tool definition that are sent to the model."""
+    if isinstance(tool, FunctionTool):
+        return {"name": tool.name, "description": tool.description, "parameters": tool.params_json_schema}
+    return {"name": getattr(tool, "name", type(tool).__name__)}
+
+
+class CachingModel(Model):
+    """Model wrapper that records and replays responses from a disk cache."""
+
+    def __init__(self, model: Model, mode: str = MODEL_CACHE_MODE, store: DiskLRUStore | None = None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Expected one of: {', '.join(CACHE_MODES)}")
+        self.model = model
+        self.mode = mode
+        self.deployment = getattr(model, "model", None)
+        self.store = store or DiskLRUStore(MODEL_CACHE_DIR, MODEL_CACHE_MAX_ENTRIES)
+        self.hits = 0
+        self.misses = 0
+
+    def cache_key(self, system_instructions, input, model_settings, tools, output_schema, handoffs) -> str:
+        """Return the canonical hash identifying a model request."""
+        payload = {
+            "deployment": self.deployment,
+            "instructions": system_instructions,
+            "input": input,
+            "tools": [_describe_tool(tool) for tool in tools],
+            "handoffs": [handoff.tool_name for handoff in handoffs],
+            "output_schema": (
+                output_schema.json_schema()
+                if output_schema is not None and not output_schema.is_plain_text()
+                else None
+            ),
+            "settings": model_settings.to_json_dict(),
+        }
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=_json_default)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> list | None:
+        """Return the recorded output items for a key, honouring the cache mode."""
+        if self.mode in ("read_through", "replay"):
+            cached = self.store.get(key)
+            if cached is not None:
+                self.hits += 1
+                return [_output_item_adapter.validate_python(item) for item in json.loads(cached)["output"]]
+        self.misses += 1
+        if self.mode == "replay":
+            raise CacheMissError(f"No recorded model response for request {key} (deployment {self.deployment})")
+        return None
+
+    def _record(self, key: str, output: list, usage: dict):
+        self.store.put(key, json.dumps({
+            "deployment": self.deployment,
+            "recorded_at": time.time(),
+            "output": [item.model_dump(mode="json", exclude_none=True) for item in output],
+            "usage": usage,
+        }))
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, *args, **kwargs) -> ModelResponse:
+        if self.mode == "off":
+            return await self.model.get_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, *args, **kwargs
+            )
+
+        key = self.cache_key(system_instructions, input, model_settings, tools, output_schema, handoffs)
+        output = self._lookup(key)
+        if output is not None:
+            # Replayed responses consumed no tokens
+            return ModelResponse(output=output, usage=Usage(), response_id=None)
+
+        response = await self.model.get_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, *args, **kwargs
+        )
+        self._record(key, response.output, {
+            "input_tokens": response.usage.input_tokens,
+            "output_tokens": response.usage.output_tokens,
+            "total_tokens": response.usage.total_tokens,
+        })
+        return response
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, *args, **kwargs):
+        if self.mode == "off":
+            async for event in self.model.stream_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, *args, **kwargs
+            ):
+                yield event
+            return
+
+        key = self.cache_key(system_instructions, input, model_settings, tools, output_schema, handoffs)
+        output = self._lookup(key)
+        if output is not None:
+            # The runner only needs the completed event to build the turn's result
+            response = Response.model_construct(
+                id=f"cached-{key[:16]}",
+                created_at=time.time(),
+                model=self.deployment,
+                object="response",
+                output=output,
+                tool_choice="auto",
+                tools=[],
+                parallel_tool_calls=False,
+                usage=None,
+            )
+            yield ResponseCompletedEvent(response=response, type="response.completed", sequence_number=0)
+            return
+
+        async for event in self.model.stream_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, *args, **kwargs
+        ):
+            if isinstance(event, ResponseCompletedEvent):
+                usage = event.response.usage
+                self._record(key, event.response.output, {
+                    "input_tokens": usage.input_tokens if usage else 0,
+                    "output_tokens": usage.output_tokens if usage else 0,
+                    "total_tokens": usage.total_tokens if usage else 0,
+                })
+            yield event
+
+
+# ============================================================================
+# DOCUMENT EXTRACTION CACHE
+# ============================================================================
+
+
+class DocumentExtractionCache:
+    """Caches Document Intelligence markdown keyed by a hash of the document bytes."""
+
+    def __init__(self, mode: str = EXTRACTION_CACHE_MODE, store: DiskLRUStore | None = None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Expected one of: {', '.join(CACHE_MODES)}")
+        self.mode = mode
+        self.store = store or DiskLRUStore(EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_ENTRIES, suffix=".md")
+
+    @staticmethod
+    def cache_key(data: bytes, model_id: str) -> str:
+        return hashlib.sha256(model_id.encode("utf-8") + b"\0" + data).hexdigest()
+
+    def lookup(self, data: bytes, model_id: str) -> str | None:
+        """Return the cached markdown for a document, or None if it must be extracted."""
+        if self.mode == "off":
+            return None
+        key = self.cache_key(data, model_id)
+        if self.mode in ("read_through", "replay"):
+            markdown = self.store.get(key)
+            if markdown is not None:
+                return markdown
+        if self.mode == "replay":
+            raise CacheMissError(f"No recorded extraction for document {key}")
+        return None
+
+    def record(self, data: bytes, model_id: str, markdown: str):
+        """Store the extracted markdown for a document."""
+        if self.mode in ("read_through", "record"):
+            self.store.put(self.cache_key(data, model_id), markdown)
@@ -0,0 +1,328 @@
+"""
+Live monitoring of concurrent claim runs.
+
+`RunMonitor` aggregates the events of all active and recent runs into summary
+snapshots: throughput, per-stage / per-tool / model latency percentiles, error
+rates, in-flight calls (e.g. Document Intelligence saturation shows up as many
+extract_document calls in flight with a rising p95) and tool retries.
+
+Events are the tracer events emitted by insurance_claims_processing
+(internal_tool_call, internal_tool_result, stage_started, stage_finished,
+model_call) plus run_started / run_finished, each tagged with a run_id and time.
+
+Web runs record into the monitor directly. The batch coordinator appends the
+events of its worker processes to RUN_EVENTS_LOG (JSON lines), which the monitor
+tails, so batch runs show up on the dashboard of a running web app. The log is
+rotated once it reaches RUN_EVENTS_LOG_MAX_BYTES, keeping one previous file, so
+it stays bounded at about twice that size.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+RUN_EVENTS_LOG = os.getenv("RUN_EVENTS_LOG", os.path.join("outputs", "run_events.jsonl"))
+# The event log is rotated to RUN_EVENTS_LOG + ".1" once it reaches this size
+RUN_EVENTS_LOG_MAX_BYTES = int(os.getenv("RUN_EVENTS_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+RUN_MONITOR_WINDOW_SECONDS = float(os.getenv("RUN_MONITOR_WINDOW_SECONDS", "300"))
+RUN_MONITOR_RECENT_RUNS = int(os.getenv("RUN_MONITOR_RECENT_RUNS", "200"))
+RUN_MONITOR_SNAPSHOT_SECONDS = float(os.getenv("RUN_MONITOR_SNAPSHOT_SECONDS", "2"))
+
+# When attaching to an existing event log, only its tail is replayed
+RUN_MONITOR_LOG_BACKLOG_BYTES = 1024 * 1024
+
+# Upper bound on latency samples kept for the rolling window
+MAX_SAMPLES = 100_000
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+@dataclass
+class RunState:
+    """Live state of one run."""
+
+    run_id: str
+    policy_number: str
+    source: str
+    started_at: float
+    status: str = "running"
+    finished_at: float | None = None
+    error: str | None = None
+    stages: dict[str, float] = field(default_factory=dict)  # stages in flight -> start time
+    tools: dict = field(default_factory=dict)  # call_id -> (tool_name, start time)
+    failed_tools: set = field(default_factory=set)
+    tool_calls: int = 0
+    tool_errors: int = 0
+    retries: int = 0
+    model_calls: int = 0
+
+    def summary(self, now: float) -> dict:
+        return {
+            "run_id": self.run_id,
+            "policy_number": self.policy_number,
+            "source": self.source,
+            "status": self.status,
+            "stages": sorted(self.stages),
+            "started_at": self.started_at,
+            "elapsed_seconds": round((self.finished_at or now) - self.started_at, 1),
+            "tool_calls": self.tool_calls,
+            "tool_errors": self.tool_errors,
+            "retries": self.retries,
+            "model_calls": self.model_calls,
+            "error": self.error,
+        }
+
+
+def _percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _latency_stats(samples: list[tuple[str, float]], window: float) -> dict:
+    """Summarise (status, duration_ms) samples of one stage, tool or the model."""
+    durations = [duration for _, duration in samples]
+    errors = sum(1 for status, _ in samples if status == "error")
+    return {
+        "count": len(samples),
+        "per_minute": round(len(samples) / window * 60, 2),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 3) if samples else 0.0,
+        "p50_ms": _percentile(durations, 0.5),
+        "p95_ms": _percentile(durations, 0.95),
+        "max_ms": max(durations) if durations else None,
+    }
+
+
+class RunMonitor:
+    """Thread-safe aggregator of run events."""
+
+    def __init__(self, window: float = RUN_MONITOR_WINDOW_SECONDS, recent_runs: int = RUN_MONITOR_RECENT_RUNS):
+        self.window = window
+        self.active: dict[str, RunState] = {}
+        self.recent: deque[RunState] = deque(maxlen=recent_runs)
+        self.samples: deque[tuple] = deque(maxlen=MAX_SAMPLES)  # (time, kind, name, status, duration_ms)
+        self.lock = threading.Lock()
+        self.log_path = None
+        self.log_inode = None
+        self.log_offset = 0
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(self, event: dict):
+        """Apply one run event."""
+        with self.lock:
+            self._apply(event)
+
+    def _apply(self, event: dict):
+        kind = event["type"]
+        now = event.get("time") or time.time()
+        run_id = event["run_id"]
+
+        if kind == "run_started":
+            self.active[run_id] = RunState(run_id, event.get("policy_number"), event.get("source", "unknown"), now)
+            return
+
+        run = self.active.get(run_id)
+        if run is None:
+            return  # The run started before the monitor was attached
+
+        if kind == "run_finished":
+            run.status = event.get("status", "completed")
+            run.error = event.get("error")
+            run.finished_at = now
+            run.stages.clear()
+            run.tools.clear()
+            self.samples.append((now, "run", run.source, run.status, (now - run.started_at) * 1000))
+            self.recent.append(self.active.pop(run_id))
+        elif kind == "stage_started":
+            run.stages[event["stage"]] = now
+        elif kind == "stage_finished":
+            run.stages.pop(event["stage"], None)
+            self.samples.append((now, "stage", event["stage"], event["status"], event["duration_ms"]))
+        elif kind == "internal_tool_call":
+            run.tool_calls += 1
+            if event["tool_name"] in run.failed_tools:
+                run.retries += 1
+            run.tools[event["call_id"]] = (event["tool_name"], now)
+        elif kind == "internal_tool_result":
+            run.tools.pop(event["call_id"], None)
+            if event["status"] == "error":
+                run.tool_errors += 1
+                run.failed_tools.add(event["tool_name"])
+            self.samples.append((now, "tool", event["tool_name"], event["status"], event["duration_ms"]))
+        elif kind == "model_call":
+            run.model_calls += 1
+            self.samples.append((now, "model", "model", event["status"], event["duration_ms"]))
+
+    def tracer(self, run_id: str, forward=None):
+        """Return a tool tracer that records a run's events (and passes them on to `forward`)."""
+        def trace(event: dict):
+            self.record({**event, "run_id": run_id, "time": time.time()})
+            if forward is not None:
+                forward(event)
+        return trace
+
+    # ------------------------------------------------------------------
+    # Batch runs (event log written by the batch coordinator)
+    # ------------------------------------------------------------------
+
+    def attach_log(self, path: str = RUN_EVENTS_LOG):
+        """Follow a JSON-lines event log, starting from its recent tail."""
+        with self.lock:
+            self.log_path = path
+            self.log_inode = None
+            self.log_offset = 0
+            if os.path.exists(path):
+                stat = os.stat(path)
+                self.log_inode = stat.st_ino
+                self.log_offset = max(0, stat.st_size - RUN_MONITOR_LOG_BACKLOG_BYTES)
+
+    def _read_log(self):
+        if self.log_path is None or not os.path.exists(self.log_path):
+            return
+        stat = os.stat(self.log_path)
+        if stat.st_ino != self.log_inode:
+            # The log was rotated: finish the previous file, then start on the new one
+            rotated = self.log_path + ".1"
+            if self.log_inode is not None and os.path.exists(rotated) and os.stat(rotated).st_ino == self.log_inode:
+                self._read_events(rotated)
+            self.log_inode = stat.st_ino
+            self.log_offset = 0
+        elif stat.st_size < self.log_offset:
+            self.log_offset = 0  # The log was truncated
+        if stat.st_size > self.log_offset:
+            self._read_events(self.log_path)
+
+    def _read_events(self, path: str):
+        """Apply the complete lines of a log file from the current offset."""
+        with open(path, "rb") as f:
+            f.seek(self.log_offset)
+            if self.log_offset:
+                # Skip to the start of a line when starting mid-file
+                f.seek(self.log_offset - 1)
+                if f.read(1) != b"\n":
+                    f.readline()
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partially written; read it next time
+                self.log_offset = f.tell()
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    continue
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        """Return a summary of active runs, recent runs and latencies over the rolling window."""
+        with self.lock:
+            self._read_log()
+            now = time.time()
+            cutoff = now - self.window
+            while self.samples and self.samples[0][0] < cutoff:
+                self.samples.popleft()
+
+            grouped: dict[str, dict[str, list]] = {"run": {}, "stage": {}, "tool": {}, "model": {}}
+            for _, kind, name, status, duration in self.samples:
+                grouped[kind].setdefault(name, []).append((status, duration))
+
+            in_flight_runs: dict[str, int] = {}
+            in_flight_stages: dict[str, int] = {}
+            in_flight_tools: dict[str, int] = {}
+            for run in self.active.values():
+                in_flight_runs[run.source] = in_flight_runs.get(run.source, 0) + 1
+                for stage in run.stages:
+                    in_flight_stages[stage] = in_flight_stages.get(stage, 0) + 1
+                for tool_name, _ in run.tools.values():
+                    in_flight_tools[tool_name] = in_flight_tools.get(tool_name, 0) + 1
+
+            def breakdown(kind: str, in_flight: dict[str, int]) -> list[dict]:
+                names = sorted(set(grouped[kind]) | set(in_flight))
+                return [
+                    {"name": name, "in_flight": in_flight.get(name, 0), **_latency_stats(grouped[kind].get(name, []), self.window)}
+                    for name in names
+                ]
+
+            finished = [status for samples in grouped["run"].values() for status, _ in samples]
+            return {
+                "time": now,
+                "window_seconds": self.window,
+                "runs": {
+                    "active": len(self.active),
+                    "finished": len(finished),
+                    "completed": finished.count("completed"),
+                    "failed": finished.count("failed"),
+                    "cancelled": finished.count("cancelled"),
+                    "per_minute": round(len(finished) / self.window * 60, 2),
+                    "by_source": breakdown("run", in_flight_runs),
+                },
+                "stages": breakdown("stage", in_flight_stages),
+                "tools": breakdown("tool", in_flight_tools),
+                "model": _latency_stats([s for samples in grouped["model"].values() for s in samples], self.window),
+                "active_runs": [run.summary(now) for run in sorted(self.active.values(), key=lambda r: r.started_at)],
+                "recent_runs": [run.summary(now) for run in reversed(self.recent)][:50],
+            }
+
+
+class RunEventLog:
+    """
+    Appends run events to the JSON-lines log followed by RunMonitor.attach_log.
+
+    Once the log reaches `max_bytes` it is renamed to `path + ".1"` (replacing
+    the previous one) and a new log is started. Several processes may append to
+    the same log; a writer that finds the log already rotated by another one
+    reopens it instead of rotating again.
+    """
+
+    def __init__(self, path: str = RUN_EVENTS_LOG, max_bytes: int = RUN_EVENTS_LOG_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def append(self, event: dict):
+        self.file.write(json.dumps(event) + "\n")
+        self.file.flush()
+        if self.file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current == os.fstat(self.file.fileno()).st_ino:
+            os.replace(self.path, self.path + ".1")
+        self.file.close()
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self.file.close()
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_run_monitor() -> RunMonitor:
+    """Return the shared monitor, following the batch event log."""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = RunMonitor()
+            _monitor.attach_log()
+        return _monitor
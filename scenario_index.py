@@ -0,0 +1,260 @@
+"""
+Scenario manifest index.
+
+Keeps an SQLite index of the scenario folders (one per policy number) and their
+documents, with sizes, mtimes and SHA-256 hashes, so scenario listing and file
+discovery are served from the index instead of walking the file system.
+
+The index is updated incrementally. A refresh only rescans scenario folders
+whose directory mtime changed (a file was added, removed or renamed), and a
+rescan only re-hashes documents whose size or mtime changed. Files edited in
+place and changes inside subfolders do not touch the folder's mtime; they are
+picked up by a deep refresh, which rescans every folder, at most every
+SCENARIO_INDEX_DEEP_REFRESH_SECONDS (or on demand with refresh(deep=True)).
+
+Listing never waits for documents to be hashed: the first listing only registers
+the folder names, and refreshes run in the background at most every
+SCENARIO_INDEX_REFRESH_SECONDS, so listing latency does not depend on how many
+claims sit on disk. get_files costs one stat and one query unless the folder changed.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+SCENARIO_INDEX_PATH = os.getenv("SCENARIO_INDEX_PATH", os.path.join("cache", "scenario_index.sqlite"))
+SCENARIO_INDEX_REFRESH_SECONDS = float(os.getenv("SCENARIO_INDEX_REFRESH_SECONDS", "30"))
+SCENARIO_INDEX_DEEP_REFRESH_SECONDS = float(os.getenv("SCENARIO_INDEX_DEEP_REFRESH_SECONDS", "3600"))
+
+# Only PDF and image files are claim documents
+DOCUMENT_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.bmp')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    policy_number TEXT PRIMARY KEY,
+    dir_mtime REAL NOT NULL,
+    file_count INTEGER NOT NULL,
+    total_size INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    policy_number TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (policy_number, path)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def hash_file(path: str) -> str:
+    """Return the SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ScenarioIndex:
+    """SQLite-backed index of the scenarios folder."""
+
+    def __init__(self, root: str, db_path: str = SCENARIO_INDEX_PATH):
+        self.root = root
+        self.db_path = db_path
+        self._refresh_lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection for one transaction (committed on success) and close it afterwards."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def refresh_scenario(self, policy_number: str, conn: sqlite3.Connection | None = None):
+        """Rescan one scenario folder, re-hashing only documents whose size or mtime changed."""
+        if conn is None:
+            with self._connect() as conn:
+                return self.refresh_scenario(policy_number, conn)
+
+        policy_path = os.path.join(self.root, policy_number)
+        if not os.path.isdir(policy_path):
+            conn.execute("DELETE FROM files WHERE policy_number = ?", (policy_number,))
+            conn.execute("DELETE FROM scenarios WHERE policy_number = ?", (policy_number,))
+            return
+
+        dir_mtime = os.stat(policy_path).st_mtime
+        indexed = conn.execute(
+            "SELECT dir_mtime, file_count, total_size FROM scenarios WHERE policy_number = ?", (policy_number,)
+        ).fetchone()
+        known = {
+            path: (size, mtime, sha256)
+            for path, size, mtime, sha256 in conn.execute(
+                "SELECT path, size, mtime, sha256 FROM files WHERE policy_number = ?", (policy_number,)
+            )
+        }
+
+        seen = set()
+        total_size = 0
+        changed = False
+        for root, _, files in os.walk(policy_path):
+            for file in files:
+                if not file.lower().endswith(DOCUMENT_EXTENSIONS):
+                    continue
+                path = os.path.join(root, file)
+                stat = os.stat(path)
+                seen.add(path)
+                total_size += stat.st_size
+                previous = known.get(path)
+                if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime:
+                    continue
+                changed = True
+                conn.execute(
+                    "INSERT OR REPLACE INTO files (policy_number, path, size, mtime, sha256) VALUES (?, ?, ?, ?, ?)",
+                    (policy_number, path, stat.st_size, stat.st_mtime, hash_file(path)),
+                )
+
+        removed = [(policy_number, path) for path in known if path not in seen]
+        if not changed and not removed and indexed == (dir_mtime, len(seen), total_size):
+            return
+        conn.executemany("DELETE FROM files WHERE policy_number = ? AND path = ?", removed)
+        conn.execute(
+            "INSERT OR REPLACE INTO scenarios (policy_number, dir_mtime, file_count, total_size, indexed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (policy_number, dir_mtime, len(seen), total_size, time.time()),
+        )
+
+    def refresh(self, deep: bool = False):
+        """
+        Bring the index up to date, rescanning the scenario folders whose mtime changed,
+        or every folder when `deep` (to pick up in-place edits and subfolder changes).
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # Another thread is already refreshing
+        try:
+            with self._connect() as conn:
+                indexed = dict(conn.execute("SELECT policy_number, dir_mtime FROM scenarios"))
+            present = self._scan_root()
+            # One transaction per folder, so lookups are not blocked for the whole refresh
+            for policy_number, dir_mtime in present.items():
+                if deep or indexed.get(policy_number) != dir_mtime:
+                    self.refresh_scenario(policy_number)
+            for policy_number in set(indexed) - set(present):
+                self.refresh_scenario(policy_number)
+            with self._connect() as conn:
+                now = str(time.time())
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('refreshed_at', ?)", (now,))
+                if deep:
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('deep_refreshed_at', ?)", (now,))
+        finally:
+            self._refresh_lock.release()
+
+    def _scan_root(self) -> dict[str, float]:
+        """Return the scenario folder names and their mtimes."""
+        present = {}
+        if os.path.isdir(self.root):
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        present[entry.name] = entry.stat().st_mtime
+        return present
+
+    def _register_scenarios(self):
+        """
+        Add folders that are not indexed yet without scanning them, so they can be listed
+        right away; they are marked stale (dir_mtime -1) and indexed by the next refresh.
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO scenarios (policy_number, dir_mtime, file_count, total_size, indexed_at) "
+                "VALUES (?, -1, 0, 0, ?)",
+                [(policy_number, time.time()) for policy_number in self._scan_root()],
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('refreshed_at', '0')")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('deep_refreshed_at', ?)", (str(time.time()),))
+
+    def ensure_fresh(self, max_age: float = SCENARIO_INDEX_REFRESH_SECONDS,
+                     deep_max_age: float = SCENARIO_INDEX_DEEP_REFRESH_SECONDS):
+        """
+        Start a background refresh if the index is older than `max_age` seconds (a deep one
+        if the last deep refresh is older than `deep_max_age`). The current index is served
+        meanwhile; on first use the folders are registered by name so they can be listed at once.
+        """
+        with self._connect() as conn:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+        if "refreshed_at" not in meta:
+            self._register_scenarios()
+            meta = {"refreshed_at": "0", "deep_refreshed_at": str(time.time())}
+        now = time.time()
+        if now - float(meta["refreshed_at"]) > max_age and not self._refresh_lock.locked():
+            deep = now - float(meta.get("deep_refreshed_at", 0)) > deep_max_age
+            threading.Thread(target=self.refresh, args=(deep,), daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def list_scenarios(self, offset: int = 0, limit: int | None = None, query: str | None = None) -> tuple[list[str], int]:
+        """Return one page of policy numbers (optionally filtered by substring) and the total match count."""
+        self.ensure_fresh()
+        where, params = "", []
+        if query:
+            # The query is a literal substring: % and _ must not act as wildcards
+            escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where, params = "WHERE policy_number LIKE ? ESCAPE '\\'", [f"%{escaped}%"]
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM scenarios {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT policy_number FROM scenarios {where} ORDER BY policy_number LIMIT ? OFFSET ?",
+                params + [limit if limit is not None else -1, offset],
+            ).fetchall()
+        return [row[0] for row in rows], total
+
+    def get_files(self, policy_number: str) -> list[dict]:
+        """
+        Return the indexed documents of one scenario (path, size, mtime, sha256),
+        rescanning the folder first if its mtime changed since it was indexed.
+        """
+        policy_path = os.path.join(self.root, policy_number)
+        with self._connect() as conn:
+            row = conn.execute("SELECT dir_mtime FROM scenarios WHERE policy_number = ?", (policy_number,)).fetchone()
+            current_mtime = os.stat(policy_path).st_mtime if os.path.isdir(policy_path) else None
+            if row is None or current_mtime is None or row[0] != current_mtime:
+                self.refresh_scenario(policy_number, conn)
+            rows = conn.execute(
+                "SELECT path, size, mtime, sha256 FROM files WHERE policy_number = ? ORDER BY path", (policy_number,)
+            ).fetchall()
+        return [{"path": path, "size": size, "mtime": mtime, "sha256": sha256} for path, size, mtime, sha256 in rows]
+
+
+_indexes: dict[str, ScenarioIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_scenario_index(root: str) -> ScenarioIndex:
+    """Return the shared index for a scenarios folder."""
+    with _indexes_lock:
+        if root not in _indexes:
+            _indexes[root] = ScenarioIndex(root)
+        return _indexes[root]
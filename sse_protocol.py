@@ -0,0 +1,216 @@
+"""
+Server-Sent Events wire formats for agent run streams.
+
+- legacy (default): one `data: {json}` frame per event.
+- compact (`?protocol=compact`):
+    - events arriving within SSE_COALESCE_SECONDS of each other are sent together
+      as one `data: [{...}, {...}]` frame;
+    - string values longer than SSE_PAYLOAD_INLINE_MAX_CHARS are stored once in a
+      content-addressed payload store and sent as `{"$ref": sha256, "size": n}`.
+      Clients fetch them from /api/payload/<sha256>, which is cached as immutable,
+      so text repeated across events (tool arguments, sub-agent messages and their
+      final output) is transferred only once;
+    - internal tool calls carry only `args_dict` (the redundant `args` string is dropped);
+    - the stream is gzip-compressed when the client accepts it.
+
+In the compact format, large texts (tool outputs, agent messages) are spooled to
+the payload store as soon as they are produced (`encoder.spool`) and carried
+through the stream as a `PayloadHandle` with a short preview, so an event never
+holds another copy of them. The legacy format sends every text inline, so it
+leaves them in memory instead of writing them to disk and reading them back:
+its peak memory still grows with the largest output of a run (the whole text
+and its JSON frame are held at once). Clients that stream runs over large
+documents should use the compact format.
+"""
+
+import os
+import json
+import time
+import zlib
+import hashlib
+import threading
+from dataclasses import dataclass
+
+from response_cache import DiskLRUStore
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SSE_PROTOCOLS = ("legacy", "compact")
+
+SSE_COALESCE_SECONDS = float(os.getenv("SSE_COALESCE_SECONDS", "0.05"))
+SSE_COALESCE_MAX_EVENTS = int(os.getenv("SSE_COALESCE_MAX_EVENTS", "50"))
+SSE_PAYLOAD_INLINE_MAX_CHARS = int(os.getenv("SSE_PAYLOAD_INLINE_MAX_CHARS", "1024"))
+
+SSE_PAYLOAD_DIR = os.getenv("SSE_PAYLOAD_DIR", os.path.join("cache", "payloads"))
+SSE_PAYLOAD_MAX_ENTRIES = int(os.getenv("SSE_PAYLOAD_MAX_ENTRIES", "10000"))
+
+# Texts at least this long are spooled to the payload store when an event is created
+SSE_SPOOL_MIN_CHARS = int(os.getenv("SSE_SPOOL_MIN_CHARS", "16384"))
+SSE_SPOOL_PREVIEW_CHARS = 500
+
+# Events that end a run are sent without waiting for the coalescing window
+FLUSH_EVENT_TYPES = ("final", "error")
+
+
+# ============================================================================
+# PAYLOAD STORE
+# ============================================================================
+
+
+class PayloadStore:
+    """Content-addressed store for large event payloads, keyed by the SHA-256 of the text."""
+
+    def __init__(self, store: DiskLRUStore | None = None):
+        self.store = store or DiskLRUStore(SSE_PAYLOAD_DIR, SSE_PAYLOAD_MAX_ENTRIES, suffix=".txt")
+
+    @staticmethod
+    def payload_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def put(self, text: str) -> str:
+        """Store a payload (once) and return its key."""
+        key = self.payload_key(text)
+        if key not in self.store:
+            self.store.put(key, text)
+        return key
+
+    def get(self, key: str) -> str | None:
+        return self.store.get(key)
+
+
+@dataclass(frozen=True)
+class PayloadHandle:
+    """Reference to a text held in the payload store, with its size and first characters."""
+
+    key: str
+    size: int
+    preview: str
+
+    def to_ref(self) -> dict:
+        return {"$ref": self.key, "size": self.size}
+
+
+def spool(text: str, store: PayloadStore | None = None) -> str | PayloadHandle:
+    """Return short texts unchanged and move long ones to the payload store, returning a handle."""
+    if len(text) < SSE_SPOOL_MIN_CHARS:
+        return text
+    store = store or get_payload_store()
+    return PayloadHandle(store.put(text), len(text), text[:SSE_SPOOL_PREVIEW_CHARS])
+
+
+_payload_store = None
+_payload_store_lock = threading.Lock()
+
+
+def get_payload_store() -> PayloadStore:
+    """Return the shared payload store."""
+    global _payload_store
+    with _payload_store_lock:
+        if _payload_store is None:
+            _payload_store = PayloadStore()
+        return _payload_store
+
+
+# ============================================================================
+# ENCODERS
+# ============================================================================
+
+
+class LegacyEncoder:
+    """One SSE frame per event."""
+
+    pending = ()
+
+    def spool(self, text: str) -> str:
+        """Texts are sent inline, so there is nothing to spool."""
+        return text
+
+    def add(self, event: dict) -> str:
+        return f"data: {json.dumps(event)}\n\n"
+
+    def timeout(self) -> float | None:
+        return None
+
+    def flush(self) -> str:
+        return ""
+
+
+class CompactEncoder:
+    """Coalesces events into array frames and replaces large strings with payload references."""
+
+    def __init__(self, store: PayloadStore | None = None, window: float = SSE_COALESCE_SECONDS,
+                 max_events: int = SSE_COALESCE_MAX_EVENTS, inline_max_chars: int = SSE_PAYLOAD_INLINE_MAX_CHARS):
+        self.store = store or get_payload_store()
+        self.window = window
+        self.max_events = max_events
+        self.inline_max_chars = inline_max_chars
+        self.pending = []
+        self.deadline = None
+
+    def spool(self, text: str) -> str | PayloadHandle:
+        """Move a long text to the payload store now; it is sent as a reference."""
+        return spool(text, self.store)
+
+    def externalize(self, value):
+        """Replace long strings (at any depth) with references into the payload store."""
+        if isinstance(value, PayloadHandle):
+            return value.to_ref()
+        if isinstance(value, str):
+            if len(value) > self.inline_max_chars:
+                return {"$ref": self.store.put(value), "size": len(value)}
+            return value
+        if isinstance(value, dict):
+            return {key: self.externalize(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.externalize(item) for item in value]
+        return value
+
+    def compact_event(self, event: dict) -> dict:
+        if event.get("type") == "internal_tool_call" and "args_dict" in event:
+            # `args` is a stringified copy of args_dict; the client rebuilds it
+            event = {key: value for key, value in event.items() if key != "args"}
+        return self.externalize(event)
+
+    def add(self, event: dict) -> str:
+        """Queue an event; return a frame if the batch must be sent now, otherwise ""."""
+        self.pending.append(self.compact_event(event))
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.window
+        if len(self.pending) >= self.max_events or event.get("type") in FLUSH_EVENT_TYPES:
+            return self.flush()
+        return ""
+
+    def timeout(self) -> float | None:
+        """Seconds until the pending batch is due, or None if nothing is pending."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def flush(self) -> str:
+        """Return the pending events as one frame ("" if there are none)."""
+        if not self.pending:
+            return ""
+        frame = f"data: {json.dumps(self.pending, separators=(',', ':'))}\n\n"
+        self.pending = []
+        self.deadline = None
+        return frame
+
+
+def create_encoder(protocol: str):
+    if protocol not in SSE_PROTOCOLS:
+        raise ValueError(f"Unknown SSE protocol '{protocol}'. Expected one of: {', '.join(SSE_PROTOCOLS)}")
+    return CompactEncoder() if protocol == "compact" else LegacyEncoder()
+
+
+def gzip_stream(chunks):
+    """gzip-compress a stream of text chunks, flushing after each so events are not held back."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    try:
+        for chunk in chunks:
+            yield compressor.compress(chunk.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    finally:
+        # Propagate a client disconnect to the wrapped stream so it can cancel the run
+        chunks.close()
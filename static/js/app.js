@@ -31,6 +31,13 @@ const agentInfo = {
     }
 };
 
+// Resized WebP avatar (built by asset_pipeline.py), falling back to the original PNG
+function avatarImg(avatar, attrs = '') {
+    const thumb = `/static/avatars/thumbs/${avatar.replace(/\.png$/, '.webp')}?v=${window.ASSET_VERSION || ''}`;
+    const fallback = `/static/avatars/${avatar}?v=${window.ASSET_VERSION || ''}`;
+    return `<img src="${thumb}" onerror="this.onerror=null; this.src='${fallback}';" ${attrs}>`;
+}
+
 const toolToAgentMap = {
     "extract_documents": "DocumentExtractor",
     "verify_identity": "IDVerification",
@@ -44,9 +51,13 @@ let currentEventSource = null;
 let currentAgentName = "ClaimsManager";
 let currentAgentCardId = null;
 let toolCallMap = {}; // Map tool call ID to data
+let internalToolRows = {}; // Map internal tool call_id to its timeline row id
 let agentOutputs = {}; // Map agent name to collected outputs
 let currentlyViewedAgent = null; // Track which agent is currently shown in details panel
 let activeSubAgent = null; // Track which sub-agent is currently executing
+let payloadCache = {}; // Map payload hash to a promise of its text (compact protocol)
+let runToken = 0; // Incremented per run so payloads loaded for a stopped run are not rendered
+let detailsToken = 0; // Incremented whenever the details panel changes, so late payloads do not overwrite it
 
 document.addEventListener('DOMContentLoaded', () => {
     loadScenarios();
@@ -119,7 +130,9 @@ function clearFeed() {
     document.getElementById('timeline-container').innerHTML = '<div class="timeline-line" id="timeline-line" style="display: none;"></div>';
     showEmptyDetails();
     toolCallMap = {};
+    internalToolRows = {};
     agentOutputs = {};
+    payloadCache = {};
     currentAgentName = "ClaimsManager";
     currentAgentCardId = null;
     currentlyViewedAgent = null;
@@ -149,6 +162,7 @@ function stopScenario() {
     if (currentEventSource) {
         currentEventSource.close();
     }
+    runToken++; // Drop payloads of the stopped run that are still loading
     
     const btn = document.getElementById('run-btn');
     
@@ -159,7 +173,7 @@ function stopScenario() {
     }
     
     btn.disabled = false;
-    btn.innerHTML = '<img src="/static/icons/play.png" alt="Play" style="width: 20px; height: 20px;">';
+    btn.innerHTML = `<img src="/static/icons/play.png?v=${window.ASSET_VERSION || ''}" alt="Play" style="width: 20px; height: 20px;">`;
     btn.className = 'btn';
     btn.style.backgroundColor = '#e5e7eb';
     btn.style.border = '1px solid #d1d5db';
@@ -178,7 +192,7 @@ function runScenario() {
     }
     
     btn.disabled = true;
-    btn.innerHTML = '<img src="/static/icons/close.png" alt="Stop" style="width: 20px; height: 20px;">';
+    btn.innerHTML = `<img src="/static/icons/close.png?v=${window.ASSET_VERSION || ''}" alt="Stop" style="width: 20px; height: 20px;">`;
     btn.className = 'btn';
     btn.style.backgroundColor = '#e5e7eb';
     btn.style.border = '1px solid #d1d5db';
@@ -207,15 +221,27 @@ function runScenario() {
     
     if (currentEventSource) currentEventSource.close();
     
-    currentEventSource = new EventSource(`/api/run/${selectedScenario}`);
+    currentEventSource = new EventSource(`/api/run/${selectedScenario}?protocol=compact`);
+    const token = ++runToken;
     
     currentEventSource.onmessage = function(event) {
-        console.log("Received event:", event.data);
+        let events;
         try {
-            const data = JSON.parse(event.data);
-            handleEvent(data);
+            // Compact frames carry an array of coalesced events
+            const parsed = JSON.parse(event.data);
+            events = Array.isArray(parsed) ? parsed : [parsed];
         } catch (e) {
             console.error("Error parsing event data:", e, event.data);
+            return;
+        }
+        // Events are handled as they arrive; texts sent by reference are fetched when they are shown
+        for (const data of events) {
+            if (token !== runToken) return;
+            try {
+                handleEvent(expandCompactEvent(data));
+            } catch (e) {
+                console.error("Error handling event:", e, data);
+            }
         }
     };
     
@@ -223,7 +249,7 @@ function runScenario() {
         console.error("EventSource failed:", err);
         currentEventSource.close();
         btn.disabled = false;
-        btn.innerHTML = '<img src="/static/icons/play.png" alt="Play" style="width: 20px; height: 20px;">';
+        btn.innerHTML = `<img src="/static/icons/play.png?v=${window.ASSET_VERSION || ''}" alt="Play" style="width: 20px; height: 20px;">`;
         btn.className = 'btn';
         btn.style.backgroundColor = '#e5e7eb';
         btn.style.border = '1px solid #d1d5db';
@@ -235,6 +261,63 @@ function runScenario() {
     };
 }
 
+// Whether a value is a payload sent by reference ({"$ref": sha256, "size": n})
+function isPayloadRef(value) {
+    return value !== null && typeof value === 'object' && typeof value.$ref === 'string';
+}
+
+// Whether a payload reference occurs anywhere in a value
+function hasPayloadRefs(value) {
+    if (isPayloadRef(value)) return true;
+    if (value && typeof value === 'object') return Object.values(value).some(hasPayloadRefs);
+    return false;
+}
+
+// Text to show for a value that may be a payload not loaded yet
+function payloadText(value) {
+    return isPayloadRef(value) ? `[${value.size.toLocaleString()} characters, loading...]` : value;
+}
+
+// Fetch a payload sent by reference ({"$ref": sha256}); each payload is fetched once
+function fetchPayload(hash) {
+    if (!payloadCache[hash]) {
+        payloadCache[hash] = fetch(`/api/payload/${hash}`).then(response => {
+            if (!response.ok) throw new Error(`Payload ${hash} not available (${response.status})`);
+            return response.text();
+        });
+    }
+    return payloadCache[hash];
+}
+
+// Replace payload references anywhere in an event with their text
+async function resolvePayloads(value) {
+    if (Array.isArray(value)) {
+        return Promise.all(value.map(resolvePayloads));
+    }
+    if (value && typeof value === 'object') {
+        if (typeof value.$ref === 'string') {
+            return fetchPayload(value.$ref);
+        }
+        const entries = await Promise.all(
+            Object.entries(value).map(async ([key, item]) => [key, await resolvePayloads(item)])
+        );
+        return Object.fromEntries(entries);
+    }
+    return value;
+}
+
+// Rebuild fields the compact protocol omits
+function expandCompactEvent(data) {
+    if (data.type === 'internal_tool_call' && data.args === undefined && data.args_dict) {
+        const values = Object.values(data.args_dict).map(v => {
+            v = payloadText(v);
+            return typeof v === 'string' ? `'${v}'` : JSON.stringify(v);
+        });
+        data.args = `(${values.join(', ')}${values.length === 1 ? ',' : ''})`;
+    }
+    return data;
+}
+
 function handleEvent(data) {
     console.log("Handling event:", data.type, data);
     
@@ -287,7 +370,7 @@ function handleEvent(data) {
     } else if (data.type === 'internal_tool_call') {
         // Internal tool call from sub-agent
         if (currentAgentCardId && activeSubAgent) {
-            const rowId = addToolRow(currentAgentCardId, data.tool_name, data.args, null, null);
+            const rowId = addToolRow(currentAgentCardId, data.tool_name, payloadText(data.args), null, null);
             const row = document.getElementById(rowId);
             if (row) {
                 // Store the full data including structured args
@@ -295,24 +378,38 @@ function handleEvent(data) {
                     tool_name: data.tool_name,
                     arguments: data.args,
                     args_dict: data.args_dict || null,
-                    output: 'Tool executed successfully'
+                    output: 'Running...'
                 });
-                
-                // Mark as completed immediately
-                setTimeout(() => {
-                    const icon = row.querySelector('.tool-status-icon');
-                    if (icon) {
-                        icon.className = 'bi bi-check-circle-fill text-success tool-status-icon';
-                    }
-                }, 100);
+                // Completion arrives as a separate internal_tool_result event
+                internalToolRows[data.call_id] = rowId;
+            }
+        }
+    } else if (data.type === 'internal_tool_result') {
+        // Internal tool call finished: update its status icon and recorded duration
+        const row = document.getElementById(internalToolRows[data.call_id]);
+        if (row) {
+            const toolData = JSON.parse(row.dataset.toolData);
+            toolData.output = data.status === 'ok'
+                ? `Tool executed successfully in ${data.duration_ms} ms`
+                : `Tool ${data.status} after ${data.duration_ms} ms${data.error ? ': ' + data.error : ''}`;
+            row.dataset.toolData = JSON.stringify(toolData);
+            
+            const icon = row.querySelector('.tool-status-icon');
+            if (icon) {
+                icon.className = data.status === 'ok'
+                    ? 'bi bi-check-circle-fill text-success tool-status-icon'
+                    : 'bi bi-x-circle-fill text-danger tool-status-icon';
+                icon.title = `${data.duration_ms} ms`;
             }
+            delete internalToolRows[data.call_id];
         }
     } else if (data.type === 'tool_output') {
         console.log('\n=== FRONTEND DEBUG TOOL OUTPUT ===');
         console.log('Tool ID:', data.tool_id);
         console.log('Tool Name:', data.tool_name);
-        console.log('Output length:', data.output?.length);
-        console.log('Output first 500 chars:', data.output?.substring(0, 500));
+        const outputText = payloadText(data.output);
+        console.log('Output length:', data.output?.size ?? outputText?.length);
+        console.log('Output first 500 chars:', outputText?.substring(0, 500));
         
         // Check if this was a handoff tool
         const toolInfo = toolCallMap[data.tool_id || data.tool_name];
@@ -327,8 +424,8 @@ function handleEvent(data) {
             
             // Store the agent's output (this is the final output from the sub-agent)
             console.log(`[DEBUG] Capturing tool_output for agent: ${agentName}`);
-            console.log(`[DEBUG] Output content length: ${data.output.length}`);
-            console.log(`[DEBUG] Output preview: ${data.output.substring(0, 100)}...`);
+            console.log(`[DEBUG] Output content length: ${data.output.size ?? data.output.length}`);
+            console.log(`[DEBUG] Output preview: ${outputText.substring(0, 100)}...`);
             
             // IMPORTANT: Clear any interim messages and only keep the final output
             // The tool_output contains the complete final result from the sub-agent,
@@ -355,7 +452,7 @@ function handleEvent(data) {
             const detailsPanel = document.getElementById('details-panel');
             const outputTab = document.getElementById('agent-output-tab');
             // Check if the details panel is showing this specific agent
-            const avatarInDetails = detailsPanel?.querySelector(`img[src*="${agentInfo[agentName]?.avatar}"]`);
+            const avatarInDetails = detailsPanel?.querySelector(`img[src*="${agentInfo[agentName]?.avatar.replace(/\.png$/, '')}"]`);
             if (avatarInDetails && outputTab && outputTab.classList.contains('active')) {
                 // Refresh just the Output tab content without changing focus
                 refreshAgentOutput(agentName);
@@ -380,8 +477,9 @@ function handleEvent(data) {
         const messageAgentName = data.agent_name || currentAgentName;
         if (messageAgentName && messageAgentName !== 'ClaimsManager') {
             console.log(`[DEBUG] Capturing interim message for agent: ${messageAgentName} (data.agent_name=${data.agent_name}, currentAgentName=${currentAgentName})`);
-            console.log(`[DEBUG] Message content length: ${(data.content || data.message || '').length}`);
-            console.log(`[DEBUG] Message preview: ${(data.content || data.message || '').substring(0, 100)}...`);
+            const messageText = payloadText(data.content || data.message || '');
+            console.log(`[DEBUG] Message content length: ${data.content?.size ?? messageText.length}`);
+            console.log(`[DEBUG] Message preview: ${messageText.substring(0, 100)}...`);
             if (!agentOutputs[messageAgentName]) {
                 agentOutputs[messageAgentName] = [];
             }
@@ -395,7 +493,7 @@ function handleEvent(data) {
     } else if (data.type === 'final') {
         const btn = document.getElementById('run-btn');
         btn.disabled = false;
-        btn.innerHTML = '<img src="/static/icons/play.png" alt="Play" style="width: 20px; height: 20px;">';
+        btn.innerHTML = `<img src="/static/icons/play.png?v=${window.ASSET_VERSION || ''}" alt="Play" style="width: 20px; height: 20px;">`;
         btn.className = 'btn';
         btn.style.backgroundColor = '#e5e7eb';
         btn.style.border = '1px solid #d1d5db';
@@ -484,7 +582,6 @@ function createAgentCard(agentName) {
     currentAgentCardId = cardId;
     
     const info = agentInfo[agentName] || { avatar: "default.png", title: agentName, description: "" };
-    const avatarUrl = `/static/avatars/${info.avatar}`;
     
     const container = document.getElementById('timeline-container');
     
@@ -494,7 +591,7 @@ function createAgentCard(agentName) {
     
     item.innerHTML = `
         <div class="agent-avatar-wrapper active" onclick="showAgentDetails('${agentName}')">
-            <img src="${avatarUrl}" alt="${agentName}">
+            ${avatarImg(info.avatar, `alt="${agentName}"`)}
         </div>
         <div class="agent-card">
             <div class="agent-header" onclick="showAgentDetails('${agentName}')">
@@ -590,41 +687,53 @@ function addToolRow(cardId, toolName, args, output, toolId) {
     return rowId;
 }
 
+function agentOutputHtml(agentName) {
+    // Build output HTML from stored outputs
+    const outputs = agentOutputs[agentName];
+    if (!outputs || outputs.length === 0) {
+        return '<p class="text-muted">No output captured yet. Agent has not completed execution.</p>';
+    }
+    return outputs.map(item => {
+        // Always try to render as markdown for better formatting
+        const content = marked.parse(payloadText(item.content));
+        if (item.type === 'message') {
+            return `
+                <div class="border-bottom pb-3 mb-3">
+                    <small class="text-muted d-block mb-2"><i class="bi bi-clock me-1"></i>${item.timestamp}</small>
+                    <div class="markdown-content">${content}</div>
+                </div>
+            `;
+        } else if (item.type === 'agent_output') {
+            // Render final output as formatted markdown
+            return `
+                <div class="pb-3 mb-3">
+                    <div class="markdown-content">${content}</div>
+                </div>
+            `;
+        }
+        return '';
+    }).join('');
+}
+
+// Fetch the outputs of an agent that were sent by reference, once its Output tab is shown
+function loadAgentOutputs(agentName) {
+    const pending = (agentOutputs[agentName] || []).filter(item => isPayloadRef(item.content));
+    if (pending.length === 0) return;
+    const token = runToken;
+    Promise.all(pending.map(item => fetchPayload(item.content.$ref).then(text => { item.content = text; })))
+        .then(() => {
+            if (token === runToken && currentlyViewedAgent === agentName) refreshAgentOutput(agentName);
+        })
+        .catch(err => console.error('Error loading agent output:', err));
+}
+
 function refreshAgentOutput(agentName) {
     // Only refresh the Output tab content, don't change the entire details panel
     const outputPane = document.getElementById('agent-output-pane');
     if (!outputPane) return;
     
-    // Build output HTML from stored outputs
-    let outputHtml = '';
-    const outputs = agentOutputs[agentName];
-    if (outputs && outputs.length > 0) {
-        outputHtml = outputs.map(item => {
-            if (item.type === 'message') {
-                // Always try to render as markdown for better formatting
-                const content = marked.parse(item.content);
-                return `
-                    <div class="border-bottom pb-3 mb-3">
-                        <small class="text-muted d-block mb-2"><i class="bi bi-clock me-1"></i>${item.timestamp}</small>
-                        <div class="markdown-content">${content}</div>
-                    </div>
-                `;
-            } else if (item.type === 'agent_output') {
-                // Render final output as formatted markdown
-                const content = marked.parse(item.content);
-                return `
-                    <div class="pb-3 mb-3">
-                        <div class="markdown-content">${content}</div>
-                    </div>
-                `;
-            }
-            return '';
-        }).join('');
-    } else {
-        outputHtml = '<p class="text-muted">No output captured yet. Agent has not completed execution.</p>';
-    }
-    
-    outputPane.innerHTML = outputHtml;
+    outputPane.innerHTML = agentOutputHtml(agentName);
+    loadAgentOutputs(agentName);
 }
 
 function showAgentDetails(agentName) {
@@ -645,11 +754,13 @@ function showAgentDetails(agentName) {
     
     // Update the currently viewed agent
     currentlyViewedAgent = agentName;
+    const token = ++detailsToken;
     
     // Get agent instructions and tools from the backend
     fetch(`/api/agent-info/${agentName}`)
         .then(res => res.json())
         .then(data => {
+            if (token !== detailsToken) return;
             const instructionsHtml = data.instructions ? marked.parse(data.instructions) : '<p class="text-muted">No instructions available.</p>';
             const toolsHtml = data.tools && data.tools.length > 0 ? 
                 data.tools.map(t => `
@@ -659,38 +770,11 @@ function showAgentDetails(agentName) {
                     </div>
                 `).join('') : '<p class="text-muted">No tools configured.</p>';
             
-            // Build output HTML from stored outputs
-            let outputHtml = '';
-            const outputs = agentOutputs[agentName];
-            if (outputs && outputs.length > 0) {
-                outputHtml = outputs.map(item => {
-                    if (item.type === 'message') {
-                        // Always try to render as markdown for better formatting
-                        const content = marked.parse(item.content);
-                        return `
-                            <div class="border-bottom pb-3 mb-3">
-                                <small class="text-muted d-block mb-2"><i class="bi bi-clock me-1"></i>${item.timestamp}</small>
-                                <div class="markdown-content">${content}</div>
-                            </div>
-                        `;
-                    } else if (item.type === 'agent_output') {
-                        // Render final output as formatted markdown
-                        const content = marked.parse(item.content);
-                        return `
-                            <div class="pb-3 mb-3">
-                                <div class="markdown-content">${content}</div>
-                            </div>
-                        `;
-                    }
-                    return '';
-                }).join('');
-            } else {
-                outputHtml = '<p class="text-muted">No output captured yet. Agent has not completed execution.</p>';
-            }
+            const outputHtml = agentOutputHtml(agentName);
             
             panel.innerHTML = `
                 <div class="p-4 pb-0 text-center">
-                    <img src="/static/avatars/${info.avatar}" class="rounded-circle mb-3" width="100" height="100" style="object-fit: cover; border: 4px solid #dee2e6;">
+                    ${avatarImg(info.avatar, 'class="rounded-circle mb-3" width="100" height="100" style="object-fit: cover; border: 4px solid #dee2e6;"')}
                     <h4>${info.title}</h4>
                     <p class="text-muted mb-0">${info.description}</p>
                 </div>
@@ -717,12 +801,19 @@ function showAgentDetails(agentName) {
                     </div>
                 </div>
             `;
+            
+            // Outputs sent by reference are only fetched when the Output tab is opened
+            if (activeTabId === 'agent-output-tab') {
+                loadAgentOutputs(agentName);
+            } else {
+                document.getElementById('agent-output-tab').addEventListener('shown.bs.tab', () => loadAgentOutputs(agentName));
+            }
         })
         .catch(err => {
             console.error('Error loading agent info:', err);
             panel.innerHTML = `
                 <div class="p-4 text-center border-bottom">
-                    <img src="/static/avatars/${info.avatar}" class="rounded-circle mb-3" width="100" height="100" style="object-fit: cover; border: 4px solid #dee2e6;">
+                    ${avatarImg(info.avatar, 'class="rounded-circle mb-3" width="100" height="100" style="object-fit: cover; border: 4px solid #dee2e6;"')}
                     <h4>${info.title}</h4>
                     <p class="text-muted">${info.description}</p>
                 </div>
@@ -733,13 +824,24 @@ function showAgentDetails(agentName) {
 
 function showToolDetails(data) {
     const panel = document.getElementById('details-panel');
+    const token = ++detailsToken;
+    
+    // Arguments sent by reference are fetched now that they are shown
+    if (hasPayloadRefs(data)) {
+        resolvePayloads(data)
+            .then(resolved => {
+                if (token === detailsToken) showToolDetails(resolved);
+            })
+            .catch(err => console.error('Error loading tool arguments:', err));
+    }
     
     // Format arguments nicely
     let argsHtml = '';
     if (data.args_dict && Object.keys(data.args_dict).length > 0) {
         // We have structured arguments with parameter names
         argsHtml = '<div class="table-responsive"><table class="table table-sm table-bordered"><thead><tr><th style="width: 30%;">Parameter</th><th>Value</th></tr></thead><tbody>';
-        for (const [param, value] of Object.entries(data.args_dict)) {
+        for (let [param, value] of Object.entries(data.args_dict)) {
+            value = payloadText(value);
             const displayValue = typeof value === 'string' && value.length > 100 
                 ? value.substring(0, 100) + '...' 
                 : (typeof value === 'object' ? JSON.stringify(value, null, 2) : escapeHtml(String(value)));
@@ -748,7 +850,7 @@ function showToolDetails(data) {
         argsHtml += '</tbody></table></div>';
     } else if (data.arguments) {
         // Fallback to original format
-        argsHtml = `<pre><code>${formatJSON(data.arguments)}</code></pre>`;
+        argsHtml = `<pre><code>${formatJSON(payloadText(data.arguments))}</code></pre>`;
     } else {
         argsHtml = '<p class="text-muted">No arguments</p>';
     }
@@ -928,7 +1030,7 @@ function updateTheme(theme) {
     if (theme.logo) {
         brandElement.innerHTML = `<img src="${theme.logo}" alt="Logo" style="height: 40px; margin-right: 10px;"><span style="color: ${navbarTextColor}">${theme.title}</span>`;
     } else {
-        brandElement.innerHTML = `<img src="/static/icons/agent.png" alt="Logo" style="height: 40px; margin-right: 10px;"><span style="color: ${navbarTextColor}">${theme.title}</span>`;
+        brandElement.innerHTML = `<img src="/static/icons/agent.png?v=${window.ASSET_VERSION || ''}" alt="Logo" style="height: 40px; margin-right: 10px;"><span style="color: ${navbarTextColor}">${theme.title}</span>`;
     }
     document.title = theme.title;
     
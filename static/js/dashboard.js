@@ -0,0 +1,150 @@
+// Live dashboard of all active and recent runs, fed by /api/dashboard/stream
+
+// Latencies above these thresholds are highlighted
+const SLOW_P95_MS = {
+    stage: 120000,
+    tool: 15000,
+    model: 20000
+};
+
+let dashboardSource = null;
+
+document.addEventListener('DOMContentLoaded', connectDashboard);
+
+function connectDashboard() {
+    if (dashboardSource) dashboardSource.close();
+    dashboardSource = new EventSource('/api/dashboard/stream');
+
+    dashboardSource.onopen = function() {
+        setConnection(true);
+    };
+
+    dashboardSource.onmessage = function(event) {
+        try {
+            renderSnapshot(JSON.parse(event.data));
+        } catch (e) {
+            console.error("Error rendering dashboard snapshot:", e, event.data);
+        }
+    };
+
+    dashboardSource.onerror = function() {
+        // EventSource reconnects by itself
+        setConnection(false);
+    };
+}
+
+function setConnection(online) {
+    const badge = document.getElementById('dashboard-connection');
+    badge.className = online ? 'badge bg-success' : 'badge bg-secondary';
+    badge.textContent = online ? 'live' : 'reconnecting';
+}
+
+function renderSnapshot(snapshot) {
+    const windowMinutes = Math.round(snapshot.window_seconds / 60);
+    document.getElementById('dashboard-updated').textContent =
+        `Updated ${new Date(snapshot.time * 1000).toLocaleTimeString()} · last ${windowMinutes} min`;
+
+    renderSummary(snapshot);
+    renderLatencyTable('stages-table', 'Stage', snapshot.stages, SLOW_P95_MS.stage);
+    renderLatencyTable('tools-table', 'Tool', snapshot.tools, SLOW_P95_MS.tool);
+    renderRunsTable('active-runs-table', snapshot.active_runs, 'No active runs');
+    renderRunsTable('recent-runs-table', snapshot.recent_runs, 'No finished runs yet');
+}
+
+function renderSummary(snapshot) {
+    const runs = snapshot.runs;
+    const model = snapshot.model;
+    const cards = [
+        {label: 'Active runs', value: runs.active, icon: 'bi-activity'},
+        {label: 'Runs / min', value: runs.per_minute, icon: 'bi-speedometer2'},
+        {label: 'Completed', value: runs.completed, icon: 'bi-check-circle', tone: 'success'},
+        {label: 'Failed', value: runs.failed, icon: 'bi-x-circle', tone: runs.failed ? 'danger' : null},
+        {label: 'Cancelled', value: runs.cancelled, icon: 'bi-slash-circle'},
+        {label: 'Model calls / min', value: model.per_minute, icon: 'bi-cpu'},
+        {label: 'Model p95', value: formatMs(model.p95_ms), icon: 'bi-stopwatch',
+         tone: model.p95_ms > SLOW_P95_MS.model ? 'warning' : null},
+        {label: 'Model errors', value: formatRate(model.error_rate), icon: 'bi-exclamation-triangle',
+         tone: model.errors ? 'danger' : null}
+    ];
+    document.getElementById('dashboard-summary').innerHTML = cards.map(card => `
+        <div class="col-6 col-md-3 col-xl">
+            <div class="card h-100 ${card.tone ? 'border-' + card.tone : ''}">
+                <div class="card-body py-2">
+                    <div class="text-muted small"><i class="bi ${card.icon} me-1"></i>${card.label}</div>
+                    <div class="fs-4 fw-semibold ${card.tone ? 'text-' + card.tone : ''}">${card.value}</div>
+                </div>
+            </div>
+        </div>
+    `).join('');
+}
+
+function renderLatencyTable(tableId, label, rows, slowP95) {
+    const table = document.getElementById(tableId);
+    if (!rows.length) {
+        table.innerHTML = `<tbody><tr><td class="text-muted">No ${label.toLowerCase()} activity yet</td></tr></tbody>`;
+        return;
+    }
+    table.innerHTML = `
+        <thead><tr>
+            <th>${label}</th><th class="text-end">In flight</th><th class="text-end">Count</th>
+            <th class="text-end">p50</th><th class="text-end">p95</th><th class="text-end">Max</th><th class="text-end">Errors</th>
+        </tr></thead>
+        <tbody>${rows.map(row => `
+            <tr>
+                <td><code>${escapeHtml(row.name)}</code></td>
+                <td class="text-end ${row.in_flight ? 'fw-semibold' : 'text-muted'}">${row.in_flight}</td>
+                <td class="text-end">${row.count}</td>
+                <td class="text-end">${formatMs(row.p50_ms)}</td>
+                <td class="text-end ${row.p95_ms > slowP95 ? 'text-warning fw-semibold' : ''}">${formatMs(row.p95_ms)}</td>
+                <td class="text-end">${formatMs(row.max_ms)}</td>
+                <td class="text-end ${row.errors ? 'text-danger fw-semibold' : 'text-muted'}">${row.errors} (${formatRate(row.error_rate)})</td>
+            </tr>`).join('')}
+        </tbody>`;
+}
+
+function renderRunsTable(tableId, runs, emptyText) {
+    const table = document.getElementById(tableId);
+    if (!runs.length) {
+        table.innerHTML = `<tbody><tr><td class="text-muted">${emptyText}</td></tr></tbody>`;
+        return;
+    }
+    const statusBadge = {
+        running: 'bg-primary',
+        completed: 'bg-success',
+        failed: 'bg-danger',
+        cancelled: 'bg-secondary'
+    };
+    table.innerHTML = `
+        <thead><tr>
+            <th>Policy</th><th>Source</th><th>Status</th><th>Stage</th><th class="text-end">Elapsed</th>
+            <th class="text-end">Model calls</th><th class="text-end">Tool calls</th><th class="text-end">Tool errors</th><th class="text-end">Retries</th>
+        </tr></thead>
+        <tbody>${runs.map(run => `
+            <tr title="${escapeHtml(run.error || '')}">
+                <td>${escapeHtml(run.policy_number || '')}</td>
+                <td>${escapeHtml(run.source)}</td>
+                <td><span class="badge ${statusBadge[run.status] || 'bg-secondary'}">${run.status}</span></td>
+                <td>${run.stages.map(stage => `<code>${escapeHtml(stage)}</code>`).join(' ')}</td>
+                <td class="text-end">${run.elapsed_seconds}s</td>
+                <td class="text-end">${run.model_calls}</td>
+                <td class="text-end">${run.tool_calls}</td>
+                <td class="text-end ${run.tool_errors ? 'text-danger' : ''}">${run.tool_errors}</td>
+                <td class="text-end ${run.retries ? 'text-warning' : ''}">${run.retries}</td>
+            </tr>`).join('')}
+        </tbody>`;
+}
+
+function formatMs(ms) {
+    if (ms === null || ms === undefined) return '–';
+    return ms >= 1000 ? `${(ms / 1000).toFixed(1)} s` : `${Math.round(ms)} ms`;
+}
+
+function formatRate(rate) {
+    return `${(rate * 100).toFixed(1)}%`;
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
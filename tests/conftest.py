@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root and are imported as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test in an empty folder, so the relative outputs/ and scenarios/ folders are its own."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
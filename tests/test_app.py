@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+pytest.importorskip("agents")
+
+import app as app_module
+
+
+@pytest.fixture
+def client(workdir):
+    (workdir / "scenarios" / "POL123456").mkdir(parents=True)
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("policy_number", ["POL999999", "..", "POL%2E%2E", "POL 1"])
+def test_run_rejects_unknown_policies_before_touching_outputs(client, workdir, policy_number):
+    response = client.get(f"/api/run/{policy_number}?profile=1")
+    assert response.status_code == 404
+    assert "Unknown policy number" in response.get_json()["error"]
+    assert not (workdir / "outputs").exists()
+
+
+def test_run_checks_the_protocol_of_known_policies(client):
+    response = client.get("/api/run/POL123456?protocol=binary")
+    assert response.status_code == 400
+
+
+def test_jobs_reject_unknown_policies(client):
+    response = client.post("/api/jobs", json={"policy_number": "../POL123456"})
+    assert response.status_code == 404
+
+
+def test_jobs_reject_unknown_tenants(client, workdir):
+    response = client.post("/api/jobs", json={"policy_number": "POL123456", "tenant": "nowhere"})
+    assert response.status_code == 400
+    assert "Unknown tenant" in response.get_json()["error"]
+    assert not (workdir / "outputs").exists()
@@ -0,0 +1,53 @@
+import gzip
+
+import pytest
+from flask import Flask, Response
+
+import asset_pipeline
+from asset_pipeline import accepted_encodings, compress_response
+
+app = Flask(__name__)
+
+
+def encodings_for(header: str) -> list[str]:
+    with app.test_request_context(headers={"Accept-Encoding": header}):
+        return accepted_encodings()
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    monkeypatch.setattr(asset_pipeline, "brotli", object())
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", ["br", "gzip"]),
+    ("br;q=0, gzip", ["gzip"]),
+    ("gzip;q=0, br", ["br"]),
+    ("br;q=0.5, gzip;q=0.8", ["gzip", "br"]),
+    ("*", ["br", "gzip"]),
+    ("*;q=0.1, gzip;q=0", ["br"]),
+    ("GZIP", ["gzip"]),
+    ("identity", []),
+    ("", []),
+])
+def test_accepted_encodings_respect_q_values(with_brotli, header, expected):
+    assert encodings_for(header) == expected
+
+
+def test_brotli_is_skipped_when_not_installed(monkeypatch):
+    monkeypatch.setattr(asset_pipeline, "brotli", None)
+    assert encodings_for("br, gzip") == ["gzip"]
+
+
+def test_compress_response_honours_refused_encodings(monkeypatch):
+    monkeypatch.setattr(asset_pipeline, "brotli", None)
+    body = '{"text": "' + "x" * asset_pipeline.MIN_COMPRESS_BYTES + '"}'
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip;q=0"}):
+        response = compress_response(Response(body, mimetype="application/json"))
+        assert "Content-Encoding" not in response.headers
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = compress_response(Response(body, mimetype="application/json"))
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(response.get_data()).decode() == body
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("agents")
+
+import batch_runner
+from batch_runner import GlobalRateLimiter, run_batch, shard_policies
+
+
+def complete_shard(policy_numbers, concurrency, tenant=None):
+    return [{"policy_number": policy_number, "status": "completed"} for policy_number in policy_numbers]
+
+
+def tenant_shard(policy_numbers, concurrency, tenant=None):
+    return [{"policy_number": policy_number, "status": "completed", "tenant": tenant} for policy_number in policy_numbers]
+
+
+def crash_shard(policy_numbers, concurrency, tenant=None):
+    os._exit(1)
+
+
+def read_summary():
+    with open(os.path.join("outputs", "batch_summary.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_shard_policies_round_robin():
+    assert shard_policies(["a", "b", "c", "d", "e"], 2) == [["a", "c", "e"], ["b", "d"]]
+    assert shard_policies(["a"], 4) == [["a"]]
+
+
+def test_rate_limiter_spaces_requests_beyond_the_limit():
+    limiter = GlobalRateLimiter({"model": 2, "document_intelligence": 0})
+    assert limiter.reserve("model") == 0
+    assert limiter.reserve("model") == 0
+    assert 59 < limiter.reserve("model") <= 60
+    assert limiter.reserve("document_intelligence") == 0
+
+
+def test_duplicate_policy_numbers_run_once(workdir, monkeypatch):
+    monkeypatch.setattr(batch_runner, "run_shard", complete_shard)
+    results = run_batch(["POL123456", "POL111222", "POL123456"], workers=2)
+    assert sorted(r["policy_number"] for r in results) == ["POL111222", "POL123456"]
+    assert read_summary()["completed"] == 2
+
+
+def test_tenant_is_passed_to_every_shard(workdir, monkeypatch):
+    monkeypatch.setattr(batch_runner, "run_shard", tenant_shard)
+    results = run_batch(["POL123456", "POL111222"], workers=2, tenant="us-health")
+    assert [r["tenant"] for r in results] == ["us-health", "us-health"]
+
+
+def test_unknown_tenant_is_rejected_before_starting_workers(workdir, monkeypatch, capsys):
+    monkeypatch.setattr(batch_runner, "run_batch", lambda *args: pytest.fail("workers were started"))
+    with pytest.raises(SystemExit) as exit_info:
+        batch_runner.main(["POL123456", "--tenant", "nowhere"])
+    assert exit_info.value.code == 2
+    assert "unknown tenant 'nowhere'" in capsys.readouterr().err
+
+
+def test_dead_worker_fails_its_claims_and_still_writes_the_summary(workdir, monkeypatch):
+    monkeypatch.setattr(batch_runner, "run_shard", crash_shard)
+    results = run_batch(["POL123456", "POL111222"], workers=1)
+    assert [r["status"] for r in results] == ["failed", "failed"]
+    assert all("BrokenProcessPool" in r["error"] for r in results)
+
+    summary = read_summary()
+    assert summary["claims"] == 2
+    assert summary["failed"] == 2
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("agents")
+
+from agents import Agent
+from agents.run import CallModelData, ModelInputData
+
+import insurance_claims_processing as icp
+
+
+def history(outputs: int, chars: int) -> list[dict]:
+    items = [{"role": "user", "content": "Verify the identity for POL123456"}]
+    for i in range(outputs):
+        call_id = f"call_{i}"
+        items.append({
+            "type": "function_call", "call_id": call_id, "name": "read_extracted_file",
+            "arguments": json.dumps({"policy_number": "POL123456", "filename": f"document_{i}.md"}),
+        })
+        items.append({"type": "function_call_output", "call_id": call_id, "output": f"{i}" * chars})
+    return items
+
+
+def tokens(items: list) -> int:
+    return sum(icp.estimate_tokens(json.dumps(item, default=str)) for item in items)
+
+
+def filter_input(items: list, budget: int, monkeypatch) -> ModelInputData:
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGET_IDVERIFICATION", str(budget))
+    call_data = CallModelData(
+        model_data=ModelInputData(input=items, instructions="You verify identities."),
+        agent=Agent(name="IDVerification"),
+        context=None,
+    )
+    return icp.apply_context_budget(call_data)
+
+
+def test_history_within_budget_is_sent_unchanged(monkeypatch):
+    items = history(2, 400)
+    model_data = filter_input(items, 10_000, monkeypatch)
+    assert model_data.input is items
+
+
+def test_older_tool_outputs_are_compacted_to_fit_the_budget(monkeypatch):
+    items = history(5, 4000)
+    original = json.loads(json.dumps(items))
+    model_data = filter_input(items, 3000, monkeypatch)
+
+    assert tokens(model_data.input) <= 3000
+    assert model_data.instructions == "You verify identities."
+    outputs = [item["output"] for item in model_data.input if item.get("type") == "function_call_output"]
+    # The latest tool outputs are kept whole
+    assert outputs[-icp.CONTEXT_KEEP_RECENT_TOOL_OUTPUTS:] == ["3" * 4000, "4" * 4000]
+    for i, output in enumerate(outputs[:-icp.CONTEXT_KEEP_RECENT_TOOL_OUTPUTS]):
+        assert output.startswith(f"{i}" * icp.CONTEXT_COMPACTED_PREVIEW_CHARS + "\n")
+        # Compacted outputs point at the saved file instead of sending the model back to the tool
+        assert os.path.join("outputs", "POL123456", "documents_extracted", f"document_{i}.md") in output
+    # The run's own history is left alone
+    assert items == original
+
+
+def test_saved_output_paths_of_sub_agent_reports():
+    arguments = json.dumps({"input": "Verify POL123456"})
+    assert icp.saved_output_paths("verify_identity", arguments) == []
+    token = icp.run_policy_number.set("POL123456")
+    try:
+        assert icp.saved_output_paths("verify_identity", arguments) == [
+            os.path.join("outputs", "POL123456", "id_verification", "verification_result.md")
+        ]
+        assert icp.saved_output_paths("read_policy_document", "{}") == []
+    finally:
+        icp.run_policy_number.reset(token)
@@ -0,0 +1,152 @@
+import json
+
+import pytest
+
+from decision_rules import (
+    DEFAULT_DECISION_RULES,
+    early_termination_reason,
+    evaluate_decision_rules,
+    load_decision_rules,
+    parse_claimed_amount,
+    render_decision,
+)
+
+
+def assessments(id_status="PASSED", coverage_status="COVERED", medical_status="VALID", amount="£4,250.00"):
+    results = {}
+    if id_status:
+        results["id_verification"] = f"### ID Verification Status\n\n**{id_status}**\n"
+    if coverage_status:
+        results["coverage_assessment"] = (
+            f"### Coverage Status\n\n**{coverage_status}**\n\n"
+            f"| Total Claimed Amount | {amount} (sum of all invoices) |\n"
+        )
+    if medical_status:
+        results["medical_assessment"] = f"### Medical Assessment Status\n\n**{medical_status}**\n"
+    return results
+
+
+def test_repository_rules_match_the_defaults():
+    assert load_decision_rules() == DEFAULT_DECISION_RULES
+
+
+def test_missing_rules_file_falls_back_to_the_defaults(tmp_path):
+    assert load_decision_rules(str(tmp_path / "missing.json")) == DEFAULT_DECISION_RULES
+
+
+@pytest.mark.parametrize("limits", ["50000", {"£": 50000, "$": "65,000"}, {"€": None}])
+def test_rules_with_malformed_limits_are_rejected(tmp_path, limits):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"auto_approve": {"max_claim_amount": limits}}), encoding="utf-8")
+    with pytest.raises(ValueError, match="max_claim_amount"):
+        load_decision_rules(str(path))
+
+
+def test_parse_claimed_amount_returns_amount_and_currency():
+    assert parse_claimed_amount("Total Claimed Amount: £4,250.00") == (4250.0, "£")
+    assert parse_claimed_amount("| Total Claimed Amount | $60,000 |") == (60000.0, "$")
+    assert parse_claimed_amount("No amount here") == (None, None)
+    assert parse_claimed_amount(None) == (None, None)
+
+
+def test_clear_claim_is_approved():
+    decision = evaluate_decision_rules(assessments(), DEFAULT_DECISION_RULES)
+    assert decision.outcome == "APPROVE"
+    assert "Approve payment of £4,250.00." in render_decision("POL123456", decision)
+
+
+@pytest.mark.parametrize("statuses, reason", [
+    ({"id_status": "FAILED"}, "ID Verification status is FAILED."),
+    ({"coverage_status": "NOT COVERED"}, "Coverage Assessment status is NOT COVERED."),
+    ({"medical_status": "INVALID"}, "Medical Assessment status is INVALID."),
+])
+def test_hard_fail_is_declined(statuses, reason):
+    decision = evaluate_decision_rules(assessments(**statuses), DEFAULT_DECISION_RULES)
+    assert decision.outcome == "DECLINE"
+    assert reason in decision.reasons
+    assert "❌ **DECLINED**" in render_decision("POL111222", decision)
+
+
+def test_decline_takes_precedence_over_escalation():
+    decision = evaluate_decision_rules(assessments(id_status="FAILED", medical_status="QUESTIONABLE"), DEFAULT_DECISION_RULES)
+    assert decision.outcome == "DECLINE"
+
+
+@pytest.mark.parametrize("statuses", [
+    {"id_status": "PARTIAL"},
+    {"coverage_status": "PARTIALLY COVERED"},
+    {"medical_status": "QUESTIONABLE"},
+    {"medical_status": None},
+])
+def test_borderline_claim_is_escalated(statuses):
+    decision = evaluate_decision_rules(assessments(**statuses), DEFAULT_DECISION_RULES)
+    assert decision.outcome is None
+    assert decision.reasons
+
+
+def test_amount_over_the_limit_is_escalated():
+    decision = evaluate_decision_rules(assessments(amount="£60,000.00"), DEFAULT_DECISION_RULES)
+    assert decision.outcome is None
+    assert decision.reasons == ["Claimed amount £60,000.00 exceeds the £50,000.00 auto-approval limit."]
+
+
+def test_unknown_amount_is_escalated():
+    decision = evaluate_decision_rules(assessments(amount="not stated"), DEFAULT_DECISION_RULES)
+    assert decision.outcome is None
+    assert decision.reasons == ["Total claimed amount could not be determined."]
+
+
+def test_claim_in_a_currency_without_a_limit_is_escalated():
+    decision = evaluate_decision_rules(assessments(amount="$4,250.00"), DEFAULT_DECISION_RULES)
+    assert decision.outcome is None
+    assert decision.reasons == ["No auto-approval limit is set for claims in $."]
+
+
+def test_limits_are_per_currency():
+    rules = json.loads(json.dumps(DEFAULT_DECISION_RULES))
+    rules["auto_approve"]["max_claim_amount"] = {"£": 50000, "$": 65000}
+
+    approved = evaluate_decision_rules(assessments(amount="$60,000.00"), rules)
+    assert approved.outcome == "APPROVE"
+    rendered = render_decision("POL123456", approved)
+    assert "Total claimed amount: $60,000.00." in rendered
+    assert "£" not in rendered
+
+    escalated = evaluate_decision_rules(assessments(amount="$70,000.00"), rules)
+    assert escalated.reasons == ["Claimed amount $70,000.00 exceeds the $65,000.00 auto-approval limit."]
+
+
+def test_plain_number_limit_is_in_pounds():
+    rules = json.loads(json.dumps(DEFAULT_DECISION_RULES))
+    rules["auto_approve"]["max_claim_amount"] = 50000
+    assert evaluate_decision_rules(assessments(), rules).outcome == "APPROVE"
+    assert evaluate_decision_rules(assessments(amount="$100.00"), rules).outcome is None
+
+
+def test_disabled_rules_escalate_everything():
+    decision = evaluate_decision_rules(assessments(), {**DEFAULT_DECISION_RULES, "enabled": False})
+    assert decision.outcome is None
+    assert decision.reasons == ["Decision rules are disabled."]
+
+
+def test_early_termination_reason():
+    assert early_termination_reason(assessments(id_status="FAILED"), DEFAULT_DECISION_RULES) == (
+        "id_verification", "ID Verification status is FAILED."
+    )
+    assert early_termination_reason(assessments(coverage_status="NOT COVERED"), DEFAULT_DECISION_RULES) == (
+        "coverage_assessment", "Coverage Assessment status is NOT COVERED."
+    )
+    # An invalid medical assessment is the last stage, so there is nothing left to skip
+    assert early_termination_reason(assessments(medical_status="INVALID"), DEFAULT_DECISION_RULES) is None
+    disabled = {**DEFAULT_DECISION_RULES, "early_termination": {"enabled": False, "id_verification": ["FAILED"]}}
+    assert early_termination_reason(assessments(id_status="FAILED"), disabled) is None
+
+
+def test_skipped_assessments_are_rendered_as_not_assessed():
+    results = {**assessments(id_status="FAILED", coverage_status=None, medical_status=None), "early_termination": "note"}
+    decision = evaluate_decision_rules(results, DEFAULT_DECISION_RULES)
+    assert decision.outcome == "DECLINE"
+    assert decision.terminated_early
+    rendered = render_decision("POL111222", decision)
+    assert "| Coverage Assessment  | Skipped               | Not assessed" in rendered
+    assert "Total claimed amount: not stated." in rendered
@@ -0,0 +1,89 @@
+import os
+import asyncio
+
+import pytest
+
+pytest.importorskip("agents")
+
+from agents import FunctionTool
+
+import insurance_claims_processing as icp
+
+FAILED_ID_VERIFICATION = """### ID Verification Status
+
+❌ **FAILED**
+
+| Check | Result |
+|-------|--------|
+| Name on licence | ❌ Does not match the policy holder |
+"""
+
+PASSED_ID_VERIFICATION = "### ID Verification Status\n\n✅ **PASSED**\n"
+
+
+def stage_tool(name: str, calls: list) -> FunctionTool:
+    async def on_invoke_tool(ctx, input: str):
+        calls.append(input)
+        return f"{name} ran"
+    return icp.gated_stage(FunctionTool(name=name, description=name, params_json_schema={}, on_invoke_tool=on_invoke_tool))
+
+
+def run_stage(tool: FunctionTool, policy_number: str | None, input: str) -> str:
+    async def invoke():
+        if policy_number is not None:
+            icp.run_policy_number.set(policy_number)
+        return await tool.on_invoke_tool(None, input)
+    return asyncio.run(invoke())
+
+
+def test_failed_id_verification_skips_assessments_and_declines(workdir):
+    # POL111222: the driving licence does not match the policy holder
+    icp.write_output_file("POL111222", "id_verification", "verification_result.md", FAILED_ID_VERIFICATION)
+    calls = []
+
+    # The Claims Manager's input need not mention the policy number
+    for stage in ("assess_coverage", "assess_medical"):
+        output = run_stage(stage_tool(stage, calls), "POL111222", '{"input": "Assess the claim"}')
+        assert output.startswith("SKIPPED: ID Verification status is FAILED.")
+    assert calls == []
+
+    note = workdir / "outputs" / "POL111222" / "early_termination" / "early_termination.md"
+    assert "assess_coverage, assess_medical" in note.read_text(encoding="utf-8")
+
+    # Decided by the rules, so no ClaimsDecision agent is needed
+    decision = asyncio.run(icp.decide_claim("POL111222", claims_decision_agent=None))
+    assert "❌ **DECLINED**" in decision
+    assert "| Coverage Assessment  | Skipped" in decision
+    assert "| Medical Assessment   | Skipped" in decision
+    assert "The remaining assessments were skipped by the early-termination policy." in decision
+    assert (workdir / "outputs" / "POL111222" / "final_decision" / "claims_decision.md").read_text(encoding="utf-8") == decision
+
+
+def test_gate_uses_the_run_policy_not_words_in_the_input(workdir):
+    icp.write_output_file("POL111222", "id_verification", "verification_result.md", PASSED_ID_VERIFICATION)
+    # Another claim whose folder name appears in the input has failed
+    icp.write_output_file("the", "id_verification", "verification_result.md", FAILED_ID_VERIFICATION)
+    icp.write_output_file("the", "coverage_assessment", "coverage_result.md", "**COVERED**")
+    calls = []
+
+    output = run_stage(stage_tool("assess_coverage", calls), "POL111222", "Assess the coverage of the claim")
+
+    assert output == "assess_coverage ran"
+    assert len(calls) == 1
+    assert (workdir / "outputs" / "the" / "coverage_assessment" / "coverage_result.md").exists()
+
+
+def test_gate_without_run_policy_runs_the_stage(workdir, capsys):
+    calls = []
+    output = run_stage(stage_tool("assess_medical", calls), None, "POL111222")
+    assert output == "assess_medical ran"
+    assert "without the early-termination check" in capsys.readouterr().out
+
+
+def test_passed_stage_clears_a_stale_note(workdir):
+    icp.write_output_file("POL111222", "id_verification", "verification_result.md", FAILED_ID_VERIFICATION)
+    assert icp.apply_early_termination("assess_coverage", "POL111222") is not None
+
+    icp.write_output_file("POL111222", "id_verification", "verification_result.md", PASSED_ID_VERIFICATION)
+    assert icp.apply_early_termination("assess_coverage", "POL111222") is None
+    assert not os.path.exists(os.path.join("outputs", "POL111222", "early_termination", "early_termination.md"))
@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+from instruction_templates import InstructionRegistry, InstructionTemplate, InstructionTemplateError
+
+TEMPLATE = """You assess claims in {{ currency_symbol }}.
+
+<!-- trim:start -->
+Example: a claim of {{currency_symbol}}100.
+<!-- trim:end -->
+
+
+Reply in {{ language }}.
+"""
+
+VARIABLES = {
+    "defaults": {"currency_symbol": "£", "language": "English"},
+    "tenants": {"us-health": {"currency_symbol": "$"}},
+}
+
+
+def write_instructions(directory, templates, variables=VARIABLES):
+    for name, source in templates.items():
+        (directory / f"{name}.md").write_text(source, encoding="utf-8")
+    (directory / "variables.json").write_text(json.dumps(variables), encoding="utf-8")
+
+
+def touch(path, seconds=10):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+
+@pytest.fixture
+def registry(tmp_path):
+    write_instructions(tmp_path, {"assessor": TEMPLATE})
+    return InstructionRegistry(str(tmp_path), reload_seconds=0)
+
+
+def test_full_variant_renders_defaults(registry):
+    rendered = registry.render("assessor", variant="full")
+    assert rendered.text == "You assess claims in £.\n\nExample: a claim of £100.\n\nReply in English.\n"
+    assert rendered.tokens > 0
+
+
+def test_trimmed_variant_leaves_out_trim_sections(registry):
+    rendered = registry.render("assessor", variant="trimmed")
+    assert rendered.text == "You assess claims in £.\n\nReply in English.\n"
+    assert rendered.tokens < registry.render("assessor", variant="full").tokens
+
+
+def test_tenant_overrides_defaults(registry):
+    assert registry.tenants == ["us-health"]
+    text = registry.render("assessor", tenant="us-health", variant="trimmed").text
+    assert text == "You assess claims in $.\n\nReply in English.\n"
+
+
+def test_renders_are_cached(registry):
+    assert registry.render("assessor", variant="full") is registry.render("assessor", variant="full")
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"variant": "tiny"}, "Unknown instruction variant"),
+    ({"tenant": "acme"}, "Unknown tenant"),
+])
+def test_unknown_variant_or_tenant(registry, kwargs, message):
+    with pytest.raises(InstructionTemplateError, match=message):
+        registry.render("assessor", **kwargs)
+
+
+def test_unknown_template(registry):
+    with pytest.raises(InstructionTemplateError, match="No instruction template"):
+        registry.render("missing", variant="full")
+
+
+@pytest.mark.parametrize("source, message", [
+    ("<!-- trim:start -->\n<!-- trim:start -->\n", "nested trim:start"),
+    ("text\n<!-- trim:end -->\n", "trim:end without trim:start"),
+    ("<!-- trim:start -->\ntext\n", "trim:start without trim:end"),
+    ("Hello {{ name \n", "malformed variable placeholder"),
+])
+def test_invalid_templates_are_rejected(source, message):
+    with pytest.raises(InstructionTemplateError, match=message):
+        InstructionTemplate("broken", source)
+
+
+@pytest.mark.parametrize("templates, variables, message", [
+    ({"assessor": "   \n"}, VARIABLES, "template is empty"),
+    ({"assessor": TEMPLATE}, {"defaults": {"currency_symbol": "£"}}, "no default for language"),
+    ({"assessor": TEMPLATE}, {**VARIABLES, "tenants": {"acme": {"region": "EU"}}}, "unknown variables region"),
+])
+def test_invalid_folders_are_rejected(tmp_path, templates, variables, message):
+    write_instructions(tmp_path, templates, variables)
+    with pytest.raises(InstructionTemplateError, match=message):
+        InstructionRegistry(str(tmp_path))
+
+
+def test_edited_templates_are_reloaded(registry, tmp_path):
+    registry.render("assessor", variant="trimmed")
+    path = tmp_path / "assessor.md"
+    path.write_text("Assess claims in {{ currency_symbol }}.\n", encoding="utf-8")
+    touch(path)
+    assert registry.render("assessor", variant="trimmed").text == "Assess claims in £.\n"
+
+
+def test_invalid_edit_keeps_the_previous_templates(registry, tmp_path, capsys):
+    path = tmp_path / "assessor.md"
+    path.write_text("Assess claims in {{ region }}.\n", encoding="utf-8")
+    touch(path)
+    assert registry.render("assessor", variant="trimmed").text == "You assess claims in £.\n\nReply in English.\n"
+    assert "not reloaded" in capsys.readouterr().out
+
+
+def test_repository_instructions_are_valid():
+    registry = InstructionRegistry()
+    report = registry.token_report()
+    assert report
+    for name, tokens in report.items():
+        assert tokens["trimmed"] <= tokens["full"], name
+    for tenant in registry.tenants:
+        registry.token_report(tenant)
@@ -0,0 +1,278 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("agents")
+
+import job_queue
+from job_queue import JobEventWriter, JobQueue, JobWorker, LeaseLost
+
+
+@pytest.fixture
+def queue(workdir):
+    return JobQueue(str(workdir / "jobs.sqlite"))
+
+
+def event_types(queue: JobQueue, job_id: str) -> list[str]:
+    return [event["type"] for _, event in queue.events(job_id)]
+
+
+def test_submit_returns_the_active_job_of_a_policy(queue):
+    job, created = queue.submit("POL123456", "us-health")
+    assert created
+    assert job["status"] == "queued"
+    assert job["tenant"] == "us-health"
+
+    again, created = queue.submit("POL123456")
+    assert not created
+    assert again["job_id"] == job["job_id"]
+
+    other, created = queue.submit("POL111222")
+    assert created
+    assert other["tenant"] is None
+
+
+def test_queues_created_before_tenants_get_the_column(queue):
+    job, _ = queue.submit("POL123456")
+    with sqlite3.connect(queue.db_path) as conn:
+        conn.execute("ALTER TABLE jobs DROP COLUMN tenant")
+
+    reopened = JobQueue(queue.db_path)
+    assert reopened.get(job["job_id"])["tenant"] is None
+    other, _ = reopened.submit("POL111222", "us-health")
+    assert reopened.get(other["job_id"])["tenant"] == "us-health"
+
+
+def test_lease_heartbeat_checkpoint_and_finish(queue):
+    job, _ = queue.submit("POL123456")
+    leased = queue.lease("worker-1")
+    assert leased["job_id"] == job["job_id"]
+    assert leased["status"] == "running"
+    assert leased["attempts"] == 1
+    assert queue.lease("worker-2") is None
+
+    assert queue.heartbeat(job["job_id"], "worker-1")
+    assert not queue.heartbeat(job["job_id"], "worker-2")
+
+    queue.complete_stage(job["job_id"], "worker-1", "extract_documents", "extracted")
+    assert queue.stage_outputs(job["job_id"]) == {"extract_documents": "extracted"}
+    with pytest.raises(LeaseLost):
+        queue.complete_stage(job["job_id"], "worker-2", "verify_identity", "passed")
+
+    queue.finish(job["job_id"], "worker-1", "completed", result="APPROVED")
+    finished = queue.get(job["job_id"])
+    assert finished["status"] == "completed"
+    assert finished["result"] == "APPROVED"
+    assert finished["completed_stages"] == ["extract_documents"]
+    assert event_types(queue, job["job_id"]) == ["job_queued", "job_finished"]
+    assert [seq for seq, _ in queue.events(job["job_id"])] == [1, 2]
+
+
+def test_cancel_stops_the_worker(queue):
+    job, _ = queue.submit("POL123456")
+    queue.lease("worker-1")
+
+    assert queue.cancel(job["job_id"])
+    assert queue.get(job["job_id"])["status"] == "cancelled"
+    assert not queue.heartbeat(job["job_id"], "worker-1")
+    with pytest.raises(LeaseLost):
+        queue.finish(job["job_id"], "worker-1", "completed")
+    assert not queue.cancel(job["job_id"])
+    # A cancelled policy can be submitted again
+    assert queue.submit("POL123456")[1]
+
+
+def test_expired_lease_is_taken_over_and_keeps_completed_stages(queue, monkeypatch):
+    job, _ = queue.submit("POL123456")
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    queue.lease("crashed-worker")
+    queue.complete_stage(job["job_id"], "crashed-worker", "extract_documents", "extracted")
+
+    resumed = queue.lease("worker-2")
+    assert resumed["job_id"] == job["job_id"]
+    assert resumed["attempts"] == 2
+    assert resumed["completed_stages"] == ["extract_documents"]
+    with pytest.raises(LeaseLost):
+        queue.complete_stage(job["job_id"], "crashed-worker", "verify_identity", "passed")
+
+
+def test_job_fails_once_its_attempts_are_used_up(queue, monkeypatch):
+    job, _ = queue.submit("POL123456")
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 2)
+    queue.lease("worker-1")
+    queue.lease("worker-2")
+
+    assert queue.lease("worker-3") is None
+    failed = queue.get(job["job_id"])
+    assert failed["status"] == "failed"
+    assert failed["error"] == "Worker lost after 2 attempts"
+
+
+def test_retry_requeues_after_the_delay(queue, monkeypatch):
+    job, _ = queue.submit("POL123456")
+    queue.lease("worker-1")
+    queue.retry(job["job_id"], "worker-1", "model timeout")
+    retried = queue.get(job["job_id"])
+    assert retried["status"] == "queued"
+    assert retried["error"] == "model timeout"
+    assert retried["available_at"] > time.time()
+    assert queue.lease("worker-2") is None
+
+    monkeypatch.setattr(job_queue, "JOB_RETRY_DELAY_SECONDS", 0)
+    other, _ = queue.submit("POL111222")
+    queue.lease("worker-2")
+    queue.retry(other["job_id"], "worker-2", "model timeout")
+    assert queue.lease("worker-3")["attempts"] == 2
+    assert event_types(queue, other["job_id"]) == ["job_queued", "job_retry"]
+
+
+def test_concurrent_event_writers_get_distinct_sequence_numbers(queue):
+    job, _ = queue.submit("POL123456")
+    queue.lease("worker-1")
+    errors = []
+
+    def record(count: int):
+        try:
+            for i in range(count):
+                queue.record_event(job["job_id"], {"type": "tool_call", "i": i})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=record, args=(50,)) for _ in range(4)]
+    threads.append(threading.Thread(target=queue.cancel, args=(job["job_id"],)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    seqs = [seq for seq, _ in queue.events(job["job_id"], limit=1000)]
+    assert seqs == list(range(1, 203))
+
+
+def test_event_writer_buffers_and_flushes_in_order(queue):
+    job, _ = queue.submit("POL123456")
+    writer = JobEventWriter(queue)
+    try:
+        for i in range(100):
+            writer.append(job["job_id"], {"type": "tool_call", "i": i})
+        writer.flush()
+        recorded = [event for _, event in queue.events(job["job_id"])]
+        assert [event["i"] for event in recorded[1:]] == list(range(100))
+    finally:
+        writer.close()
+    assert not writer.thread.is_alive()
+
+
+def test_worker_survives_lease_errors(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_POLL_SECONDS", 0.001)
+    worker = JobWorker(queue, "worker-1")
+    calls = []
+
+    def lease(worker_id):
+        calls.append(worker_id)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        worker.stop.set()
+        return None
+
+    monkeypatch.setattr(queue, "lease", lease)
+    asyncio.run(worker._run())
+    assert len(calls) == 2
+
+
+def fake_workflow(monkeypatch, run_workflow_stage) -> list:
+    """Run jobs without Azure; return the list the run manifest statuses are recorded in."""
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def close(self):
+            pass
+
+    manifests = []
+    monkeypatch.setattr(job_queue, "AsyncAzureOpenAI", Client)
+    monkeypatch.setattr(job_queue, "create_model_config", lambda client: "model")
+    monkeypatch.setattr(job_queue, "create_sub_agents", lambda model, tenant: f"agents for {tenant}")
+    monkeypatch.setattr(job_queue, "run_workflow_stage", run_workflow_stage)
+    monkeypatch.setattr(job_queue, "write_run_manifest", lambda policy_number, run_id, status, **fields: manifests.append(status))
+    return manifests
+
+
+def process(queue, job):
+    worker = JobWorker(queue, job["lease_owner"])
+    worker.events = JobEventWriter(queue)
+    try:
+        asyncio.run(worker.process(job))
+    finally:
+        worker.events.close()
+
+
+def test_worker_resumes_a_job_after_its_completed_stages(queue, monkeypatch):
+    ran = []
+
+    async def run_workflow_stage(stage, policy_number, sub_agents):
+        ran.append((stage, sub_agents))
+        return f"{stage} done"
+
+    manifests = fake_workflow(monkeypatch, run_workflow_stage)
+
+    job, _ = queue.submit("POL123456", "us-health")
+    leased = queue.lease("worker-1")
+    queue.complete_stage(job["job_id"], "worker-1", "extract_documents", "extracted")
+
+    process(queue, leased)
+
+    assert manifests == ["running", "completed"]
+    assert [stage for stage, _ in ran] == [stage for stage, _ in job_queue.WORKFLOW_STAGES][1:]
+    assert {agents for _, agents in ran} == {"agents for us-health"}
+    finished = queue.get(job["job_id"])
+    assert finished["status"] == "completed"
+    assert finished["result"] == "make_decision done"
+    types = event_types(queue, job["job_id"])
+    assert types[:3] == ["job_queued", "job_started", "stage_skipped"]
+    assert types[-1] == "job_finished"
+
+
+@pytest.mark.parametrize("stage_fails", [False, True])
+def test_expired_lease_leaves_the_manifest_to_the_new_worker(queue, monkeypatch, stage_fails):
+    job, _ = queue.submit("POL123456")
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1)
+    leased = queue.lease("worker-1")
+
+    async def run_workflow_stage(stage, policy_number, sub_agents):
+        # The lease expires mid-stage and another worker takes the job over
+        queue.lease("worker-2")
+        if stage_fails:
+            raise RuntimeError("model timeout")
+        return "done"
+
+    manifests = fake_workflow(monkeypatch, run_workflow_stage)
+    if stage_fails:
+        process(queue, leased)
+    else:
+        with pytest.raises(LeaseLost):
+            process(queue, leased)
+
+    assert manifests == ["running"]
+    taken_over = queue.get(job["job_id"])
+    assert taken_over["status"] == "running"
+    assert taken_over["lease_owner"] == "worker-2"
+
+
+def test_cancelled_job_records_a_cancelled_manifest(queue, monkeypatch):
+    job, _ = queue.submit("POL123456")
+    leased = queue.lease("worker-1")
+
+    async def run_workflow_stage(stage, policy_number, sub_agents):
+        queue.cancel(job["job_id"])
+        return "done"
+
+    manifests = fake_workflow(monkeypatch, run_workflow_stage)
+    with pytest.raises(LeaseLost):
+        process(queue, leased)
+    assert manifests == ["running", "cancelled"]
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+pytest.importorskip("agents")
+
+from insurance_claims_processing import maybe_truncate
+
+
+def split_truncate(text: str, max_lines: int) -> str:
+    """The splitlines() version maybe_truncate must match."""
+    lines = text.splitlines()
+    if len(lines) <= max_lines:
+        return text
+    return "\n".join(lines[:max_lines]) + f"\n\n... (truncated, {len(lines) - max_lines} more lines) ..."
+
+
+@pytest.mark.parametrize("text", [
+    "", "\n", "one", "one\n", "one\ntwo", "one\ntwo\n", "one\r\ntwo\r\nthree\r\n",
+    "a\rb\rc", "a\n\nb\n\n", "\r\n\r\n\r\n", "a b\x0cc\x85d",
+])
+@pytest.mark.parametrize("max_lines", [0, 1, 2, 3])
+def test_matches_splitlines(text, max_lines):
+    assert maybe_truncate(text, max_lines) == split_truncate(text, max_lines)
+
+
+def test_matches_splitlines_on_random_texts():
+    rng = random.Random(42)
+    for _ in range(500):
+        text = "".join(rng.choice(["a", "bc", "\n", "\r", "\r\n", " "]) for _ in range(rng.randrange(30)))
+        max_lines = rng.randrange(6)
+        assert maybe_truncate(text, max_lines) == split_truncate(text, max_lines), (text, max_lines)
+
+
+def test_long_text_keeps_the_head():
+    text = "".join(f"line {i}\r\n" for i in range(10_000))
+    assert maybe_truncate(text, 2) == "line 0\nline 1\n\n... (truncated, 9998 more lines) ..."
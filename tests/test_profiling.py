@@ -0,0 +1,55 @@
+import asyncio
+import json
+import threading
+import time
+
+from profiling import RunProfiler
+
+
+def busy(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def profile(tmp_path, coro_fn):
+    profiler = RunProfiler(str(tmp_path / "profile"), sample_interval_ms=1)
+    loop = asyncio.new_event_loop()
+    try:
+        profiler.start(loop)
+        loop.run_until_complete(coro_fn())
+        profiler.stop()
+        loop.run_until_complete(asyncio.sleep(0))  # Let the cancelled heartbeat finish
+    finally:
+        loop.close()
+    return profiler
+
+
+def test_every_task_is_on_the_timeline(tmp_path):
+    async def run():
+        # Finished tasks are freed, so their ids are reused by the next ones
+        for _ in range(200):
+            await asyncio.create_task(asyncio.sleep(0))
+
+    profiler = profile(tmp_path, run)
+    assert len(profiler.tasks) == 200 + 1  # Plus the task running `run`
+    with open(tmp_path / "profile" / "timeline.json", encoding="utf-8") as f:
+        trace = json.load(f)
+    assert sum(1 for event in trace["traceEvents"] if event["ph"] == "X" and event["pid"] == 1) == 201
+
+
+def test_only_this_runs_worker_threads_are_sampled(tmp_path):
+    stop = threading.Event()
+    # A worker thread of another run in the same process
+    other = threading.Thread(target=lambda: [busy(0.01) for _ in iter(stop.is_set, True)], name="asyncio_0")
+    other.start()
+    try:
+        profiler = profile(tmp_path, lambda: asyncio.to_thread(busy, 0.2))
+    finally:
+        stop.set()
+        other.join()
+
+    worker_stacks = [stack for stack in profiler.samples if stack.startswith("worker thread;")]
+    # This run's worker is sampled both busy and idle, the other thread never
+    assert any("busy (test_profiling.py)" in stack for stack in worker_stacks)
+    assert not any("<lambda>" in stack for stack in worker_stacks)
@@ -0,0 +1,239 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("agents")
+
+from agents import FunctionTool, Model, ModelResponse, ModelSettings, Usage
+from agents.models.interface import ModelTracing
+from openai.types.responses import Response, ResponseCompletedEvent, ResponseOutputMessage, ResponseOutputText
+
+import response_cache
+from response_cache import CacheMissError, CachingModel, DiskLRUStore, DocumentExtractionCache
+
+
+def message(text: str) -> ResponseOutputMessage:
+    return ResponseOutputMessage(
+        id="msg_1", content=[ResponseOutputText(annotations=[], text=text, type="output_text")],
+        role="assistant", status="completed", type="message",
+    )
+
+
+class FakeModel(Model):
+    """Answers every request with the number of calls so far."""
+
+    model = "gpt-test"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def get_response(self, *args, **kwargs):
+        self.calls += 1
+        usage = Usage(requests=1, input_tokens=10, output_tokens=5, total_tokens=15)
+        return ModelResponse(output=[message(f"answer {self.calls}")], usage=usage, response_id="resp_1")
+
+    async def stream_response(self, *args, **kwargs):
+        self.calls += 1
+        response = Response.model_construct(
+            id="resp_1", created_at=time.time(), model=self.model, object="response",
+            output=[message(f"answer {self.calls}")], tool_choice="auto", tools=[],
+            parallel_tool_calls=False, usage=None,
+        )
+        yield ResponseCompletedEvent(response=response, type="response.completed", sequence_number=0)
+
+
+async def no_op(context, arguments):
+    return ""
+
+
+TOOL = FunctionTool(
+    name="extract_documents", description="Extract the claim documents",
+    params_json_schema={"type": "object", "properties": {"policy_number": {"type": "string"}}},
+    on_invoke_tool=no_op,
+)
+
+
+def request(instructions: str = "You assess claims."):
+    return (instructions, [{"role": "user", "content": "Process POL123456"}], ModelSettings(temperature=0), [TOOL], None, [])
+
+
+def get(model: CachingModel, instructions: str = "You assess claims.") -> str:
+    response = asyncio.run(model.get_response(*request(instructions), ModelTracing.DISABLED,
+                                              previous_response_id=None, conversation_id=None, prompt=None))
+    return response.output[0].content[0].text
+
+
+def stream(model: CachingModel) -> list:
+    async def collect():
+        return [event async for event in model.stream_response(
+            *request(), ModelTracing.DISABLED, previous_response_id=None, conversation_id=None, prompt=None
+        )]
+    return asyncio.run(collect())
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DiskLRUStore(str(tmp_path / "cache"), 100)
+
+
+# ----------------------------------------------------------------------------
+# DiskLRUStore
+# ----------------------------------------------------------------------------
+
+
+def test_store_round_trips_and_persists(store, tmp_path):
+    assert store.get("ab12") is None
+    store.put("ab12", "recorded")
+    assert store.get("ab12") == "recorded"
+    assert "ab12" in DiskLRUStore(str(tmp_path / "cache"), 100)
+
+
+def test_store_evicts_the_least_recently_used(tmp_path):
+    store = DiskLRUStore(str(tmp_path / "cache"), 2)
+    store.put("aa", "1")
+    store.put("bb", "2")
+    assert store.get("aa") == "1"  # Now "bb" is the least recently used
+    store.put("cc", "3")
+    assert store.get("bb") is None
+    assert store.get("aa") == "1"
+    assert store.get("cc") == "3"
+    assert not os.path.exists(store._path("bb"))
+
+
+def test_store_recency_survives_restarts(tmp_path):
+    store = DiskLRUStore(str(tmp_path / "cache"), 2)
+    store.put("aa", "1")
+    store.put("bb", "2")
+    past = time.time() - 60
+    os.utime(store._path("bb"), (past, past))
+
+    restarted = DiskLRUStore(str(tmp_path / "cache"), 2)
+    restarted.put("cc", "3")
+    assert restarted.get("bb") is None
+    assert restarted.get("aa") == "1"
+
+
+def test_store_sees_entries_of_other_processes(store, tmp_path):
+    other = DiskLRUStore(str(tmp_path / "cache"), 100)
+    assert store.get("ab12") is None  # Loads this process's index
+    other.put("ab12", "from another worker")
+    assert store.get("ab12") == "from another worker"
+
+
+def test_store_tolerates_entries_evicted_by_other_processes(store, tmp_path, monkeypatch):
+    store.put("ab12", "recorded")
+    other = DiskLRUStore(str(tmp_path / "cache"), 100)
+
+    def evicted_meanwhile(path, *args):
+        os.remove(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(response_cache.os, "utime", evicted_meanwhile)
+    assert store.get("ab12") is None
+    monkeypatch.undo()
+    assert other.get("ab12") is None
+    assert store.get("ab12") is None
+
+
+# ----------------------------------------------------------------------------
+# CachingModel
+# ----------------------------------------------------------------------------
+
+
+def test_cache_key_is_stable_across_runs(store):
+    code = (
+        "import sys; sys.path[:0] = [{root!r}, {tests!r}]\n"
+        "from test_response_cache import FakeModel, request\n"
+        "from response_cache import CachingModel\n"
+        "print(CachingModel(FakeModel(), 'record', store=object()).cache_key(*request()))\n"
+    ).format(root=os.path.dirname(os.path.dirname(__file__)), tests=os.path.dirname(__file__))
+    # A fresh process with another hash seed than this one
+    child = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                           env={**os.environ, "PYTHONHASHSEED": "1"})
+    assert child.stdout.strip() == CachingModel(FakeModel(), "record", store=store).cache_key(*request())
+
+
+def test_cache_key_depends_on_the_request(store):
+    model = CachingModel(FakeModel(), "record", store=store)
+    assert model.cache_key(*request("You assess claims.")) != model.cache_key(*request("You decide claims."))
+
+
+def test_read_through_serves_repeated_requests_from_the_cache(store):
+    fake = FakeModel()
+    model = CachingModel(fake, "read_through", store=store)
+    assert get(model) == "answer 1"
+    assert get(model) == "answer 1"
+    assert fake.calls == 1
+    assert (model.hits, model.misses) == (1, 1)
+    assert get(model, "You decide claims.") == "answer 2"
+
+
+def test_replayed_responses_report_no_usage(store):
+    model = CachingModel(FakeModel(), "read_through", store=store)
+    get(model)
+    replayed = asyncio.run(model.get_response(*request(), ModelTracing.DISABLED,
+                                              previous_response_id=None, conversation_id=None, prompt=None))
+    assert replayed.usage.total_tokens == 0
+
+
+def test_record_always_calls_the_model_and_replay_never_does(store):
+    fake = FakeModel()
+    recorder = CachingModel(fake, "record", store=store)
+    get(recorder)
+    assert get(recorder) == "answer 2"
+    assert fake.calls == 2
+
+    replayer = CachingModel(FakeModel(), "replay", store=store)
+    assert get(replayer) == "answer 2"
+    assert replayer.model.calls == 0
+    with pytest.raises(CacheMissError):
+        get(replayer, "You decide claims.")
+
+
+def test_stream_response_records_and_replays_the_completed_event(store):
+    fake = FakeModel()
+    model = CachingModel(fake, "read_through", store=store)
+    first = stream(model)
+    second = stream(model)
+    assert fake.calls == 1
+    assert [type(event) for event in second] == [ResponseCompletedEvent]
+    assert second[0].response.output[0].content[0].text == first[0].response.output[0].content[0].text == "answer 1"
+    # Streamed and non-streamed requests share the cache
+    assert get(model) == "answer 1"
+
+
+def test_off_mode_passes_through_without_storing(tmp_path):
+    store = DiskLRUStore(str(tmp_path / "cache"), 100)
+    fake = FakeModel()
+    model = CachingModel(fake, "off", store=store)
+    assert get(model) == "answer 1"
+    assert get(model) == "answer 2"
+    assert stream(model)[0].response.output[0].content[0].text == "answer 3"
+    assert not os.path.exists(tmp_path / "cache")
+    assert (model.hits, model.misses) == (0, 0)
+
+
+def test_unknown_mode_is_rejected(store):
+    with pytest.raises(ValueError):
+        CachingModel(FakeModel(), "sometimes", store=store)
+
+
+# ----------------------------------------------------------------------------
+# DocumentExtractionCache
+# ----------------------------------------------------------------------------
+
+
+def test_extraction_cache_modes(store):
+    read_through = DocumentExtractionCache("read_through", store=store)
+    assert read_through.lookup(b"%PDF", "prebuilt-layout") is None
+    read_through.record(b"%PDF", "prebuilt-layout", "# Invoice")
+    assert read_through.lookup(b"%PDF", "prebuilt-layout") == "# Invoice"
+    assert read_through.lookup(b"%PDF", "prebuilt-read") is None
+
+    assert DocumentExtractionCache("off", store=store).lookup(b"%PDF", "prebuilt-layout") is None
+    with pytest.raises(CacheMissError):
+        DocumentExtractionCache("replay", store=store).lookup(b"other", "prebuilt-layout")
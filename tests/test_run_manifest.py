@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+pytest.importorskip("agents")
+
+from insurance_claims_processing import write_run_manifest
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_each_run_keeps_its_own_manifest(workdir):
+    write_run_manifest("POL123456", "web-run", "running", source="web")
+    write_run_manifest("POL123456", "job-run", "running", source="job", job_id="job-1")
+    write_run_manifest("POL123456", "web-run", "completed")
+    write_run_manifest("POL123456", "job-run", "failed", error="boom")
+
+    runs = workdir / "outputs" / "POL123456" / "runs"
+    web = read(runs / "web-run.json")
+    assert (web["run_id"], web["status"], web["source"]) == ("web-run", "completed", "web")
+    assert "started_at" in web and "finished_at" in web
+    job = read(runs / "job-run.json")
+    assert (job["status"], job["source"], job["job_id"], job["error"]) == ("failed", "job", "job-1", "boom")
+
+
+def test_latest_manifest_follows_the_latest_run_started(workdir):
+    latest = workdir / "outputs" / "POL123456" / "run_manifest.json"
+    write_run_manifest("POL123456", "first", "running", source="job")
+    assert read(latest)["run_id"] == "first"
+
+    write_run_manifest("POL123456", "second", "running", source="job")
+    # The first run finishing later does not overwrite the newer run's manifest
+    write_run_manifest("POL123456", "first", "cancelled")
+    assert (read(latest)["run_id"], read(latest)["status"]) == ("second", "running")
+
+    write_run_manifest("POL123456", "second", "completed")
+    assert read(latest) == read(workdir / "outputs" / "POL123456" / "runs" / "second.json")
+    assert read(latest)["status"] == "completed"
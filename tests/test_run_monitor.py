@@ -0,0 +1,176 @@
+import json
+import os
+
+import pytest
+
+from run_monitor import RunEventLog, RunMonitor
+
+
+def started(run_id, source="web", at=1000.0):
+    return {"type": "run_started", "run_id": run_id, "policy_number": "POL123456", "source": source, "time": at}
+
+
+def finished(run_id, status="completed", at=1010.0, error=None):
+    return {"type": "run_finished", "run_id": run_id, "status": status, "error": error, "time": at}
+
+
+def tool_call(run_id, call_id, tool_name="extract_document", at=1001.0):
+    return {"type": "internal_tool_call", "run_id": run_id, "call_id": call_id, "tool_name": tool_name, "time": at}
+
+
+def tool_result(run_id, call_id, status="ok", tool_name="extract_document", duration_ms=100.0, at=1002.0):
+    return {"type": "internal_tool_result", "run_id": run_id, "call_id": call_id, "tool_name": tool_name,
+            "status": status, "duration_ms": duration_ms, "time": at}
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    # Every sample falls inside the window
+    monkeypatch.setattr("run_monitor.time.time", lambda: 1100.0)
+    return RunMonitor(window=300)
+
+
+def test_snapshot_counts_runs_by_status_and_source(monitor):
+    for run_id, source, status in [("a", "web", "completed"), ("b", "job", "failed"), ("c", "batch", "cancelled")]:
+        monitor.record(started(run_id, source))
+        monitor.record(finished(run_id, status))
+    monitor.record(started("d", "job"))
+
+    runs = monitor.snapshot()["runs"]
+    assert (runs["active"], runs["finished"]) == (1, 3)
+    assert (runs["completed"], runs["failed"], runs["cancelled"]) == (1, 1, 1)
+    assert runs["per_minute"] == 0.6
+    by_source = {entry["name"]: entry for entry in runs["by_source"]}
+    assert by_source["job"]["in_flight"] == 1
+    assert by_source["job"]["count"] == 1
+    assert by_source["job"]["errors"] == 0
+    assert by_source["web"]["p50_ms"] == 10_000
+
+
+def test_snapshot_breaks_down_stages_tools_and_model_calls(monitor):
+    monitor.record(started("a"))
+    monitor.record({"type": "stage_started", "run_id": "a", "stage": "extraction", "time": 1000.5})
+    for i, duration in enumerate([100.0, 200.0, 300.0, 400.0]):
+        monitor.record(tool_call("a", f"call-{i}"))
+        monitor.record(tool_result("a", f"call-{i}", "error" if i == 3 else "ok", duration_ms=duration))
+    monitor.record(tool_call("a", "in-flight", "check_policy"))
+    monitor.record({"type": "model_call", "run_id": "a", "status": "ok", "duration_ms": 50.0, "time": 1003.0})
+    monitor.record({"type": "stage_finished", "run_id": "a", "stage": "extraction", "status": "ok",
+                    "duration_ms": 2500.0, "time": 1003.0})
+    monitor.record({"type": "stage_started", "run_id": "a", "stage": "assessment", "time": 1003.0})
+
+    snapshot = monitor.snapshot()
+    stages = {entry["name"]: entry for entry in snapshot["stages"]}
+    assert (stages["extraction"]["count"], stages["extraction"]["in_flight"]) == (1, 0)
+    assert (stages["assessment"]["count"], stages["assessment"]["in_flight"]) == (0, 1)
+    tools = {entry["name"]: entry for entry in snapshot["tools"]}
+    assert tools["extract_document"]["count"] == 4
+    assert tools["extract_document"]["errors"] == 1
+    assert tools["extract_document"]["error_rate"] == 0.25
+    assert (tools["extract_document"]["p50_ms"], tools["extract_document"]["p95_ms"]) == (300.0, 400.0)
+    assert tools["check_policy"]["in_flight"] == 1
+    assert snapshot["model"]["count"] == 1
+
+    [run] = snapshot["active_runs"]
+    assert run["stages"] == ["assessment"]
+    assert (run["tool_calls"], run["tool_errors"], run["model_calls"]) == (5, 1, 1)
+
+
+def test_calls_of_a_tool_that_failed_count_as_retries(monitor):
+    monitor.record(started("a"))
+    monitor.record(tool_call("a", "1"))
+    monitor.record(tool_result("a", "1", "error"))
+    monitor.record(tool_call("a", "2"))
+    monitor.record(tool_result("a", "2"))
+    monitor.record(tool_call("a", "3", "check_policy"))
+    monitor.record(finished("a", "failed", error="boom"))
+
+    [run] = monitor.snapshot()["recent_runs"]
+    assert (run["retries"], run["status"], run["error"]) == (1, "failed", "boom")
+
+
+def test_samples_outside_the_window_are_dropped(monitor):
+    monitor.record(started("old", at=500.0))
+    monitor.record(finished("old", at=700.0))
+    monitor.record(started("new"))
+    monitor.record(finished("new"))
+
+    snapshot = monitor.snapshot()
+    assert snapshot["runs"]["finished"] == 1
+    # Recent runs are kept regardless of the window
+    assert [run["run_id"] for run in snapshot["recent_runs"]] == ["new", "old"]
+
+
+def test_events_of_runs_started_before_attaching_are_ignored(monitor):
+    monitor.record(tool_call("unknown", "1"))
+    monitor.record(finished("unknown"))
+    snapshot = monitor.snapshot()
+    assert snapshot["runs"]["finished"] == 0
+    assert snapshot["tools"] == []
+
+
+# ----------------------------------------------------------------------------
+# Event log
+# ----------------------------------------------------------------------------
+
+
+def test_monitor_follows_the_event_log(monitor, tmp_path):
+    path = str(tmp_path / "run_events.jsonl")
+    log = RunEventLog(path)
+    log.append(started("a", "batch"))
+    monitor.attach_log(path)  # Replays the existing tail
+    log.append(finished("a"))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(started("b", "batch"))[:20])  # Partially written
+    log.close()
+
+    snapshot = monitor.snapshot()
+    assert snapshot["runs"]["completed"] == 1
+    assert snapshot["runs"]["active"] == 0
+
+
+def test_event_log_is_rotated_at_its_size_cap(tmp_path):
+    path = str(tmp_path / "run_events.jsonl")
+    log = RunEventLog(path, max_bytes=1000)
+    for i in range(50):
+        log.append(started(f"run-{i}"))
+    log.close()
+
+    assert os.path.getsize(path) < 1000
+    assert os.path.getsize(path + ".1") < 1000 + 200
+    assert not os.path.exists(path + ".2")
+
+
+def test_writers_reopen_a_log_rotated_by_another_writer(tmp_path):
+    path = str(tmp_path / "run_events.jsonl")
+    first = RunEventLog(path, max_bytes=1000)
+    second = RunEventLog(path, max_bytes=1000)
+    for i in range(50):
+        (first if i % 2 else second).append(started(f"run-{i}"))
+    first.close()
+    second.close()
+
+    with open(path, encoding="utf-8") as f:
+        current = [json.loads(line)["run_id"] for line in f]
+    with open(path + ".1", encoding="utf-8") as f:
+        rotated = [json.loads(line)["run_id"] for line in f]
+    # Nothing written since the last rotation went to the rotated file
+    assert rotated + current == [f"run-{i}" for i in range(50 - len(rotated) - len(current), 50)]
+
+
+def test_monitor_reads_the_rest_of_a_rotated_log(monitor, tmp_path):
+    path = str(tmp_path / "run_events.jsonl")
+    log = RunEventLog(path, max_bytes=1500)
+    monitor.attach_log(path)
+    for i in range(10):
+        log.append(started(f"run-{i}", "batch"))
+    monitor.snapshot()
+    # Finish them all, rotating the log on the way
+    for i in range(10):
+        log.append(finished(f"run-{i}"))
+    log.close()
+    assert os.path.exists(path + ".1")
+
+    snapshot = monitor.snapshot()
+    assert snapshot["runs"]["completed"] == 10
+    assert snapshot["runs"]["active"] == 0
@@ -0,0 +1,159 @@
+import os
+import threading
+
+import pytest
+
+import scenario_index
+from scenario_index import ScenarioIndex, hash_file
+
+
+@pytest.fixture
+def scenarios(tmp_path):
+    root = tmp_path / "scenarios"
+    for policy_number in ("POL123456", "POL111222", "POL_1"):
+        (root / policy_number).mkdir(parents=True)
+        (root / policy_number / "invoice.pdf").write_bytes(b"invoice " + policy_number.encode())
+    (root / "POL123456" / "notes.txt").write_text("not a claim document")
+    return root
+
+
+@pytest.fixture
+def index(scenarios, tmp_path):
+    yield ScenarioIndex(str(scenarios), str(tmp_path / "index.sqlite"))
+    # Let background refreshes finish before the next test patches the module
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and thread.daemon:
+            thread.join(5)
+
+
+def bump_mtime(path, seconds=10):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + seconds))
+
+
+def test_lists_scenarios_with_paging(index):
+    assert index.list_scenarios() == (["POL111222", "POL123456", "POL_1"], 3)
+    assert index.list_scenarios(offset=1, limit=1) == (["POL123456"], 3)
+
+
+def test_query_is_a_literal_substring(index):
+    assert index.list_scenarios(query="1222") == (["POL111222"], 1)
+    assert index.list_scenarios(query="_") == (["POL_1"], 1)
+    assert index.list_scenarios(query="%") == ([], 0)
+    assert index.list_scenarios(query="\\") == ([], 0)
+
+
+def test_get_files_returns_only_documents(index, scenarios):
+    path = str(scenarios / "POL123456" / "invoice.pdf")
+    files = index.get_files("POL123456")
+    assert [file["path"] for file in files] == [path]
+    assert files[0]["sha256"] == hash_file(path)
+
+
+def keep_dir_mtime(path):
+    """Restore a folder's mtime, as when only its files or subfolders change."""
+    stat = os.stat(path)
+    return lambda: os.utime(path, (stat.st_atime, stat.st_mtime))
+
+
+def test_first_listing_does_not_hash_documents(index, monkeypatch):
+    refreshes = []
+    monkeypatch.setattr(index, "refresh", lambda deep=False: refreshes.append(deep))
+    monkeypatch.setattr(scenario_index, "hash_file", lambda path: pytest.fail(f"{path} was hashed"))
+    assert index.list_scenarios() == (["POL111222", "POL123456", "POL_1"], 3)
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and thread.daemon:
+            thread.join(5)
+    assert refreshes == [False]
+
+
+def test_get_files_of_an_unchanged_folder_is_served_from_the_index(index, monkeypatch):
+    index.refresh()
+    monkeypatch.setattr(scenario_index.os, "walk", lambda path: pytest.fail("the folder was walked"))
+    assert len(index.get_files("POL123456")) == 1
+
+
+def test_get_files_rescans_a_changed_folder(index, scenarios):
+    index.refresh()
+    (scenarios / "POL123456" / "receipt.png").write_bytes(b"receipt")
+    bump_mtime(scenarios / "POL123456")
+    assert [os.path.basename(file["path"]) for file in index.get_files("POL123456")] == ["invoice.pdf", "receipt.png"]
+
+
+def test_refresh_only_rescans_changed_folders(index, scenarios, monkeypatch):
+    index.refresh()
+    rescanned = []
+    refresh_scenario = index.refresh_scenario
+    monkeypatch.setattr(index, "refresh_scenario", lambda policy_number, conn=None: (
+        conn is None and rescanned.append(policy_number), refresh_scenario(policy_number, conn)
+    ))
+    bump_mtime(scenarios / "POL111222")
+    index.refresh()
+    assert rescanned == ["POL111222"]
+
+
+def keep_dir_mtime(path):
+    """Restore a folder's mtime, as when only its files or subfolders change."""
+    stat = os.stat(path)
+    return lambda: os.utime(path, (stat.st_atime, stat.st_mtime))
+
+
+def test_deep_refresh_picks_up_in_place_edits(index, scenarios, monkeypatch):
+    index.refresh()
+    invoice = scenarios / "POL123456" / "invoice.pdf"
+    before = index.get_files("POL123456")[0]["sha256"]
+    restore = keep_dir_mtime(scenarios / "POL123456")
+    invoice.write_bytes(b"corrected invoice")
+    restore()
+
+    # The folder's mtime is unchanged, so only a deep refresh notices the edit
+    index.refresh()
+    assert index.get_files("POL123456")[0]["sha256"] == before
+    index.refresh(deep=True)
+    assert index.get_files("POL123456")[0]["sha256"] == hash_file(str(invoice))
+
+
+def test_deep_refresh_picks_up_documents_in_subfolders(index, scenarios):
+    (scenarios / "POL123456" / "scans").mkdir()
+    index.refresh()
+    restore = keep_dir_mtime(scenarios / "POL123456")
+    (scenarios / "POL123456" / "scans" / "receipt.png").write_bytes(b"receipt")
+    restore()
+
+    index.refresh(deep=True)
+    assert [file["path"] for file in index.get_files("POL123456")] == [
+        str(scenarios / "POL123456" / "invoice.pdf"),
+        str(scenarios / "POL123456" / "scans" / "receipt.png"),
+    ]
+
+
+def test_deep_refresh_only_rehashes_changed_documents(index, scenarios, monkeypatch):
+    index.refresh()
+    hashed = []
+    monkeypatch.setattr(scenario_index, "hash_file", lambda path: hashed.append(path) or "hash")
+    index.refresh(deep=True)
+    assert hashed == []
+
+    invoice = scenarios / "POL111222" / "invoice.pdf"
+    bump_mtime(invoice)
+    index.refresh(deep=True)
+    assert hashed == [str(invoice)]
+
+
+def test_overdue_deep_refresh_runs_in_the_background(index, monkeypatch):
+    refreshes = []
+    monkeypatch.setattr(index, "refresh", lambda deep=False: refreshes.append(deep))
+    index.ensure_fresh(max_age=0, deep_max_age=3600)
+    index.ensure_fresh(max_age=0, deep_max_age=-1)
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and thread.daemon:
+            thread.join(5)
+    assert sorted(refreshes) == [False, True]
+
+
+def test_removed_scenarios_drop_out_of_the_index(index, scenarios):
+    index.refresh()
+    (scenarios / "POL_1" / "invoice.pdf").unlink()
+    (scenarios / "POL_1").rmdir()
+    index.refresh()
+    assert index.list_scenarios() == (["POL111222", "POL123456"], 2)
@@ -0,0 +1,98 @@
+import gzip
+import json
+
+import pytest
+
+import sse_protocol
+from response_cache import DiskLRUStore
+from sse_protocol import CompactEncoder, LegacyEncoder, PayloadHandle, PayloadStore, create_encoder, gzip_stream
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PayloadStore(DiskLRUStore(str(tmp_path / "payloads"), 100, suffix=".txt"))
+
+
+def frames(stream: str) -> list:
+    return [json.loads(frame[len("data: "):]) for frame in stream.split("\n\n") if frame.startswith("data: ")]
+
+
+def test_create_encoder():
+    assert isinstance(create_encoder("legacy"), LegacyEncoder)
+    assert isinstance(create_encoder("compact"), CompactEncoder)
+    with pytest.raises(ValueError):
+        create_encoder("binary")
+
+
+def test_legacy_sends_one_frame_per_event():
+    encoder = LegacyEncoder()
+    frame = encoder.add({"type": "tool_output", "output": "extracted"})
+    assert frames(frame) == [{"type": "tool_output", "output": "extracted"}]
+    assert encoder.timeout() is None
+    assert encoder.flush() == ""
+
+
+def test_compact_coalesces_events_until_flush(store):
+    encoder = CompactEncoder(store, window=60, max_events=3)
+    assert encoder.add({"type": "agent_active", "agent_name": "ClaimsManager"}) == ""
+    assert encoder.add({"type": "message", "content": "hi"}) == ""
+    assert 0 < encoder.timeout() <= 60
+
+    frame = encoder.add({"type": "message", "content": "there"})
+    assert [event["type"] for event in frames(frame)[0]] == ["agent_active", "message", "message"]
+    assert encoder.timeout() is None
+    assert encoder.flush() == ""
+
+
+def test_compact_sends_final_events_immediately(store):
+    encoder = CompactEncoder(store, window=60)
+    encoder.add({"type": "message", "content": "hi"})
+    frame = encoder.add({"type": "final", "content": "done"})
+    assert [event["type"] for event in frames(frame)[0]] == ["message", "final"]
+
+
+def test_compact_sends_long_strings_once_by_reference(store):
+    encoder = CompactEncoder(store, window=60, inline_max_chars=10)
+    text = "extracted document " * 10
+    encoder.add({"type": "tool_call", "arguments": text})
+    encoder.add({"type": "tool_output", "output": {"nested": [text]}})
+    first, second = frames(encoder.flush())[0]
+
+    ref = {"$ref": PayloadStore.payload_key(text), "size": len(text)}
+    assert first["arguments"] == ref
+    assert second["output"] == {"nested": [ref]}
+    assert store.get(ref["$ref"]) == text
+
+
+def test_compact_drops_the_redundant_args_string(store):
+    encoder = CompactEncoder(store)
+    compacted = encoder.compact_event({"type": "internal_tool_call", "args": "{'a': 1}", "args_dict": {"a": 1}})
+    assert compacted == {"type": "internal_tool_call", "args_dict": {"a": 1}}
+
+
+def test_gzip_stream_round_trips():
+    chunks = [f"data: {i}\n\n" for i in range(20)]
+    compressed = b"".join(gzip_stream(chunk for chunk in chunks))
+    assert gzip.decompress(compressed).decode("utf-8") == "".join(chunks)
+
+
+def test_legacy_sends_long_texts_inline(monkeypatch):
+    encoder = LegacyEncoder()
+    text = "x" * (sse_protocol.SSE_SPOOL_MIN_CHARS + 1)
+    monkeypatch.setattr(sse_protocol, "get_payload_store", lambda: pytest.fail("legacy must not use the payload store"))
+    assert encoder.spool(text) is text
+
+
+def test_compact_spools_long_texts_as_handles(store):
+    encoder = CompactEncoder(store, window=60)
+    assert encoder.spool("short") == "short"
+
+    text = "y" * sse_protocol.SSE_SPOOL_MIN_CHARS
+    handle = encoder.spool(text)
+    assert isinstance(handle, PayloadHandle)
+    assert handle.size == len(text)
+    assert handle.preview == text[:sse_protocol.SSE_SPOOL_PREVIEW_CHARS]
+    assert store.get(handle.key) == text
+
+    encoder.add({"type": "final", "content": handle})
+    assert encoder.pending == []